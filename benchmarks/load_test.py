@@ -0,0 +1,203 @@
+"""
+Load test for the metrics HTTP service (`python src/ecofin360.py serve`).
+
+Opens `--concurrency` keep-alive connections and sends a mix of metrics, returns and
+correlation requests drawn from `--distinct` different queries (so repeated queries
+exercise the response cache), then reports requests/sec and latency percentiles.
+
+Usage (from the repository root):
+    python benchmarks/load_test.py --port 8360                     # against a running service
+    python benchmarks/load_test.py --start-server --tickers 2000   # on a synthetic universe
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), "src")
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+DATE_PART = "241216"
+
+
+async def request(reader, writer, host, target):
+    """
+    Send one GET request on a keep-alive connection and return its status and body.
+    """
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+    length = 0
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length)
+    return int(status_line.split(" ", 2)[1]), body
+
+
+async def fetch_json(host, port, target):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        status, body = await request(reader, writer, host, target)
+    finally:
+        writer.close()
+    if status != 200:
+        raise RuntimeError(f"GET {target} failed with {status}: {body.decode()}")
+    return json.loads(body)
+
+
+def build_queries(universe, tickers, dates, distinct, seed=0):
+    """
+    Build a mix of distinct queries: 30% universe metrics, 20% ticker metrics, 30% returns
+    over a one-year window and 20% correlation submatrices of ten tickers.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(distinct):
+        kind = rng.random()
+        start = rng.randrange(0, max(1, len(dates) - 252))
+        window = f"start={dates[start]}&end={dates[min(start + 252, len(dates) - 1)]}"
+        if kind < 0.3:
+            queries.append(f"/metrics?universe={universe}&tickers={','.join(rng.sample(tickers, 5))}")
+        elif kind < 0.5:
+            queries.append(f"/metrics/{rng.choice(tickers)}")
+        elif kind < 0.8:
+            queries.append(f"/returns?tickers={','.join(rng.sample(tickers, 3))}&{window}")
+        else:
+            queries.append(f"/correlation?tickers={','.join(rng.sample(tickers, 10))}&{window}")
+    return queries
+
+
+async def client(host, port, queries, count, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(count):
+            target = rng.choice(queries)
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, target)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append((status, target))
+    finally:
+        writer.close()
+
+
+async def run_load_test(host, port, concurrency, total, distinct):
+    health = await fetch_json(host, port, "/health")
+    if not health["universes"]:
+        raise RuntimeError("The service has no performance metrics to query.")
+    universe = health["universes"][0]
+    metrics = await fetch_json(host, port, f"/metrics?universe={universe}")
+    tickers = [row["Ticker"] for row in metrics["metrics"]]
+    returns = await fetch_json(host, port, f"/returns?tickers={tickers[0]}")
+    queries = build_queries(universe, tickers, returns["dates"], distinct)
+
+    latencies, errors = [], []
+    per_client = total // concurrency
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, queries, per_client, latencies, errors, seed) for seed in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    health = await fetch_json(host, port, "/health")
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "distinct_queries": distinct,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "max_ms": round(float(latencies_ms.max()), 3),
+        "cache": health["cache"],
+    }
+
+
+def prepare_synthetic_data(directory, n_tickers, years):
+    """
+    Write synthetic silver returns and performance metrics for the service to serve.
+    """
+    import synthetic
+    from transformations.analyze_annual_stock_performance import calculate_universe_metrics
+
+    returns_dir = os.path.join(directory, "data", "silver", "returns")
+    os.makedirs(returns_dir, exist_ok=True)
+    returns_file = os.path.join(returns_dir, f"returns_cleaned_{DATE_PART}-adj-close.parquet")
+    synthetic.generate_returns(synthetic.generate_prices(n_tickers, years)).to_parquet(returns_file, index=False)
+    calculate_universe_metrics(returns_file, os.path.join(directory, "data", "silver", "performance"),
+                               {"synthetic": {"name": "synthetic", "benchmark": "^GSPC"}})
+
+
+def wait_for_port(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as probe:
+            if probe.connect_ex((host, port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"The service did not start listening on {host}:{port}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the EcoFin360 metrics service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8360)
+    parser.add_argument("--concurrency", type=int, default=32, help="Number of keep-alive connections")
+    parser.add_argument("--requests", type=int, default=5000, help="Total number of requests")
+    parser.add_argument("--distinct", type=int, default=500, help="Number of distinct queries in the mix")
+    parser.add_argument("--start-server", action="store_true", help="Serve synthetic data in a temporary directory")
+    parser.add_argument("--tickers", type=int, default=500, help="Synthetic universe size (with --start-server)")
+    parser.add_argument("--years", type=int, default=30, help="Synthetic history length (with --start-server)")
+    parser.add_argument("--cache-mb", type=float, default=64, help="Service cache size (with --start-server)")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            if args.start_server:
+                print(f"Generating synthetic data for {args.tickers} tickers...")
+                prepare_synthetic_data(directory, args.tickers, args.years)
+                server = subprocess.Popen(
+                    [sys.executable, os.path.join(SRC_DIR, "ecofin360.py"), "serve", "--host", args.host,
+                     "--port", str(args.port), "--cache-mb", str(args.cache_mb)],
+                    cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                )
+                wait_for_port(args.host, args.port)
+
+            report = asyncio.run(run_load_test(args.host, args.port, args.concurrency, args.requests, args.distinct))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    print(f"{report['requests']} requests ({report['errors']} errors) in {report['seconds']} s "
+          f"with {report['concurrency']} connections: {report['requests_per_second']} requests/sec")
+    print(f"latency p50 {report['p50_ms']} ms, p90 {report['p90_ms']} ms, p99 {report['p99_ms']} ms, "
+          f"max {report['max_ms']} ms")
+    print(f"cache: {report['cache']}")
+    if args.output:
+        with open(args.output, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
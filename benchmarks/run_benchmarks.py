@@ -0,0 +1,517 @@
+"""
+Benchmark suite for the EcoFin360 pipeline stages.
+
+Every benchmark times one stage on synthetic data (see `synthetic.py`) and records the
+best wall time over several repeats plus the peak memory of separate runs (traced by
+tracemalloc, and the process RSS growth for allocations tracemalloc cannot see).
+Results can be stored as a baseline and later runs fail (exit code 1) when a stage
+gets slower or uses more memory than the baseline allows, or when there is no baseline.
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py                          # 500 tickers, 30 years
+    python benchmarks/run_benchmarks.py --tickers 500 5000 20000
+    python benchmarks/run_benchmarks.py --minute-bars            # include the intraday path
+    python benchmarks/run_benchmarks.py --only clean_stock_data calculate_daily_returns
+    python benchmarks/run_benchmarks.py --save-baseline          # store results as the baseline
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARK_DIR), "src"))
+sys.path.insert(0, BENCHMARK_DIR)
+
+import synthetic  # noqa: E402
+
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DATE_PART = "241216"
+
+# name -> {"setup": setup function, "sized": depends on the universe size, "minute_bars": intraday only}
+BENCHMARKS = {}
+
+
+def benchmark(name, sized=True, minute_bars=False):
+    """
+    Register a benchmark. The decorated function receives the `Workspace` and returns
+    the zero-argument callable to time; everything it does before returning is setup.
+    """
+    def register(setup):
+        BENCHMARKS[name] = {"setup": setup, "sized": sized, "minute_bars": minute_bars}
+        return setup
+    return register
+
+
+class Workspace:
+    """
+    Synthetic inputs for one universe size, generated lazily and shared between benchmarks.
+    """
+
+    def __init__(self, n_tickers, years, directory):
+        self.n_tickers = n_tickers
+        self.years = years
+        self.directory = directory
+        self._cache = {}
+
+    def _get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def raw_prices(self):
+        return self._get("raw_prices", lambda: synthetic.generate_prices(self.n_tickers, self.years))
+
+    @property
+    def raw_csv(self):
+        def build():
+            path = os.path.join(self.directory, f"{DATE_PART}-adj-close.csv")
+            self.raw_prices.to_csv(path, index=True)
+            return path
+        return self._get("raw_csv", build)
+
+    @property
+    def cleaned_prices(self):
+        from transformations.clean_stock_data import clean_stock_data
+        return self._get("cleaned_prices", lambda: clean_stock_data(self.raw_csv))
+
+    @property
+    def coverage(self):
+        from transformations.clean_stock_data import clean_stock_data
+        return self._get("coverage", lambda: clean_stock_data(self.raw_csv, return_coverage=True)[1])
+
+    @property
+    def returns(self):
+        return self._get("returns", lambda: synthetic.generate_returns(self.cleaned_prices))
+
+    @property
+    def returns_parquet(self):
+        def build():
+            path = os.path.join(self.directory, f"returns_cleaned_{DATE_PART}-adj-close.parquet")
+            self.returns.to_parquet(path, index=False, engine="pyarrow")
+            return path
+        return self._get("returns_parquet", build)
+
+    @property
+    def returns_csv(self):
+        def build():
+            path = os.path.join(self.directory, f"returns_cleaned_{DATE_PART}-adj-close.csv")
+            self.returns.to_csv(path, index=False)
+            return path
+        return self._get("returns_csv", build)
+
+    @property
+    def minute_bars(self):
+        return self._get("minute_bars", lambda: synthetic.generate_minute_bars(self.n_tickers, days=1))
+
+    def output_dir(self, name):
+        path = os.path.join(self.directory, "output", name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+
+# --- Pipeline stages ---------------------------------------------------------------------
+
+@benchmark("clean_stock_data")
+def bench_clean_stock_data(workspace):
+    from transformations.clean_stock_data import clean_stock_data
+    path = workspace.raw_csv
+    return lambda: clean_stock_data(path)
+
+
+@benchmark("calculate_daily_returns")
+def bench_calculate_daily_returns(workspace):
+    from transformations.calculate_daily_return import calculate_daily_returns
+    prices = workspace.cleaned_prices
+    return lambda: calculate_daily_returns(prices)
+
+
+@benchmark("calculate_annual_metrics_for_latest")
+def bench_calculate_annual_metrics(workspace):
+    from transformations.analyze_annual_stock_performance import calculate_annual_metrics_for_latest
+    path = workspace.returns_parquet
+    output_dir = workspace.output_dir("performance")
+    universe = {"name": "synthetic", "benchmark": "^GSPC"}
+    return lambda: calculate_annual_metrics_for_latest(path, output_dir, universe=universe)
+
+
+@benchmark("calculate_universe_metrics")
+def bench_calculate_universe_metrics(workspace):
+    from transformations.analyze_annual_stock_performance import calculate_universe_metrics
+    path = workspace.returns_parquet
+    output_dir = workspace.output_dir("performance")
+    # Three overlapping universes (all tickers, the first half, every tenth ticker) over one returns store
+    tickers = [column for column in workspace.returns.columns if column not in ("Date", "^GSPC")]
+    universes = {
+        "all": {"name": "all", "benchmark": "^GSPC"},
+        "half": {"name": "half", "benchmark": "^GSPC", "tickers": tickers[:len(tickers) // 2]},
+        "tenth": {"name": "tenth", "benchmark": "^GSPC", "tickers": tickers[::10]},
+    }
+    coverage = workspace.coverage
+    return lambda: calculate_universe_metrics(path, output_dir, universes, coverage=coverage)
+
+
+@benchmark("wide_to_long")
+def bench_wide_to_long(workspace):
+    from transformations.long_format import wide_to_long
+    prices, returns = workspace.cleaned_prices, workspace.returns
+    dimension = pd.DataFrame({"ticker_id": np.arange(prices.shape[1], dtype="int32"), "Symbol": prices.columns})
+    return lambda: wide_to_long(prices, returns, dimension)
+
+
+@benchmark("long_to_wide")
+def bench_long_to_wide(workspace):
+    from transformations.long_format import long_to_wide, wide_to_long
+    prices, returns = workspace.cleaned_prices, workspace.returns
+    dimension = pd.DataFrame({"ticker_id": np.arange(prices.shape[1], dtype="int32"), "Symbol": prices.columns})
+    long_data = wide_to_long(prices, returns, dimension)
+    return lambda: long_to_wide(long_data, dimension, "return")
+
+
+@benchmark("adjust_prices")
+def bench_adjust_prices(workspace):
+    from data_engineering.corporate_actions import adjust_prices
+    closes = workspace.cleaned_prices
+    # Quarterly dividends for every ticker
+    dates = closes.index[::63]
+    actions = pd.DataFrame({
+        "Date": np.tile(dates, closes.shape[1]),
+        "Symbol": np.repeat(closes.columns, len(dates)),
+        "Action": "dividend",
+        "Value": 0.25,
+    })
+    return lambda: adjust_prices(closes, actions)
+
+
+def _bench_risk_simulation(workspace, method):
+    from data_science.risk_simulation import fit_scenario_model, load_return_history, simulate_losses
+    tickers = [column for column in workspace.returns.columns if column not in ("Date", "^GSPC")]
+    log_returns = load_return_history(workspace.returns_parquet, tickers)
+    model = fit_scenario_model(log_returns, method)
+    weights = pd.DataFrame({"equal": 1.0 / log_returns.shape[1]}, index=log_returns.columns)
+    # In-process batches, so the timing measures the simulation kernel rather than process startup
+    return lambda: simulate_losses(model, weights, n_scenarios=100_000, workers=1)
+
+
+@benchmark("risk_simulation_normal")
+def bench_risk_simulation_normal(workspace):
+    return _bench_risk_simulation(workspace, "normal")
+
+
+@benchmark("risk_simulation_bootstrap")
+def bench_risk_simulation_bootstrap(workspace):
+    return _bench_risk_simulation(workspace, "bootstrap")
+
+
+@benchmark("feature_store")
+def bench_feature_store(workspace):
+    from data_science.feature_store import iter_feature_rows, read_returns
+    returns = read_returns(workspace.returns_parquet)
+    # Rows are consumed chunk by chunk, as the stage writes them
+    return lambda: sum(len(rows) for rows in iter_feature_rows(returns, "^GSPC"))
+
+
+# --- I/O paths -----------------------------------------------------------------------------
+
+@benchmark("io_csv_write")
+def bench_io_csv_write(workspace):
+    returns, path = workspace.returns, os.path.join(workspace.output_dir("io"), "returns.csv")
+    return lambda: returns.to_csv(path, index=False)
+
+
+@benchmark("io_csv_read")
+def bench_io_csv_read(workspace):
+    path = workspace.returns_csv
+    return lambda: pd.read_csv(path, parse_dates=["Date"])
+
+
+@benchmark("io_parquet_write")
+def bench_io_parquet_write(workspace):
+    returns, path = workspace.returns, os.path.join(workspace.output_dir("io"), "returns.parquet")
+    return lambda: returns.to_parquet(path, index=False, engine="pyarrow")
+
+
+@benchmark("io_parquet_read")
+def bench_io_parquet_read(workspace):
+    path = workspace.returns_parquet
+    return lambda: pd.read_parquet(path)
+
+
+@benchmark("io_minute_bars_parquet_roundtrip", minute_bars=True)
+def bench_minute_bars_roundtrip(workspace):
+    bars, path = workspace.minute_bars, os.path.join(workspace.output_dir("io"), "bars.parquet")
+
+    def roundtrip():
+        bars.to_parquet(path, index=False, engine="pyarrow")
+        return pd.read_parquet(path)
+    return roundtrip
+
+
+@benchmark("save_minute_bars", minute_bars=True)
+def bench_save_minute_bars(workspace):
+    from data_engineering.intraday_bars import save_minute_bars
+    bars, path = workspace.minute_bars, os.path.join(workspace.output_dir("intraday"), "minute_bars")
+    return lambda: save_minute_bars(bars, path)
+
+
+@benchmark("resample_minute_bars", minute_bars=True)
+def bench_resample_minute_bars(workspace):
+    from data_engineering.intraday_bars import open_minute_bars, save_minute_bars
+    from transformations.resample_intraday_bars import iter_resampled_bars
+    path = os.path.join(workspace.output_dir("intraday"), "resample_input")
+    save_minute_bars(workspace.minute_bars, path)
+    return lambda: list(iter_resampled_bars(open_minute_bars(path)))
+
+
+# --- Ticker scraping -----------------------------------------------------------------------
+
+@benchmark("parse_constituents_lxml", sized=False)
+def bench_parse_constituents_lxml(workspace):
+    import data_engineering.fetch_sp500_tickers as scraper
+    if scraper.lxml is None:
+        return None
+    page = synthetic.generate_wikipedia_page()
+    return lambda: scraper.parse_sp500_constituents(page)
+
+
+@benchmark("parse_constituents_html_parser", sized=False)
+def bench_parse_constituents_html_parser(workspace):
+    import data_engineering.fetch_sp500_tickers as scraper
+    page = synthetic.generate_wikipedia_page()
+
+    def parse():
+        fast_parser, scraper.lxml = scraper.lxml, None
+        try:
+            return scraper.parse_sp500_constituents(page)
+        finally:
+            scraper.lxml = fast_parser
+    return parse
+
+
+# --- CLI startup ---------------------------------------------------------------------------
+
+CLI_SCRIPT = os.path.join(os.path.dirname(BENCHMARK_DIR), "src", "ecofin360.py")
+
+
+def _cli_command(workspace, *args):
+    """
+    Return a callable running the CLI in a fresh interpreter (fails if the command fails).
+    """
+    import subprocess
+    cwd = workspace.output_dir("cli")
+
+    def run_cli():
+        subprocess.run([sys.executable, CLI_SCRIPT, *args], cwd=cwd, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return run_cli
+
+
+@benchmark("cli_startup_help", sized=False)
+def bench_cli_startup_help(workspace):
+    return _cli_command(workspace, "--help")
+
+
+@benchmark("cli_startup_up_to_date", sized=False)
+def bench_cli_startup_up_to_date(workspace):
+    from common.paths import daily_price_file
+    # Today's prices already exist, so the stage returns before importing pandas or yfinance
+    daily_file = os.path.join(workspace.output_dir("cli"), daily_price_file())
+    os.makedirs(os.path.dirname(daily_file), exist_ok=True)
+    open(daily_file, "w").close()
+    return _cli_command(workspace, "prices")
+
+
+# --- Runner --------------------------------------------------------------------------------
+
+def read_rss():
+    """
+    Return the resident set size of this process in bytes (Linux), or None if unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+class RssSampler:
+    """
+    Sample the process RSS in a background thread to find the peak growth during a call.
+
+    tracemalloc only sees allocations made through Python's allocator (which NumPy uses)
+    but not Arrow's memory pool, so Parquet paths are also tracked through RSS.
+    """
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = 0
+
+    def __enter__(self):
+        import threading
+        self.start_rss = read_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        if self.start_rss is not None:
+            self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, read_rss() - self.start_rss)
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+            self.peak = max(self.peak, read_rss() - self.start_rss)
+
+
+def measure(func, repeat):
+    """
+    Time `func` (best of `repeat` runs) and measure its peak memory in one extra run.
+
+    Returns:
+        dict: 'seconds' (best wall time), 'peak_mb' (peak memory traced by tracemalloc) and
+        'peak_rss_mb' (peak growth of the process RSS, None where it cannot be read).
+    """
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+        gc.collect()
+        with RssSampler() as sampler:
+            func()
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    peak_rss_mb = round(sampler.peak / 2 ** 20, 3) if sampler.start_rss is not None else None
+    return {"seconds": round(min(timings), 6), "peak_mb": round(peak / 2 ** 20, 3), "peak_rss_mb": peak_rss_mb}
+
+
+def run(sizes, years, repeat, only=None, minute_bars=False):
+    """
+    Run the selected benchmarks for every universe size.
+
+    Returns:
+        dict: Results keyed by '<benchmark>[<n_tickers>]' (or '<benchmark>' when size-independent).
+    """
+    results = {}
+    selected = {
+        name: spec for name, spec in BENCHMARKS.items()
+        if (only is None or name in only) and (minute_bars or not spec["minute_bars"])
+    }
+    with tempfile.TemporaryDirectory(prefix="ecofin360-bench-") as directory:
+        for n_tickers in sizes:
+            workspace = Workspace(n_tickers, years, os.path.join(directory, str(n_tickers)))
+            os.makedirs(workspace.directory)
+            for name, spec in selected.items():
+                key = f"{name}[{n_tickers}]" if spec["sized"] else name
+                if key in results:
+                    continue
+                func = spec["setup"](workspace)
+                if func is None:
+                    print(f"{key:<55} skipped")
+                    continue
+                results[key] = measure(func, repeat)
+                print(
+                    f"{key:<55} {results[key]['seconds']:>10.4f} s {results[key]['peak_mb']:>10.1f} MB traced "
+                    f"{results[key]['peak_rss_mb'] or 0:>10.1f} MB RSS"
+                )
+    return results
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """
+    Compare results with the baseline.
+
+    Returns:
+        list[str]: One message per regression.
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if result["seconds"] > reference["seconds"] * (1 + time_tolerance):
+            regressions.append(f"{key}: {result['seconds']:.4f} s vs baseline {reference['seconds']:.4f} s")
+        # RSS growth depends on what the allocator already holds, so only traced memory is
+        # compared; the 1 MB slack keeps tiny allocations from flagging noise
+        if result["peak_mb"] > reference["peak_mb"] * (1 + memory_tolerance) + 1:
+            regressions.append(f"{key}: {result['peak_mb']:.1f} MB vs baseline {reference['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EcoFin360 pipeline stages on synthetic data.")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[500], help="universe sizes to benchmark")
+    parser.add_argument("--years", type=int, default=30, help="years of daily history")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--minute-bars", action="store_true", help="include the minute-bar benchmarks")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file to compare with or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="allowed relative memory growth")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    # Stage modules log every step at INFO; keep the benchmark output readable
+    logging.disable(logging.INFO)
+
+    results = run(args.tickers, args.years, args.repeat, args.only, args.minute_bars)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                baseline = json.load(baseline_file)
+        baseline.update(results)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    # Without a baseline nothing is checked: fail rather than pass silently
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}; run with --save-baseline to create one.")
+        return 1
+
+    with open(args.baseline) as baseline_file:
+        regressions = compare(results, json.load(baseline_file), args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print("Performance regressions detected:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
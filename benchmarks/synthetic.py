@@ -0,0 +1,179 @@
+"""
+Synthetic data generators for the benchmark suite.
+
+The generators produce data shaped like the pipeline's real inputs (Yahoo Finance
+adjusted closes with one column per ticker, minute OHLCV bars, the Wikipedia
+constituents page) so every stage can be timed on universes much larger than the
+S&P 500 without network access.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from common.market_calendar import trading_days
+
+TRADING_DAYS_PER_YEAR = 252
+MINUTES_PER_SESSION = 390  # 09:30 - 16:00
+
+
+def generate_tickers(n_tickers: int) -> list:
+    """
+    Generate unique, ticker-like symbols (AAAA, AAAB, ...).
+    """
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    codes = np.arange(n_tickers)
+    symbols = [""] * n_tickers
+    for position in range(4):
+        symbols = [letters[code % 26] + symbol for code, symbol in zip(codes, symbols)]
+        codes = codes // 26
+    return symbols
+
+
+def generate_prices(n_tickers: int = 500, years: int = 30, seed: int = 0, start: str = "1995-01-02",
+                    benchmark_ticker: str = "^GSPC", chunk_size: int = 1000) -> pd.DataFrame:
+    """
+    Generate a wide frame of adjusted closes (NYSE trading days x tickers) with a market factor.
+
+    Daily log returns follow a one-factor model: each ticker has its own beta, drift and
+    idiosyncratic volatility around a shared market return. About a third of the tickers
+    list after the start date and a tenth are delisted before the end, so the frame has
+    the leading/trailing NaN blocks that real index histories have. A handful of random
+    holes and a few duplicated dates mimic raw vendor files. Tickers are generated in
+    chunks to bound temporary memory for very large universes.
+
+    Args:
+        n_tickers (int): Number of tickers (the benchmark column is added on top).
+        years (int): Number of years of daily history.
+        seed (int): Seed for the NumPy random generator.
+        start (str): First date of the history.
+        benchmark_ticker (str): Name of the market index column.
+        chunk_size (int): Number of tickers generated at once.
+
+    Returns:
+        pd.DataFrame: Adjusted closes indexed by 'Date'.
+    """
+    rng = np.random.default_rng(seed)
+    first_day = pd.Timestamp(start).date()
+    calendar = trading_days(first_day, first_day + timedelta(days=years * 366 + 31))
+    dates = pd.DatetimeIndex(calendar[:years * TRADING_DAYS_PER_YEAR], name="Date")
+    n_dates = len(dates)
+
+    market = rng.normal(0.07 / TRADING_DAYS_PER_YEAR, 0.18 / np.sqrt(TRADING_DAYS_PER_YEAR), n_dates)
+    prices = np.empty((n_dates, n_tickers + 1))
+    prices[:, -1] = 1000.0 * np.exp(np.cumsum(market))
+
+    for first in range(0, n_tickers, chunk_size):
+        width = min(chunk_size, n_tickers - first)
+        beta = rng.normal(1.0, 0.3, width)
+        drift = rng.normal(0.03, 0.05, width) / TRADING_DAYS_PER_YEAR
+        volatility = rng.lognormal(np.log(0.25), 0.3, width) / np.sqrt(TRADING_DAYS_PER_YEAR)
+        log_returns = market[:, None] * beta + drift + rng.standard_normal((n_dates, width)) * volatility
+        chunk = rng.uniform(10, 300, width) * np.exp(np.cumsum(log_returns, axis=0))
+
+        listed = rng.random(width) < 0.33
+        listing_rows = np.where(listed, rng.integers(1, n_dates, width), 0)
+        delisted = rng.random(width) < 0.10
+        delisting_rows = np.where(delisted, rng.integers(1, n_dates, width), n_dates)
+        rows = np.arange(n_dates)[:, None]
+        chunk[(rows < listing_rows) | (rows >= np.maximum(delisting_rows, listing_rows + 1))] = np.nan
+
+        holes = rng.random(chunk.shape) < 0.0005
+        chunk[holes] = np.nan
+        prices[:, first:first + width] = chunk
+
+    np.round(prices, 4, out=prices)
+    frame = pd.DataFrame(prices, index=dates, columns=generate_tickers(n_tickers) + [benchmark_ticker])
+
+    # Raw vendor files occasionally repeat a date
+    duplicated = frame.iloc[rng.integers(0, n_dates, 3)]
+    return pd.concat([frame, duplicated]).sort_index(kind="stable")
+
+
+def generate_returns(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute daily returns in the silver `returns_cleaned_*` layout ('Date' column first).
+    """
+    prices = prices[~prices.index.duplicated(keep="first")]
+    returns = prices.pct_change(fill_method=None).round(3)
+    returns.insert(0, "Date", returns.index)
+    return returns.reset_index(drop=True)
+
+
+def generate_minute_bars(n_tickers: int = 500, days: int = 1, seed: int = 0,
+                         start: str = "2024-01-02") -> pd.DataFrame:
+    """
+    Generate one-minute OHLCV bars for a regular trading session (long format).
+
+    Args:
+        n_tickers (int): Number of tickers.
+        days (int): Number of business days.
+        seed (int): Seed for the NumPy random generator.
+        start (str): First session date.
+
+    Returns:
+        pd.DataFrame: Bars with 'Datetime', 'Ticker', 'Open', 'High', 'Low', 'Close' and
+        'Volume' columns, sorted by ticker then time.
+    """
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range(start, periods=days)
+    offsets = pd.to_timedelta(np.arange(MINUTES_PER_SESSION) + 9 * 60 + 30, unit="min")
+    timestamps = (sessions.to_numpy()[:, None] + offsets.to_numpy()[None, :]).ravel()
+    n_bars = len(timestamps)
+
+    volatility = rng.lognormal(np.log(0.25), 0.3, n_tickers) / np.sqrt(TRADING_DAYS_PER_YEAR * MINUTES_PER_SESSION)
+    log_returns = rng.standard_normal((n_tickers, n_bars)) * volatility[:, None]
+    close = rng.uniform(10, 300, n_tickers)[:, None] * np.exp(np.cumsum(log_returns, axis=1))
+    open_ = np.concatenate([close[:, :1], close[:, :-1]], axis=1)
+    spread = np.abs(rng.standard_normal((n_tickers, n_bars))) * volatility[:, None] * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.poisson(2000, (n_tickers, n_bars))
+
+    return pd.DataFrame({
+        "Datetime": np.tile(timestamps, n_tickers),
+        "Ticker": np.repeat(generate_tickers(n_tickers), n_bars),
+        "Open": open_.ravel().round(4),
+        "High": high.ravel().round(4),
+        "Low": low.ravel().round(4),
+        "Close": close.ravel().round(4),
+        "Volume": volume.ravel(),
+    })
+
+
+def generate_wikipedia_page(n_rows: int = 503, n_changes: int = 400, seed: int = 0) -> bytes:
+    """
+    Generate an HTML page shaped like the Wikipedia "List of S&P 500 companies" article.
+
+    The page contains the constituents and changes tables plus filler markup, so parser
+    benchmarks include the cost of skipping the rest of the page.
+    """
+    rng = np.random.default_rng(seed)
+    tickers = generate_tickers(n_rows + n_changes)
+    sectors = ["Energy", "Financials", "Health Care", "Industrials", "Information Technology", "Utilities"]
+
+    constituents = "".join(
+        f"<tr><td><a href=\"#\">{ticker}</a></td><td><a href=\"#\">{ticker} Inc.</a></td>"
+        f"<td>{sectors[rng.integers(len(sectors))]}</td><td>Sub-Industry {rng.integers(100)}</td>"
+        f"<td>City, State</td><td>2000-01-01</td><td>{rng.integers(10 ** 9):010d}</td><td>1950</td></tr>"
+        for ticker in tickers[:n_rows]
+    )
+    dates = pd.date_range("2024-12-31", periods=n_changes, freq="-7D")
+    changes = "".join(
+        f"<tr><td>{date:%B} {date.day}, {date.year}</td><td>{tickers[position % n_rows]}</td><td>Added</td>"
+        f"<td>{tickers[n_rows + position]}</td><td>Removed</td><td>Market cap change</td></tr>"
+        for position, date in enumerate(dates)
+    )
+    filler = "<div class=\"mw-body\"><p>" + "Lorem ipsum dolor sit amet. " * 2000 + "</p></div>"
+    return (
+        "<html><head><title>List of S&amp;P 500 companies</title></head><body>"
+        f"{filler}"
+        "<table class=\"wikitable sortable\" id=\"constituents\"><tbody>"
+        "<tr><th>Symbol</th><th>Security</th><th>GICS Sector</th><th>GICS Sub-Industry</th>"
+        "<th>Headquarters Location</th><th>Date added</th><th>CIK</th><th>Founded</th></tr>"
+        f"{constituents}</tbody></table>"
+        "<table class=\"wikitable sortable\" id=\"changes\"><tbody>"
+        "<tr><th rowspan=\"2\">Date</th><th colspan=\"2\">Added</th><th colspan=\"2\">Removed</th>"
+        "<th rowspan=\"2\">Reason</th></tr><tr><th>Ticker</th><th>Security</th><th>Ticker</th><th>Security</th></tr>"
+        f"{changes}</tbody></table>{filler}</body></html>"
+    ).encode()
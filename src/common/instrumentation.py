@@ -0,0 +1,355 @@
+import cProfile
+import contextlib
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Run log (one JSON line per stage run) and profiler output
+RUN_LOG_DIR = "data/logs/"
+RUN_LOG_FILE = os.path.join(RUN_LOG_DIR, "runs.jsonl")
+PROFILE_DIR = os.path.join(RUN_LOG_DIR, "profiles/")
+
+# Comma-separated profilers to enable for every run: "cprofile", "tracemalloc"
+PROFILE_ENV_VAR = "ECOFIN360_PROFILE"
+
+_active_runs = []
+
+
+def get_peak_rss_mb():
+    """
+    Get the peak resident set size of the process so far, in MB (None if unavailable).
+
+    This is the high-water mark of the whole process (`ru_maxrss`), not of a step: spans
+    record how much a step raised it (see `Span.rss_growth_mb`).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return round(peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10, 3)
+
+
+class Span:
+    """
+    One timed step of a stage run (e.g. load, parse, clean, compute, write).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.bytes = None
+        self.seconds = None
+        self.rss_growth_mb = None  # How much the step raised the process peak RSS
+        self.traced_peak_mb = None
+
+    def record(self, rows=None, nbytes=None):
+        """
+        Record how much data the step processed.
+        """
+        if rows is not None:
+            self.rows = (self.rows or 0) + int(rows)
+        if nbytes is not None:
+            self.bytes = (self.bytes or 0) + int(nbytes)
+
+    def record_frame(self, frame):
+        """
+        Record the rows and in-memory size of a DataFrame processed by the step.
+        """
+        self.record(rows=len(frame), nbytes=frame.memory_usage(index=True, deep=False).sum())
+
+    def record_file(self, file_path):
+        """
+        Record the size of a file read or written by the step.
+        """
+        if os.path.isfile(file_path):
+            self.record(nbytes=os.path.getsize(file_path))
+        elif os.path.isdir(file_path):
+            self.record(nbytes=sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(file_path) for name in names
+            ))
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "seconds": self.seconds,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "rss_growth_mb": self.rss_growth_mb,
+            "traced_peak_mb": self.traced_peak_mb,
+        }
+
+
+class StageRun:
+    """
+    Instrumentation for one run of a pipeline stage.
+
+    Collects timed spans, the peak RSS of the process (and how much the run and each span
+    raised it) and, when enabled, a cProfile capture of the whole run and tracemalloc
+    peaks per span. On exit the run is appended to the run log as one JSON line.
+    """
+
+    def __init__(self, stage, profile=None, run_log_file=RUN_LOG_FILE, metadata=None):
+        if profile is None:
+            profile = os.environ.get(PROFILE_ENV_VAR, "")
+        if isinstance(profile, str):
+            profile = [name.strip() for name in profile.split(",") if name.strip()]
+        self.stage = stage
+        self.profile = set(profile)
+        self.run_log_file = run_log_file
+        self.metadata = dict(metadata or {})
+        self.run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.spans = []
+        self._stack = []
+        # Traced peak of each open span so far, excluding the part since the last reset
+        self._traced_peaks = []
+        self._profiler = None
+
+    def __enter__(self):
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self._start_rss_mb = get_peak_rss_mb()
+        if "tracemalloc" in self.profile and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if "cprofile" in self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        _active_runs.append(self)
+        return self
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """
+        Time one step of the run. Nested spans are named after their parents ('compute/beta').
+        """
+        span = Span("/".join(self._stack + [name]))
+        self._stack.append(name)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Resetting the peak would lose the enclosing span's: keep it on the stack
+            self._fold_traced_peak()
+            self._traced_peaks.append(0)
+            tracemalloc.reset_peak()
+        start_rss_mb = get_peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span.seconds = round(time.perf_counter() - start, 6)
+            end_rss_mb = get_peak_rss_mb()
+            if start_rss_mb is not None and end_rss_mb is not None:
+                span.rss_growth_mb = round(end_rss_mb - start_rss_mb, 3)
+            if tracing and tracemalloc.is_tracing():
+                self._fold_traced_peak()
+                peak = self._traced_peaks.pop()
+                span.traced_peak_mb = round(peak / 2 ** 20, 3)
+                if self._traced_peaks:
+                    self._traced_peaks[-1] = max(self._traced_peaks[-1], peak)
+                tracemalloc.reset_peak()
+            self._stack.pop()
+            self.spans.append(span)
+            logger.debug(f"[{self.stage}] {span.name} took {span.seconds:.3f} s")
+
+    def _fold_traced_peak(self):
+        """
+        Fold the traced peak since the last reset into the innermost open span's peak.
+        """
+        if self._traced_peaks:
+            self._traced_peaks[-1] = max(self._traced_peaks[-1], tracemalloc.get_traced_memory()[1])
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active_runs.remove(self)
+        seconds = round(time.perf_counter() - self._start, 6)
+        profile_file = None
+        if self._profiler is not None:
+            self._profiler.disable()
+            profile_file = self._save_profile()
+        if "tracemalloc" in self.profile and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+        peak_rss_mb = get_peak_rss_mb()
+        record = {
+            "run_id": self.run_id,
+            "stage": self.stage,
+            "started_at": self.started_at,
+            "seconds": seconds,
+            "status": "failed" if exc_type else "succeeded",
+            "error": str(exc_value) if exc_value else None,
+            "process_peak_rss_mb": peak_rss_mb,
+            "rss_growth_mb": round(peak_rss_mb - self._start_rss_mb, 3) if peak_rss_mb is not None else None,
+            "profile_file": profile_file,
+            "metadata": self.metadata,
+            "spans": [span.to_dict() for span in self.spans],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.run_log_file), exist_ok=True)
+            with open(self.run_log_file, "a") as log_file:
+                log_file.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write the run log: {e}")
+
+        logger.info(
+            f"[{self.stage}] run {self.run_id} {record['status']} in {seconds:.3f} s "
+            f"(process peak RSS {record['process_peak_rss_mb']} MB, +{record['rss_growth_mb']} MB): "
+            + ", ".join(f"{span.name}={span.seconds:.3f}s" for span in self.spans if "/" not in span.name)
+        )
+        return False
+
+    def _save_profile(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_file = os.path.join(PROFILE_DIR, f"{self.stage}-{self.run_id}.prof")
+        self._profiler.dump_stats(profile_file)
+        summary = io.StringIO()
+        pstats.Stats(self._profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+        logger.info(f"[{self.stage}] cProfile saved to {profile_file}\n{summary.getvalue()}")
+        return profile_file
+
+
+def stage_run(stage, profile=None, **metadata):
+    """
+    Start instrumenting a stage run: `with stage_run("clean_stock_data") as run: ...`.
+
+    Args:
+        stage (str): Name of the pipeline stage.
+        profile (str | list[str], optional): Profilers to enable ('cprofile', 'tracemalloc').
+            Defaults to the ECOFIN360_PROFILE environment variable.
+        **metadata: Extra values stored with the run (e.g. the input file).
+
+    Returns:
+        StageRun: Context manager recording the run.
+    """
+    return StageRun(stage, profile=profile, metadata=metadata)
+
+
+@contextlib.contextmanager
+def span(name):
+    """
+    Time a step within the active stage run; does nothing outside of a run.
+    """
+    if not _active_runs:
+        yield Span(name)
+        return
+    with _active_runs[-1].span(name) as active_span:
+        yield active_span
+
+
+def timed(name=None):
+    """
+    Decorator recording each call of a function as a span of the active stage run.
+    """
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _active_runs:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def load_run_log(run_log_file=RUN_LOG_FILE):
+    """
+    Load the run log as one row per span, for querying durations and memory over time.
+
+    Spans repeated within a run (e.g. a timed function called per chunk) appear once per call.
+
+    Returns:
+        pd.DataFrame: Columns 'run_id', 'stage', 'started_at', 'status', 'run_seconds',
+        'process_peak_rss_mb', 'run_rss_growth_mb' and the span fields ('span', 'seconds',
+        'rows', 'bytes', 'rss_growth_mb', 'traced_peak_mb').
+    """
+    import pandas as pd
+
+    rows = []
+    if os.path.exists(run_log_file):
+        with open(run_log_file) as log_file:
+            for line in log_file:
+                if not line.strip():
+                    continue
+                run = json.loads(line)
+                base = {
+                    "run_id": run["run_id"],
+                    "stage": run["stage"],
+                    "started_at": run["started_at"],
+                    "status": run["status"],
+                    "run_seconds": run["seconds"],
+                    "process_peak_rss_mb": run.get("process_peak_rss_mb"),
+                    "run_rss_growth_mb": run.get("rss_growth_mb"),
+                }
+                for run_span in run["spans"] or [{"name": None}]:
+                    row = dict(base, **{key: value for key, value in run_span.items() if key != "name"})
+                    row["span"] = run_span["name"]
+                    rows.append(row)
+
+    log = pd.DataFrame(rows, columns=[
+        "run_id", "stage", "started_at", "status", "run_seconds", "process_peak_rss_mb", "run_rss_growth_mb",
+        "span", "seconds", "rows", "bytes", "rss_growth_mb", "traced_peak_mb",
+    ])
+    log["started_at"] = pd.to_datetime(log["started_at"])
+    return log
+
+
+def export_run_log(parquet_file, run_log_file=RUN_LOG_FILE):
+    """
+    Export the run log (one row per span) to a Parquet file.
+    """
+    log = load_run_log(run_log_file)
+    os.makedirs(os.path.dirname(parquet_file) or ".", exist_ok=True)
+    log.to_parquet(parquet_file, index=False, engine="pyarrow")
+    return log
+
+
+def find_regressions(log, window=10, threshold=1.5):
+    """
+    Find spans whose latest successful run is slower than the recent median.
+
+    A span repeated within a run (e.g. a timed function called once per chunk) is compared
+    on its total time in the run, so its calls are not mistaken for separate runs.
+
+    Args:
+        log (pd.DataFrame): Run log loaded with `load_run_log`.
+        window (int): Number of previous successful runs used for the median.
+        threshold (float): Ratio of latest to median duration considered a regression.
+
+    Returns:
+        pd.DataFrame: One row per regressed (stage, span) with the latest and median durations
+        (total seconds per run).
+    """
+    import pandas as pd
+
+    log = log[(log["status"] == "succeeded") & log["span"].notna()]
+    per_run = log.groupby(["stage", "span", "run_id"], as_index=False).agg(
+        started_at=("started_at", "min"), seconds=("seconds", "sum"),
+    ).sort_values("started_at", kind="stable")
+    regressions = []
+    for (stage, span_name), history in per_run.groupby(["stage", "span"]):
+        if len(history) < 2:
+            continue
+        latest = history["seconds"].iloc[-1]
+        median = history["seconds"].iloc[-window - 1:-1].median()
+        if median > 0 and latest > median * threshold:
+            regressions.append({
+                "stage": stage, "span": span_name, "latest_seconds": latest,
+                "median_seconds": median, "ratio": round(latest / median, 3),
+            })
+    return pd.DataFrame(regressions, columns=["stage", "span", "latest_seconds", "median_seconds", "ratio"])
@@ -0,0 +1,121 @@
+from datetime import date, timedelta
+from functools import lru_cache
+
+# NYSE trading calendar, computed locally from the exchange's holiday rules.
+# This module only uses the standard library so the CLI checks can use it before pandas & co.
+# The rules are those in force since 1971 (Monday holidays); Martin Luther King Jr. Day is a
+# holiday from 1998 and Juneteenth from 2022.
+
+# Unscheduled full-day closures (national days of mourning, weather, 9/11)
+SPECIAL_CLOSURES = {
+    date(1985, 9, 27): "Hurricane Gloria",
+    date(1994, 4, 27): "Funeral of President Nixon",
+    date(2001, 9, 11): "September 11 attacks",
+    date(2001, 9, 12): "September 11 attacks",
+    date(2001, 9, 13): "September 11 attacks",
+    date(2001, 9, 14): "September 11 attacks",
+    date(2004, 6, 11): "Funeral of President Reagan",
+    date(2007, 1, 2): "Funeral of President Ford",
+    date(2012, 10, 29): "Hurricane Sandy",
+    date(2012, 10, 30): "Hurricane Sandy",
+    date(2018, 12, 5): "Funeral of President George H. W. Bush",
+    date(2025, 1, 9): "Funeral of President Carter",
+}
+
+
+def easter_sunday(year: int) -> date:
+    """
+    Get the date of Easter Sunday (Gregorian calendar, anonymous computus).
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """
+    Get the n-th given weekday (Monday=0) of a month; n=-1 is the last one.
+    """
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    """
+    Move a fixed-date holiday falling on a weekend to the nearest weekday (Saturday -> Friday,
+    Sunday -> Monday).
+    """
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def _year_holidays(year: int) -> tuple:
+    holidays = {
+        _nth_weekday(year, 2, 0, 3): "Washington's Birthday",
+        easter_sunday(year) - timedelta(days=2): "Good Friday",
+        _nth_weekday(year, 5, 0, -1): "Memorial Day",
+        _observed(date(year, 7, 4)): "Independence Day",
+        _nth_weekday(year, 9, 0, 1): "Labor Day",
+        _nth_weekday(year, 11, 3, 4): "Thanksgiving Day",
+        _observed(date(year, 12, 25)): "Christmas Day",
+    }
+    # New Year's Day on a Saturday is not observed (the exchange stays open on December 31)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = "New Year's Day"
+    if year >= 1998:
+        holidays[_nth_weekday(year, 1, 0, 3)] = "Martin Luther King Jr. Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = "Juneteenth"
+    holidays.update({day: reason for day, reason in SPECIAL_CLOSURES.items() if day.year == year})
+    return tuple(sorted(holidays.items()))
+
+
+def nyse_holidays(start: date, end: date) -> dict:
+    """
+    Get the NYSE holidays and special closures falling on weekdays between two dates.
+
+    Args:
+        start (date): First date (inclusive).
+        end (date): Last date (inclusive).
+
+    Returns:
+        dict: Date -> holiday name, sorted by date.
+    """
+    return {
+        day: name
+        for year in range(start.year, end.year + 1)
+        for day, name in _year_holidays(year)
+        if start <= day <= end
+    }
+
+
+def is_trading_day(day: date) -> bool:
+    """
+    Check whether the NYSE is open on a date.
+    """
+    return day.weekday() < 5 and day not in dict(_year_holidays(day.year))
+
+
+def trading_days(start: date, end: date) -> list:
+    """
+    List the NYSE trading days between two dates (both inclusive).
+    """
+    holidays = nyse_holidays(start, end)
+    days = (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+    return [day for day in days if day.weekday() < 5 and day not in holidays]
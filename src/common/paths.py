@@ -0,0 +1,142 @@
+import glob
+import os
+import re
+from datetime import datetime
+
+# Data layer locations shared by the pipeline stages and the CLI.
+# This module only uses the standard library so it can be imported before pandas & co.
+# Prices and returns files hold every ticker of every universe ('{yymmdd}-adj-close.csv');
+# the '*adj-close' patterns also match files written before universes ('{yymmdd}-SP500-adj-close.csv').
+BRONZE_STOCKS_DIR = "data/bronze/stocks/"  # Raw tickers and daily prices
+BRONZE_INTRADAY_DIR = "data/bronze/intraday/minute_bars/"  # Minute bars, partitioned by date and ticker
+# Sessions fetched without any bar (e.g. closures missing from the calendar), listed in the store
+EMPTY_SESSIONS_FILE = "_empty_sessions.json"
+SILVER_STOCKS_DIR = "data/silver/stocks/"  # Cleaned prices
+SILVER_RETURNS_DIR = "data/silver/returns/"  # Daily returns
+SILVER_PERFORMANCE_DIR = "data/silver/performance/"  # Annual performance metrics
+SILVER_INTRADAY_DIR = "data/silver/intraday/"  # Resampled intraday bars
+SILVER_LONG_FORMAT_DIR = "data/silver/long/prices_returns/"  # Long-format dataset, partitioned by ticker_id
+SILVER_FEATURES_DIR = "data/silver/features/"  # Forecasting features per ticker and date, partitioned by year
+GOLD_DIR = "data/gold/"  # Precomputed aggregates read by the dashboards
+
+SP500_TICKERS_FILE = os.path.join(BRONZE_STOCKS_DIR, "SP500-tickers.csv")
+
+# Universes whose metrics file keeps the name it had before universes existed
+PERFORMANCE_FILE_LABELS = {"sp500": "SP500-adj-close"}
+
+
+def daily_price_file(date=None) -> str:
+    """
+    Get the path of the bronze adjusted close file for a date (today by default).
+
+    Args:
+        date (datetime, optional): Date of the file.
+
+    Returns:
+        str: Path such as 'data/bronze/stocks/241216-adj-close.csv'.
+    """
+    date = date or datetime.today()
+    return os.path.join(BRONZE_STOCKS_DIR, f"{date:%y%m%d}-adj-close.csv")
+
+
+def cleaned_price_file(raw_file: str) -> str:
+    """
+    Get the path of the silver cleaned prices Parquet file for a bronze adjusted close file.
+
+    Args:
+        raw_file (str): Path such as 'data/bronze/stocks/241216-adj-close.csv'.
+
+    Returns:
+        str: Path such as 'data/silver/stocks/cleaned_241216-adj-close.parquet'.
+    """
+    return os.path.join(SILVER_STOCKS_DIR, f"cleaned_{os.path.basename(raw_file).replace('.csv', '.parquet')}")
+
+
+def long_format_part_name(date_part: str, index="*") -> str:
+    """
+    Get the name of the files appended to the long-format partitions by a run.
+
+    Args:
+        date_part (str): Date part (YYMMDD) of the prices and returns of the run.
+        index (str): File index; '*' gives a glob pattern, '{i}' a pyarrow basename template.
+
+    Returns:
+        str: Name such as 'part-241216-0.parquet'.
+    """
+    return f"part-{date_part}-{index}.parquet"
+
+
+def performance_file_name(date_part: str, universe_name: str, extension: str = ".parquet") -> str:
+    """
+    Get the name of the annual performance metrics file of a universe.
+
+    Args:
+        date_part (str): Date part (YYMMDD) of the daily returns the metrics were computed from.
+        universe_name (str): Universe name (a key of the universes config).
+        extension (str): File extension ('.parquet' or '.csv').
+
+    Returns:
+        str: Name such as 'performance_241216-nasdaq100.parquet' (for the S&P 500 the legacy
+        'performance_241216-SP500-adj-close.parquet').
+    """
+    return f"performance_{date_part}-{PERFORMANCE_FILE_LABELS.get(universe_name, universe_name)}{extension}"
+
+
+def parse_performance_file_name(file_name: str):
+    """
+    Get the date part and universe of an annual performance metrics file.
+
+    Args:
+        file_name (str): Name written by `performance_file_name`.
+
+    Returns:
+        tuple[str, str] | None: The date part and universe name, or None for other files.
+    """
+    match = re.match(r"performance_(\d{6})-(.+)\.parquet$", os.path.basename(file_name))
+    if not match:
+        return None
+    universes = {label: name for name, label in PERFORMANCE_FILE_LABELS.items()}
+    return match.group(1), universes.get(match.group(2), match.group(2))
+
+
+def find_latest_file(directory: str, pattern: str):
+    """
+    Get the most recently modified file matching a glob pattern.
+
+    Args:
+        directory (str): Directory to search.
+        pattern (str): Glob pattern for matching filenames.
+
+    Returns:
+        str | None: Path to the latest file, or None if no file matches.
+    """
+    files = glob.glob(os.path.join(directory, pattern))
+    return max(files, key=os.path.getmtime) if files else None
+
+
+def extract_date_part(file_name: str):
+    """
+    Extract the YYMMDD date part from a pipeline file name.
+
+    Args:
+        file_name (str): File name such as 'returns_cleaned_241216-SP500-adj-close.parquet'.
+
+    Returns:
+        str | None: The date part, or None if the name has none.
+    """
+    match = re.search(r"(?:^|_)(\d{6})-", os.path.basename(file_name))
+    return match.group(1) if match else None
+
+
+def find_returns_file(date_part: str):
+    """
+    Get the daily returns Parquet file computed from the cleaned prices of a date.
+
+    Args:
+        date_part (str): Date part (YYMMDD) of the cleaned prices file.
+
+    Returns:
+        str | None: Path such as 'data/silver/returns/returns_cleaned_241216-adj-close.parquet'
+        (or the older '...-SP500-adj-close.parquet'), or None if there is none.
+    """
+    return find_latest_file(SILVER_RETURNS_DIR, f"returns_cleaned_{date_part}-*adj-close.parquet")
@@ -0,0 +1,80 @@
+import csv
+import json
+import os
+
+# Universe definitions (index constituents or custom watchlists). Each universe names its
+# benchmark ticker and where its tickers come from:
+#   - "tickers_file": CSV with a 'Symbol' column (refreshed by the fetcher for Wikipedia
+#     sources, maintained by hand for "file" sources),
+#   - "tickers": an inline list of symbols (watchlists).
+# A universe with neither is a view over every ticker in the shared price store.
+UNIVERSES_FILE = "config/universes.json"
+DEFAULT_UNIVERSE = "sp500"
+
+
+def load_universes(config_file: str = UNIVERSES_FILE) -> dict:
+    """
+    Load the universe definitions.
+
+    Args:
+        config_file (str): Path to the JSON file mapping universe names to their definition.
+
+    Returns:
+        dict: Universe name -> definition (with its 'name' filled in).
+
+    Raises:
+        ValueError: If a universe has no benchmark ticker.
+    """
+    with open(config_file) as universes_file:
+        universes = json.load(universes_file)
+    for name, universe in universes.items():
+        universe["name"] = name
+        if not universe.get("benchmark"):
+            raise ValueError(f"Universe '{name}' in '{config_file}' has no benchmark ticker.")
+    return universes
+
+
+def get_universe(name: str = DEFAULT_UNIVERSE, config_file: str = UNIVERSES_FILE) -> dict:
+    """
+    Get one universe definition by name.
+
+    Raises:
+        ValueError: If the universe is not configured.
+    """
+    universes = load_universes(config_file)
+    if name not in universes:
+        raise ValueError(f"Unknown universe '{name}'. Configured universes: {', '.join(universes)}.")
+    return universes[name]
+
+
+def load_universe_tickers(universe: dict):
+    """
+    Get the tickers of a universe (without its benchmark).
+
+    Returns:
+        list[str] | None: The tickers, an empty list if the tickers file does not exist yet,
+        or None for a universe spanning every ticker in the store.
+    """
+    if "tickers" in universe:
+        return list(universe["tickers"])
+    tickers_file = universe.get("tickers_file")
+    if tickers_file is None:
+        return None
+    if not os.path.exists(tickers_file):
+        return []
+    with open(tickers_file, newline="") as symbols_file:
+        return [row["Symbol"] for row in csv.DictReader(symbols_file) if row.get("Symbol")]
+
+
+def load_all_tickers(universes: dict) -> list:
+    """
+    Get the union of the tickers and benchmarks of several universes, each ticker once.
+
+    Tickers keep the order in which they first appear, so overlapping universes share a
+    single column (and a single download) per ticker.
+    """
+    tickers = {}
+    for universe in universes.values():
+        for ticker in (load_universe_tickers(universe) or []) + [universe["benchmark"]]:
+            tickers.setdefault(ticker, None)
+    return list(tickers)
@@ -0,0 +1,330 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+from common.instrumentation import timed
+from common.paths import extract_date_part
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Raw (unadjusted) closing prices and the corporate actions needed to adjust them,
+# shared by all universes (one column / set of actions per ticker)
+RAW_CLOSE_FILE = "data/bronze/stocks/raw-close.csv"
+CORPORATE_ACTIONS_FILE = "data/bronze/stocks/corporate-actions.csv"
+# Tickers whose adjusted history was restated by new actions, with the date of the price file
+# that first includes the restatement (incremental downstream stages rebuild them)
+RESTATEMENTS_FILE = "data/bronze/stocks/restatements.csv"
+
+ACTION_COLUMNS = ["Date", "Symbol", "Action", "Value"]
+DIVIDEND = "dividend"
+SPLIT = "split"
+
+
+def _empty_actions() -> pd.DataFrame:
+    """
+    Return an empty corporate actions table.
+    """
+    return pd.DataFrame({
+        "Date": pd.Series(dtype="datetime64[ns]"),
+        "Symbol": pd.Series(dtype="object"),
+        "Action": pd.Series(dtype="object"),
+        "Value": pd.Series(dtype="float64"),
+    })
+
+
+def load_raw_closes(file_path: str) -> pd.DataFrame:
+    """
+    Load the raw closing prices (dates x tickers).
+
+    Args:
+        file_path (str): Path to the raw closes CSV.
+
+    Returns:
+        pd.DataFrame: Raw closes indexed by 'Date', or an empty frame if the file does not exist.
+    """
+    if not os.path.exists(file_path):
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="Date"))
+    return pd.read_csv(file_path, index_col="Date", parse_dates=["Date"])
+
+
+def load_corporate_actions(file_path: str) -> pd.DataFrame:
+    """
+    Load the corporate actions table.
+
+    Each row is one action on its ex-date: a cash dividend ('dividend', value = amount
+    per share) or a stock split ('split', value = new shares per old share).
+
+    Args:
+        file_path (str): Path to the corporate actions CSV.
+
+    Returns:
+        pd.DataFrame: Actions with 'Date', 'Symbol', 'Action' and 'Value' columns.
+    """
+    if not os.path.exists(file_path):
+        return _empty_actions()
+    return pd.read_csv(file_path, parse_dates=["Date"])[ACTION_COLUMNS]
+
+
+def save_raw_closes(closes: pd.DataFrame, file_path: str) -> None:
+    """
+    Save the raw closing prices (dates x tickers).
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    closes.to_csv(file_path, index=True, index_label="Date")
+
+
+def save_corporate_actions(actions: pd.DataFrame, file_path: str) -> None:
+    """
+    Save the corporate actions table.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    actions[ACTION_COLUMNS].to_csv(file_path, index=False, date_format="%Y-%m-%d")
+
+
+def actions_from_wide(dividends: pd.DataFrame, splits: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert wide dividend and split frames (dates x tickers, 0 when nothing happened)
+    into rows of the corporate actions table.
+
+    Args:
+        dividends (pd.DataFrame): Dividend amounts per share.
+        splits (pd.DataFrame): Split ratios.
+
+    Returns:
+        pd.DataFrame: Actions with 'Date', 'Symbol', 'Action' and 'Value' columns.
+    """
+    frames = []
+    for action, wide in ((DIVIDEND, dividends), (SPLIT, splits)):
+        if wide is None or wide.empty:
+            continue
+        values = wide.to_numpy(dtype="float64")
+        rows, columns = np.nonzero(np.nan_to_num(values) != 0)
+        frames.append(pd.DataFrame({
+            "Date": wide.index.to_numpy()[rows],
+            "Symbol": wide.columns.to_numpy()[columns],
+            "Action": action,
+            "Value": values[rows, columns],
+        }))
+    if not frames:
+        return _empty_actions()
+    return pd.concat(frames, ignore_index=True)
+
+
+def append_corporate_actions(actions: pd.DataFrame, new_actions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Append new actions to the table, ignoring actions that are already recorded.
+
+    Args:
+        actions (pd.DataFrame): Existing corporate actions.
+        new_actions (pd.DataFrame): Newly fetched corporate actions.
+
+    Returns:
+        pd.DataFrame: Combined actions sorted by date and ticker.
+    """
+    combined = pd.concat([actions, new_actions], ignore_index=True)
+    combined = combined.drop_duplicates(subset=["Date", "Symbol", "Action"], keep="first")
+    return combined.sort_values(["Date", "Symbol"], ignore_index=True)
+
+
+def get_tickers_with_new_actions(actions: pd.DataFrame, since) -> list:
+    """
+    Get the tickers whose adjusted history changed because of actions on or after a date.
+
+    Downstream incremental stages only need to recompute these tickers; every other
+    ticker's adjusted history is unchanged apart from the newly appended days.
+
+    Args:
+        actions (pd.DataFrame): Corporate actions.
+        since (str | pd.Timestamp): Earliest ex-date to consider.
+
+    Returns:
+        list[str]: Sorted list of affected tickers.
+    """
+    return sorted(actions.loc[actions["Date"] >= pd.Timestamp(since), "Symbol"].unique())
+
+
+def record_restatements(tickers, date, file_path: str = RESTATEMENTS_FILE) -> None:
+    """
+    Record that the adjusted history of some tickers changed in the price file of a date.
+
+    Args:
+        tickers (list[str]): Tickers with new corporate actions.
+        date (str | pd.Timestamp): Date of the adjusted price file first including the change.
+        file_path (str): Path to the restatements CSV.
+    """
+    if not tickers:
+        return
+    restatements = pd.DataFrame({"Date": pd.Timestamp(date).normalize(), "Symbol": sorted(tickers)})
+    if os.path.exists(file_path):
+        restatements = pd.concat([pd.read_csv(file_path, parse_dates=["Date"]), restatements], ignore_index=True)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    restatements = restatements.drop_duplicates(ignore_index=True).sort_values(["Date", "Symbol"])
+    restatements.to_csv(file_path, index=False, date_format="%Y-%m-%d")
+
+
+def load_restated_tickers(since, file_path: str = RESTATEMENTS_FILE) -> list:
+    """
+    Get the tickers whose adjusted history was restated in price files dated after `since`.
+
+    Args:
+        since (str | pd.Timestamp): Date of the price file a stage last processed.
+        file_path (str): Path to the restatements CSV.
+
+    Returns:
+        list[str]: Sorted list of restated tickers.
+    """
+    if not os.path.exists(file_path):
+        return []
+    restatements = pd.read_csv(file_path, parse_dates=["Date"])
+    return sorted(restatements.loc[restatements["Date"] > pd.Timestamp(since), "Symbol"].unique())
+
+
+def restated_since(file_name: str, file_path: str = RESTATEMENTS_FILE) -> list:
+    """
+    Get the tickers restated in price files newer than the one a pipeline file was derived
+    from (e.g. the returns file an incremental stage last processed).
+
+    Args:
+        file_name (str): Pipeline file name with a YYMMDD date part.
+        file_path (str): Path to the restatements CSV.
+
+    Returns:
+        list[str]: Sorted list of restated tickers (empty if the name has no date).
+    """
+    date_part = extract_date_part(file_name)
+    if date_part is None:
+        return []
+    return load_restated_tickers(pd.to_datetime(date_part, format="%y%m%d"), file_path)
+
+
+@timed()
+def calculate_adjustment_factors(closes: pd.DataFrame, actions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculate cumulative backward adjustment factors (dates x tickers).
+
+    Each action contributes a factor to every date before its ex-date: `1 / ratio` for
+    a split and `1 - dividend / previous close` for a cash dividend (the same convention
+    as Yahoo Finance's adjusted close). Factors are scattered into an event matrix at
+    the ex-date rows, and the cumulative factor for each date is the reverse cumulative
+    product of the event rows after it.
+
+    Args:
+        closes (pd.DataFrame): Raw closes indexed by date.
+        actions (pd.DataFrame): Corporate actions.
+
+    Returns:
+        pd.DataFrame: Adjustment factors with the same shape as `closes`.
+    """
+    n_dates = len(closes.index)
+    events = np.ones((n_dates + 1, closes.shape[1]))
+
+    columns = closes.columns.get_indexer(actions["Symbol"])
+    rows = np.searchsorted(closes.index.to_numpy(), actions["Date"].to_numpy(dtype="datetime64[ns]"), side="left")
+    # Actions on the first date (nothing before them) or after the last date have no effect
+    valid = (columns >= 0) & (rows > 0) & (rows < n_dates)
+    rows, columns = rows[valid], columns[valid]
+    values = actions["Value"].to_numpy(dtype="float64")[valid]
+    is_split = (actions["Action"].to_numpy() == SPLIT)[valid]
+
+    previous_closes = closes.ffill().to_numpy(dtype="float64")[rows - 1, columns]
+    factors = np.where(is_split, 1.0 / values, 1.0 - values / previous_closes)
+    factors = np.where(np.isfinite(factors) & (factors > 0), factors, 1.0)
+    np.multiply.at(events, (rows, columns), factors)
+
+    # factor[t] = product of the events strictly after t
+    cumulative = np.cumprod(events[::-1], axis=0)[::-1]
+    return pd.DataFrame(cumulative[1:], index=closes.index, columns=closes.columns)
+
+
+@timed()
+def adjust_prices(closes: pd.DataFrame, actions: pd.DataFrame, tickers=None) -> pd.DataFrame:
+    """
+    Compute split- and dividend-adjusted closes from raw closes and corporate actions.
+
+    Args:
+        closes (pd.DataFrame): Raw closes indexed by date.
+        actions (pd.DataFrame): Corporate actions.
+        tickers (list[str], optional): Only adjust these tickers (e.g. the ones returned by
+            `get_tickers_with_new_actions`). Adjusts all tickers if None.
+
+    Returns:
+        pd.DataFrame: Adjusted closes.
+    """
+    if tickers is not None:
+        closes = closes[closes.columns.intersection(tickers)]
+        actions = actions[actions["Symbol"].isin(closes.columns)]
+    return closes * calculate_adjustment_factors(closes, actions)
+
+
+def unadjust_splits(closes: pd.DataFrame, actions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Undo the split adjustment Yahoo Finance applies to the closes it returns.
+
+    Yahoo's 'Close' (even with `auto_adjust=False`) is split-adjusted as of the fetch, so in
+    a window fetched incrementally the days before a split are already divided by its ratio,
+    unlike the closes stored before the window. Multiplying them back by the ratio of every
+    later split in the window gives raw closes on the same basis as the stored ones, so
+    `adjust_prices` applies each split exactly once.
+
+    Args:
+        closes (pd.DataFrame): Closes of the fetched window indexed by date.
+        actions (pd.DataFrame): Corporate actions of the fetched window.
+
+    Returns:
+        pd.DataFrame: Raw closes of the window.
+    """
+    splits = actions[actions["Action"] == SPLIT]
+    if splits.empty:
+        return closes
+    return closes / calculate_adjustment_factors(closes, splits)
+
+
+def unadjust_dividends(actions: pd.DataFrame, closes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Undo the split adjustment Yahoo Finance applies to the dividends it returns.
+
+    Like the closes (see `unadjust_splits`), dividends paid before a split in an incrementally
+    fetched window come back divided by its ratio. Multiplying them back by the ratio of every
+    later split in the window gives per-share amounts on the same basis as the raw closes.
+
+    Args:
+        actions (pd.DataFrame): Corporate actions of the fetched window.
+        closes (pd.DataFrame): Closes of the fetched window indexed by date.
+
+    Returns:
+        pd.DataFrame: The actions with raw dividend amounts.
+    """
+    splits = actions[actions["Action"] == SPLIT]
+    is_dividend = (actions["Action"] == DIVIDEND).to_numpy()
+    if splits.empty or not is_dividend.any():
+        return actions
+    factors = calculate_adjustment_factors(closes, splits)
+    dividends = actions[is_dividend]
+    rows = factors.index.get_indexer(dividends["Date"])
+    columns = factors.columns.get_indexer(dividends["Symbol"])
+    # Dividends outside the window's closes are left as fetched
+    known = (rows >= 0) & (columns >= 0)
+    divisors = np.ones(len(dividends))
+    divisors[known] = factors.to_numpy()[rows[known], columns[known]]
+    actions = actions.copy()
+    actions.loc[is_dividend, "Value"] = dividends["Value"].to_numpy() / divisors
+    return actions
+
+
+def adjusted_returns(closes: pd.DataFrame, actions: pd.DataFrame, tickers=None) -> pd.DataFrame:
+    """
+    Compute total daily returns (price change plus dividends, split-neutral) on demand.
+
+    Args:
+        closes (pd.DataFrame): Raw closes indexed by date.
+        actions (pd.DataFrame): Corporate actions.
+        tickers (list[str], optional): Only compute these tickers. Computes all tickers if None.
+
+    Returns:
+        pd.DataFrame: Daily returns.
+    """
+    return adjust_prices(closes, actions, tickers).pct_change(fill_method=None)
@@ -1,14 +1,31 @@
 import pandas as pd
 import yfinance as yf  # For fetching stock data
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 
-SP500_TICKERS_FILE = "data/bronze/stocks/SP500-tickers.csv"
-DAILY_PRICE_DIR = "data/bronze/stocks/"
-
-# Ensure the daily price directory exists
-if not os.path.exists(DAILY_PRICE_DIR):
-    os.makedirs(DAILY_PRICE_DIR)
+from common.instrumentation import stage_run, timed
+from common.market_calendar import trading_days
+from common.paths import BRONZE_STOCKS_DIR, daily_price_file
+from common.universes import load_all_tickers, load_universes
+from data_engineering.corporate_actions import (
+    CORPORATE_ACTIONS_FILE,
+    RAW_CLOSE_FILE,
+    SPLIT,
+    actions_from_wide,
+    adjust_prices,
+    append_corporate_actions,
+    get_tickers_with_new_actions,
+    load_corporate_actions,
+    load_raw_closes,
+    record_restatements,
+    save_corporate_actions,
+    save_raw_closes,
+    unadjust_dividends,
+    unadjust_splits,
+)
+
+DAILY_PRICE_DIR = BRONZE_STOCKS_DIR
+HISTORY_START_DATE = "1995-01-01"
 
 
 def load_csv(file_path, index_col=None):
@@ -27,49 +44,141 @@ def save_csv(dataframe, file_path):
     """
     Save a DataFrame to a CSV file.
     """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
     dataframe.to_csv(file_path, index=True)
     print(f"Data successfully saved to {file_path}")
 
 
-def fetch_all_data(tickers, end_date):
+@timed()
+def fetch_raw_data(tickers, start_date, end_date):
     """
-    Fetch adjusted closing prices for all tickers from Yahoo Finance.
+    Fetch unadjusted closing prices and corporate actions from Yahoo Finance.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: Raw closes (dates x tickers) and the corporate
+        actions (dividends and splits) in the fetched period; empty if Yahoo returned nothing.
+
+    Raises:
+        RuntimeError: If the download fails.
     """
     try:
-        print("Fetching adjusted closing prices for all tickers...")
-        all_data = yf.download(tickers,start= '1995-01-01', end=end_date)['Adj Close']
-        return all_data
+        print(f"Fetching raw closing prices and corporate actions from {start_date}...")
+        data = yf.download(tickers, start=start_date, end=end_date, auto_adjust=False, actions=True)
     except Exception as e:
-        print(f"Error fetching data from Yahoo Finance: {e}")
-        return pd.DataFrame()  # Return an empty DataFrame in case of failure
+        raise RuntimeError(f"Error fetching data from Yahoo Finance: {e}")
+    if data.empty:
+        return pd.DataFrame(), actions_from_wide(None, None)
+    actions = actions_from_wide(data.get("Dividends"), data.get("Stock Splits"))
+    return data["Close"], actions
+
+
+def update_raw_history(tickers, end_date):
+    """
+    Bring the raw closes and corporate actions up to date, fetching only what is missing.
+
+    Tickers already in the raw store are fetched from the day after the last stored date;
+    new tickers get their full history. Yahoo's unadjusted 'Close' history is already
+    split-adjusted at fetch time, so splits are only recorded for incremental fetches
+    (where the stored closes predate the split), and the window's closes before such a
+    split are un-adjusted (see `unadjust_splits`), as are the window's dividends before it
+    (see `unadjust_dividends`); dividends are always recorded.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, list[str]]: Raw closes, corporate actions, and the
+        tickers whose adjusted history changed because of new actions.
+
+    Raises:
+        RuntimeError: If the download of the stored tickers fails or returns nothing for a
+            window with trading days (nothing is saved then).
+    """
+    closes = load_raw_closes(RAW_CLOSE_FILE)
+    actions = load_corporate_actions(CORPORATE_ACTIONS_FILE)
+
+    known = [ticker for ticker in tickers if ticker in closes.columns]
+    new = [ticker for ticker in tickers if ticker not in closes.columns]
+    fetched_closes, fetched_actions = [], []
+    affected = []
+
+    if known:
+        start_date = (closes.index.max() + timedelta(days=1)).strftime('%Y-%m-%d')
+        if start_date < end_date:
+            recent_closes, recent_actions = fetch_raw_data(known, start_date, end_date)
+            last_day = (pd.Timestamp(end_date) - timedelta(days=1)).date()
+            if recent_closes.empty and trading_days(pd.Timestamp(start_date).date(), last_day):
+                raise RuntimeError(f"No prices fetched for the trading days from {start_date} to {last_day}.")
+            fetched_closes.append(unadjust_splits(recent_closes, recent_actions))
+            fetched_actions.append(unadjust_dividends(recent_actions, recent_closes))
+            affected = get_tickers_with_new_actions(recent_actions, start_date)
+
+    if new:
+        history_closes, history_actions = fetch_raw_data(new, HISTORY_START_DATE, end_date)
+        if history_closes.empty:
+            print(f"No price history fetched for the {len(new)} new tickers.")
+        fetched_closes.append(history_closes)
+        fetched_actions.append(history_actions[history_actions["Action"] != SPLIT])
+
+    for frame in fetched_closes:
+        if not frame.empty:
+            # Full-history fetches of new tickers overlap the stored dates; align by date and ticker
+            closes = frame.combine_first(closes) if not closes.empty else frame
+    if any(not frame.empty for frame in fetched_closes):
+        closes.index.name = "Date"
+        save_raw_closes(closes, RAW_CLOSE_FILE)
+
+    for frame in fetched_actions:
+        if not frame.empty:
+            actions = append_corporate_actions(actions, frame)
+    if any(not frame.empty for frame in fetched_actions):
+        save_corporate_actions(actions, CORPORATE_ACTIONS_FILE)
+
+    if affected:
+        print(f"New corporate actions for {len(affected)} tickers: {', '.join(affected)}")
+    return closes, actions, affected
 
 
 def save_daily_prices():
     """
-    Save daily stock prices for all S&P 500 tickers to a separate CSV file.
+    Save daily stock prices for the tickers and benchmarks of every configured universe
+    to a separate CSV file. Tickers shared by several universes are fetched and stored once.
+
+    Adjusted closes are computed locally from the raw closes and corporate actions, so
+    only the days since the previous run (and the full history of new tickers) are fetched.
     """
     # Determine today's file name
     today_date = datetime.today().strftime('%y%m%d')
-    daily_file_path = os.path.join(DAILY_PRICE_DIR, f"{today_date}-SP500-adj-close.csv")
+    daily_file_path = daily_price_file()
     if os.path.exists(daily_file_path):
         print(f"Data for {today_date} already exists. Skipping data fetch.")
         return
 
-    # Load tickers
-    tickers = load_csv(SP500_TICKERS_FILE)["Symbol"].tolist()  # Convert column to list
-    if not tickers:
-        raise RuntimeError("No tickers found. Please fetch tickers first.")
-
-    # Fetch data for all tickers
-    today_date_full = datetime.today().strftime('%Y-%m-%d')
-    all_data = fetch_all_data(tickers, today_date_full)
-
-    if all_data.empty:
-        print("No data fetched for any tickers.")
-        return
-
-    # Save the fetched data to today's file
-    save_csv(all_data, daily_file_path)
+    with stage_run("download_historical_prices") as run:
+        # Load the tickers of all universes
+        with run.span("load"):
+            universes = load_universes()
+            tickers = load_all_tickers(universes)
+        if not set(tickers) - {universe["benchmark"] for universe in universes.values()}:
+            raise RuntimeError("No tickers found. Please fetch tickers first.")
+
+        # Bring the raw closes and corporate actions up to date, then adjust them locally
+        today_date_full = datetime.today().strftime('%Y-%m-%d')
+        with run.span("fetch") as fetch_span:
+            closes, actions, affected = update_raw_history(tickers, today_date_full)
+            fetch_span.record(rows=len(closes))
+
+        if closes.empty:
+            print("No data fetched for any tickers.")
+            return
+
+        with run.span("compute") as compute_span:
+            all_data = adjust_prices(closes[closes.columns.intersection(tickers)], actions)
+            compute_span.record_frame(all_data)
+
+        # Save the fetched data to today's file
+        with run.span("write") as write_span:
+            save_csv(all_data, daily_file_path)
+            write_span.record_file(daily_file_path)
+            # Incremental downstream stages (gold tables, feature store) rebuild these tickers' history
+            record_restatements(affected, datetime.today())
     print(f"Daily prices saved to {daily_file_path}")
 
 
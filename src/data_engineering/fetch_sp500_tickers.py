@@ -1,10 +1,38 @@
+import json
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import os
 
-# File path for S&P 500 tickers
-SP500_TICKERS_FILE = "data/bronze/stocks/SP500-tickers.csv"
+from common.instrumentation import stage_run
+from common.paths import SP500_TICKERS_FILE
+from data_engineering.sp500_membership import (
+    SP500_CHANGE_LOG_FILE,
+    SP500_MEMBERSHIP_FILE,
+    change_events,
+    load_change_log,
+    load_membership_history,
+    recorded_events,
+    save_change_log,
+    save_membership_history,
+    update_membership_history,
+)
+
+try:
+    import lxml.html  # Fast C parser, used when available
+except ImportError:
+    lxml = None
+
+# On-disk cache of the Wikipedia page (body + ETag/Last-Modified validators)
+WIKIPEDIA_URL = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+WIKIPEDIA_CACHE_DIR = "data/bronze/cache/"
+WIKIPEDIA_CACHE_FILE = os.path.join(WIKIPEDIA_CACHE_DIR, "wikipedia-sp500.html")
+WIKIPEDIA_CACHE_META_FILE = os.path.join(WIKIPEDIA_CACHE_DIR, "wikipedia-sp500.json")
+
+# Constituents table columns kept in the tickers file
+CONSTITUENT_COLUMNS = ["Symbol", "Security", "GICS Sector", "GICS Sub-Industry", "CIK"]
+
+_session = None
 
 
 def save_csv(data, file_path, index=False):
@@ -20,62 +48,262 @@ def save_csv(data, file_path, index=False):
         raise ValueError("Data must be a dictionary or pandas DataFrame.")
 
 
-def load_csv(file_path, index_col=None):
+def load_csv(file_path, index_col=None, dtype=None):
     """
     Load a CSV file and return its content as a pandas DataFrame.
     """
     if os.path.exists(file_path):
-        return pd.read_csv(file_path, index_col=index_col)
+        return pd.read_csv(file_path, index_col=index_col, dtype=dtype)
     else:
         if index_col:
             return pd.DataFrame(columns=[index_col])
         return pd.DataFrame()
 
 
-def fetch_sp500_tickers_from_wikipedia():
+def get_session():
+    """
+    Return the persistent HTTP session shared by all requests of this module.
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update({"User-Agent": "EcoFin360/1.0 (S&P 500 constituents scraper)"})
+    return _session
+
+
+def fetch_wikipedia_page(url, cache_file, cache_meta_file, timeout=30):
     """
-    Fetch the current list of S&P 500 tickers from Wikipedia.
+    Fetch a Wikipedia page, using a conditional request.
+
+    The ETag and Last-Modified validators of the previous response are stored next to a
+    cached copy of the page; when Wikipedia answers 304 Not Modified the cached page is
+    returned instead of downloading it again. A new page is not cached here: the caller
+    saves it with `save_wikipedia_page` once it has been processed, so a run failing after
+    the download fetches the page again instead of getting a 304.
+
+    Returns:
+        tuple[bytes, dict | None]: The page content, and the validators of a page that changed
+        since the last fetch (None when it did not change).
     """
-    url = "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"
+    headers = {}
+    if os.path.exists(cache_file) and os.path.exists(cache_meta_file):
+        with open(cache_meta_file) as meta_file:
+            meta = json.load(meta_file)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
 
     try:
-        response = requests.get(url)
+        response = get_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            with open(cache_file, "rb") as cached:
+                return cached.read(), None
         response.raise_for_status()
+    except Exception as e:
+        raise RuntimeError(f"Error fetching {url}: {e}")
 
-        soup = BeautifulSoup(response.content, "html.parser")
-        table = soup.find("table", id="constituents")
-        if not table:
-            raise ValueError("S&P 500 table not found on Wikipedia page.")
+    return response.content, {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
 
-        # Replace `.` with `-` in tickers
-        tickers = [
-            row.find_all("td")[0].text.strip().replace(".", "-")
-            for row in table.find_all("tr")[1:]
+
+def save_wikipedia_page(content, validators, cache_file, cache_meta_file):
+    """
+    Cache a fetched page with its validators, used by the next conditional request.
+    """
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with open(cache_file, "wb") as cached:
+        cached.write(content)
+    with open(cache_meta_file, "w") as meta_file:
+        json.dump(validators, meta_file)
+
+
+def fetch_sp500_wikipedia_page(timeout=30):
+    """
+    Fetch the Wikipedia page listing the S&P 500 companies (see `fetch_wikipedia_page`).
+    """
+    return fetch_wikipedia_page(WIKIPEDIA_URL, WIKIPEDIA_CACHE_FILE, WIKIPEDIA_CACHE_META_FILE, timeout=timeout)
+
+
+def extract_table_rows(content, table_id, header=None):
+    """
+    Extract the rows of an HTML table as lists of cell texts.
+
+    Uses lxml when it is installed; otherwise falls back to BeautifulSoup restricted
+    (via `SoupStrainer`) to the target table, so the rest of the page is never built
+    into a tree.
+
+    Args:
+        content (bytes | str): HTML page content.
+        table_id (str | None): The `id` attribute of the table, or None for a table without
+            an id: the first table whose header row contains `header` is used.
+        header (str, optional): Header cell identifying the table when `table_id` is None.
+
+    Returns:
+        tuple[list[str], list[list[str]]]: Header cell texts of the first row, and the
+        `<td>` cell texts of every data row.
+
+    Raises:
+        ValueError: If the table is not found.
+    """
+    name = f"'{table_id}'" if table_id else f"with a '{header}' column"
+    if lxml is not None:
+        root = lxml.html.fromstring(content)
+        tables = root.xpath(f"//table[@id='{table_id}']" if table_id else "//table")
+        table_rows = [table.xpath(".//tr") for table in tables]
+        table_rows = [
+            rows for rows in table_rows
+            if table_id or (rows and header in [cell.text_content().strip() for cell in rows[0].xpath("./th")])
         ]
-        return tickers
-    except Exception as e:
-        raise RuntimeError(f"Error fetching tickers from Wikipedia: {e}")
+        if not table_rows:
+            raise ValueError(f"Table {name} not found on Wikipedia page.")
+        rows = table_rows[0]
+        header_cells = [cell.text_content().strip() for cell in rows[0].xpath("./th")] if rows else []
+        data = [[cell.text_content().strip() for cell in row.xpath("./td")] for row in rows]
+    else:
+        strainer = SoupStrainer("table", id=table_id) if table_id else SoupStrainer("table")
+        table_rows = [table.find_all("tr") for table in BeautifulSoup(content, "html.parser", parse_only=strainer)
+                      .find_all("table")]
+        table_rows = [
+            rows for rows in table_rows
+            if table_id or (rows and header in [cell.text.strip() for cell in rows[0].find_all("th")])
+        ]
+        if not table_rows:
+            raise ValueError(f"Table {name} not found on Wikipedia page.")
+        rows = table_rows[0]
+        header_cells = [cell.text.strip() for cell in rows[0].find_all("th")] if rows else []
+        data = [[cell.text.strip() for cell in row.find_all("td")] for row in rows]
+
+    return header_cells, [row for row in data if row]
+
+
+def parse_constituents(content, table_id="constituents", headers=None):
+    """
+    Extract index constituents with their sector, sub-industry and CIK from a Wikipedia table.
+
+    Args:
+        content (bytes | str): HTML page content.
+        table_id (str | None): The `id` attribute of the constituents table, or None for a
+            table without an id (found by its symbol column, see `extract_table_rows`).
+        headers (dict, optional): Page header for each of the `CONSTITUENT_COLUMNS` when it
+            differs from the column name (e.g. {"Symbol": "Ticker"}).
+
+    Returns:
+        pd.DataFrame: One row per ticker with the columns in `CONSTITUENT_COLUMNS`.
+    """
+    headers = headers or {}
+    header, rows = extract_table_rows(content, table_id, headers.get("Symbol", "Symbol"))
+    positions = {}
+    for name in CONSTITUENT_COLUMNS:
+        page_header = headers.get(name, name)
+        positions[name] = header.index(page_header) if page_header in header else None
+    if positions["Symbol"] is None:
+        positions["Symbol"] = 0
+
+    constituents = pd.DataFrame({
+        name: [row[position] if position is not None and position < len(row) else "" for row in rows]
+        for name, position in positions.items()
+    })
+    # Replace `.` with `-` in tickers
+    constituents["Symbol"] = constituents["Symbol"].str.replace(".", "-", regex=False)
+    return constituents
+
+
+def parse_sp500_constituents(content):
+    """
+    Extract the current S&P 500 constituents with their sector, sub-industry and CIK.
+    """
+    return parse_constituents(content, "constituents")
+
+
+def parse_sp500_tickers(content):
+    """
+    Extract the current S&P 500 tickers from the constituents table.
+    """
+    return parse_sp500_constituents(content)["Symbol"].tolist()
+
+
+def parse_sp500_changes(content):
+    """
+    Extract the historical additions and removals from the "changes" table.
+
+    Returns:
+        pd.DataFrame: One row per change with 'Date', 'Added' and 'Removed' columns
+        (an empty string when a change only adds or only removes a ticker).
+    """
+    _, rows = extract_table_rows(content, "changes")
+
+    changes = []
+    date = None
+    for cells in rows:
+        if len(cells) >= 6:
+            date, cells = cells[0], cells[1:]
+        elif len(cells) != 5:
+            continue
+        # Rows with 5 cells share the date of the previous row (rowspan)
+        changes.append({
+            "Date": date,
+            "Added": cells[0].replace(".", "-"),
+            "Removed": cells[2].replace(".", "-"),
+        })
+
+    changes = pd.DataFrame(changes, columns=["Date", "Added", "Removed"])
+    changes["Date"] = pd.to_datetime(changes["Date"], format="%B %d, %Y", errors="coerce")
+    return changes.dropna(subset=["Date"])
 
 
 def update_sp500_tickers():
     """
-    Update the stored S&P 500 tickers in the bronze layer.
+    Update the stored S&P 500 tickers and the point-in-time membership history in the bronze layer.
     """
-    existing_tickers = load_csv(SP500_TICKERS_FILE).get("Symbol", [])
-    new_tickers = fetch_sp500_tickers_from_wikipedia()
+    with stage_run("fetch_sp500_tickers") as run:
+        with run.span("load"):
+            existing = load_csv(SP500_TICKERS_FILE, dtype=str)
+        try:
+            with run.span("fetch") as fetch_span:
+                content, validators = fetch_sp500_wikipedia_page()
+                fetch_span.record(nbytes=len(content))
+            if validators is None and not existing.empty:
+                print("Wikipedia page not modified since the last fetch. No changes detected in the tickers.")
+                return
+            with run.span("parse") as parse_span:
+                constituents = parse_sp500_constituents(content)
+                changes = parse_sp500_changes(content)
+                parse_span.record(rows=len(constituents) + len(changes), nbytes=len(content))
+        except Exception as e:
+            raise RuntimeError(f"Error fetching tickers from Wikipedia: {e}")
 
-    # Include ^GSPC (Index itself)
-    if "^GSPC" not in new_tickers:
-        new_tickers.append("^GSPC")
+        # Record membership changes
+        with run.span("membership"):
+            history = load_membership_history(SP500_MEMBERSHIP_FILE)
+            seen_changes = load_change_log(SP500_CHANGE_LOG_FILE)
+            if seen_changes is None and not history.empty:
+                # Histories written before the change log: changes up to the latest event were processed
+                last_event = max((event[0] for event in recorded_events(history)), default=pd.Timestamp.min)
+                seen_changes = {event for event in change_events(changes) if event[0] <= last_event}
+            history = update_membership_history(history, constituents["Symbol"].tolist(), changes,
+                                                seen_changes=seen_changes)
+            save_membership_history(history, SP500_MEMBERSHIP_FILE)
+            save_change_log((seen_changes or set()) | change_events(changes), SP500_CHANGE_LOG_FILE)
 
-    # Only update if there are changes
-    if set(new_tickers) != set(existing_tickers):
-        save_csv({"Symbol": new_tickers}, SP500_TICKERS_FILE)
-        print(f"Updated {len(new_tickers)} tickers.")
-    else:
-        print("No changes detected in the tickers.")
+        # The index itself is not listed: each universe names its benchmark in config/universes.json
+        # Only update if the tickers or their attributes changed
+        existing = existing.reindex(columns=CONSTITUENT_COLUMNS).fillna("")
+        if not constituents.reset_index(drop=True).equals(existing.reset_index(drop=True)):
+            with run.span("write") as write_span:
+                save_csv(constituents, SP500_TICKERS_FILE)
+                write_span.record(rows=len(constituents))
+            print(f"Updated {len(constituents)} tickers.")
+        else:
+            print("No changes detected in the tickers.")
+
+        # Only cached once processed: a failed run is retried with the page instead of a 304
+        if validators is not None:
+            save_wikipedia_page(content, validators, WIKIPEDIA_CACHE_FILE, WIKIPEDIA_CACHE_META_FILE)
 
 
 # For command-line usage
 if __name__ == "__main__":
-    update_sp500_tickers()
\ No newline at end of file
+    update_sp500_tickers()
@@ -0,0 +1,111 @@
+import os
+
+import pandas as pd
+
+from common.instrumentation import stage_run
+from common.universes import load_universe_tickers, load_universes
+from data_engineering.fetch_sp500_tickers import (
+    CONSTITUENT_COLUMNS,
+    WIKIPEDIA_CACHE_DIR,
+    fetch_wikipedia_page,
+    load_csv,
+    parse_constituents,
+    save_csv,
+    save_wikipedia_page,
+    update_sp500_tickers,
+)
+
+
+def update_wikipedia_universe_tickers(universe: dict):
+    """
+    Update the stored tickers of a universe whose constituents table is on Wikipedia.
+    """
+    name = universe["name"]
+    tickers_file = universe["tickers_file"]
+    cache_file = os.path.join(WIKIPEDIA_CACHE_DIR, f"wikipedia-{name}.html")
+    cache_meta_file = os.path.join(WIKIPEDIA_CACHE_DIR, f"wikipedia-{name}.json")
+    with stage_run("fetch_universe_tickers", universe=name) as run:
+        with run.span("load"):
+            existing = load_csv(tickers_file, dtype=str)
+        try:
+            with run.span("fetch") as fetch_span:
+                content, validators = fetch_wikipedia_page(universe["wikipedia_url"], cache_file, cache_meta_file)
+                fetch_span.record(nbytes=len(content))
+            if validators is None and not existing.empty:
+                print(f"Wikipedia page not modified since the last fetch. No changes detected in the {name} tickers.")
+                return
+            with run.span("parse") as parse_span:
+                constituents = parse_constituents(content, universe.get("table_id", "constituents"),
+                                                  universe.get("columns"))
+                parse_span.record(rows=len(constituents), nbytes=len(content))
+        except Exception as e:
+            raise RuntimeError(f"Error fetching {name} tickers from Wikipedia: {e}")
+
+        existing = existing.reindex(columns=CONSTITUENT_COLUMNS).fillna("")
+        if not constituents.reset_index(drop=True).equals(existing.reset_index(drop=True)):
+            with run.span("write") as write_span:
+                save_csv(constituents, tickers_file)
+                write_span.record(rows=len(constituents))
+            print(f"Updated {len(constituents)} {name} tickers.")
+        else:
+            print(f"No changes detected in the {name} tickers.")
+
+        if validators is not None:
+            save_wikipedia_page(content, validators, cache_file, cache_meta_file)
+
+
+def update_universe_tickers(names=None):
+    """
+    Update the stored tickers of the configured universes.
+
+    S&P 500 tickers (and membership history) and other Wikipedia-sourced universes are
+    fetched; universes read from a hand-maintained file or an inline watchlist need no update.
+
+    Args:
+        names (list[str], optional): Universes to update. Defaults to all configured universes.
+    """
+    universes = load_universes()
+    for name in names or list(universes):
+        universe = universes[name]
+        source = universe.get("source")
+        if source == "wikipedia_sp500":
+            update_sp500_tickers()
+        elif source == "wikipedia":
+            update_wikipedia_universe_tickers(universe)
+        elif universe.get("tickers_file") and not os.path.exists(universe["tickers_file"]):
+            print(f"No tickers file for universe '{name}': create '{universe['tickers_file']}' with a 'Symbol' column.")
+
+
+def load_universe_constituents(universes: dict) -> pd.DataFrame:
+    """
+    Get every ticker of several universes once, with its descriptive attributes.
+
+    A ticker listed by several universes keeps the row with the most attributes (the
+    first one on ties). Benchmarks are included, named after the index they track.
+
+    Returns:
+        pd.DataFrame: One row per ticker with the columns in `CONSTITUENT_COLUMNS`.
+    """
+    frames = []
+    for universe in universes.values():
+        tickers_file = universe.get("tickers_file")
+        if "tickers" not in universe and tickers_file and os.path.exists(tickers_file):
+            frames.append(load_csv(tickers_file, dtype=str).reindex(columns=CONSTITUENT_COLUMNS))
+        else:
+            frames.append(pd.DataFrame({"Symbol": load_universe_tickers(universe) or []}))
+        frames.append(pd.DataFrame({
+            "Symbol": [universe["benchmark"]],
+            "Security": [universe.get("benchmark_name", universe.get("label", universe["benchmark"]))],
+        }))
+
+    constituents = pd.concat(frames, ignore_index=True).reindex(columns=CONSTITUENT_COLUMNS).fillna("")
+    # Prefer rows carrying attributes when a ticker is listed several times
+    constituents["_attributes"] = (constituents[CONSTITUENT_COLUMNS[1:]] != "").sum(axis=1)
+    constituents = constituents.sort_values("_attributes", ascending=False, kind="stable")
+    constituents = constituents.drop_duplicates("Symbol").sort_index()
+    return constituents[CONSTITUENT_COLUMNS].reset_index(drop=True)
+
+
+# For command-line usage
+if __name__ == "__main__":
+    update_universe_tickers()
@@ -0,0 +1,219 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from common.instrumentation import stage_run, timed
+from common.market_calendar import trading_days
+from common.paths import BRONZE_INTRADAY_DIR, EMPTY_SESSIONS_FILE
+from common.universes import load_all_tickers, load_universes
+
+# One-minute bars in long format; 'Datetime' is the exchange (New York) wall-clock time
+BAR_COLUMNS = ["Datetime", "Ticker", "Open", "High", "Low", "Close", "Volume"]
+EXCHANGE_TIMEZONE = "America/New_York"
+
+# Bronze intraday store: one directory per session date, then one per ticker
+# (e.g. data/bronze/intraday/minute_bars/Date=2024-01-02/Ticker=AAPL/bars-0.parquet)
+PARTITION_SCHEMA = pa.schema([("Date", pa.string()), ("Ticker", pa.string())])
+BAR_SCHEMA = pa.schema([
+    ("Datetime", pa.timestamp("ns")),
+    ("Open", pa.float64()),
+    ("High", pa.float64()),
+    ("Low", pa.float64()),
+    ("Close", pa.float64()),
+    ("Volume", pa.int64()),
+])
+
+# Number of tickers whose minute bars are downloaded and held in memory at once
+CHUNK_SIZE = 100
+
+
+def get_partitioning():
+    return ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+
+
+@timed()
+def fetch_minute_bars(tickers, start_date, end_date) -> pd.DataFrame:
+    """
+    Fetch one-minute OHLCV bars from Yahoo Finance (only the last few weeks are available).
+
+    Args:
+        tickers (list[str]): Ticker symbols.
+        start_date (str): First date to fetch (inclusive, 'YYYY-MM-DD').
+        end_date (str): Last date to fetch (exclusive, 'YYYY-MM-DD').
+
+    Returns:
+        pd.DataFrame: Bars in long format with the columns in `BAR_COLUMNS`.
+    """
+    import yfinance as yf
+
+    print(f"Fetching minute bars for {len(tickers)} tickers from {start_date} to {end_date}...")
+    data = yf.download(tickers, start=start_date, end=end_date, interval="1m",
+                       auto_adjust=False, group_by="column", progress=False)
+    if data.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    if not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([data.columns, tickers[:1]])
+
+    bars = data[["Open", "High", "Low", "Close", "Volume"]].stack(level=1, future_stack=True)
+    bars = bars.dropna(subset=["Close"]).rename_axis(["Datetime", "Ticker"]).reset_index()
+    if bars["Datetime"].dt.tz is not None:
+        bars["Datetime"] = bars["Datetime"].dt.tz_convert(EXCHANGE_TIMEZONE).dt.tz_localize(None)
+    bars["Volume"] = bars["Volume"].fillna(0).astype("int64")
+    return bars[BAR_COLUMNS]
+
+
+@timed()
+def save_minute_bars(bars: pd.DataFrame, dataset_dir: str = BRONZE_INTRADAY_DIR) -> int:
+    """
+    Write minute bars to the bronze intraday store, partitioned by session date and ticker.
+
+    Each (date, ticker) partition holds a single file, so ingesting the same session
+    again replaces its bars instead of duplicating them.
+
+    Args:
+        bars (pd.DataFrame): Bars with the columns in `BAR_COLUMNS`.
+        dataset_dir (str): Root directory of the store.
+
+    Returns:
+        int: Number of bars written.
+    """
+    if bars.empty:
+        return 0
+    bars = bars.sort_values(["Ticker", "Datetime"], kind="stable")
+    table = pa.Table.from_pandas(bars[BAR_SCHEMA.names], schema=BAR_SCHEMA, preserve_index=False)
+    table = table.append_column("Date", pa.array(bars["Datetime"].dt.strftime("%Y-%m-%d").to_numpy(), pa.string()))
+    table = table.append_column("Ticker", pa.array(bars["Ticker"].to_numpy(), pa.string()))
+
+    os.makedirs(dataset_dir, exist_ok=True)
+    ds.write_dataset(
+        table,
+        dataset_dir,
+        format="parquet",
+        partitioning=get_partitioning(),
+        basename_template="bars-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_partitions=max(1024, bars["Ticker"].nunique() * bars["Datetime"].dt.normalize().nunique()),
+    )
+    return len(bars)
+
+
+def open_minute_bars(dataset_dir: str = BRONZE_INTRADAY_DIR) -> ds.Dataset:
+    """
+    Open the bronze intraday store as a (lazy) PyArrow dataset.
+    """
+    return ds.dataset(dataset_dir, format="parquet", partitioning=get_partitioning())
+
+
+def list_partitions(dataset: ds.Dataset) -> pd.DataFrame:
+    """
+    List the (date, ticker) partitions of the intraday store without reading any bars.
+
+    Returns:
+        pd.DataFrame: One row per partition with 'Date' and 'Ticker' columns, sorted.
+    """
+    keys = [ds.get_partition_keys(fragment.partition_expression) for fragment in dataset.get_fragments()]
+    partitions = pd.DataFrame(keys, columns=["Date", "Ticker"])
+    return partitions.drop_duplicates().sort_values(["Date", "Ticker"], ignore_index=True)
+
+
+def load_empty_sessions(dataset_dir: str = BRONZE_INTRADAY_DIR) -> list:
+    """
+    List the sessions ('YYYY-MM-DD') fetched without any bar, which have no partition.
+    """
+    file_path = os.path.join(dataset_dir, EMPTY_SESSIONS_FILE)
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path) as file:
+        return json.load(file)
+
+
+def record_empty_session(session: str, dataset_dir: str = BRONZE_INTRADAY_DIR):
+    """
+    Record a session fetched without any bar, so later runs do not fetch it again.
+    """
+    sessions = sorted(set(load_empty_sessions(dataset_dir)) | {session})
+    os.makedirs(dataset_dir, exist_ok=True)
+    with open(os.path.join(dataset_dir, EMPTY_SESSIONS_FILE), "w") as file:
+        json.dump(sessions, file, indent=2)
+
+
+def get_stored_dates(dataset_dir: str = BRONZE_INTRADAY_DIR, include_empty: bool = True) -> list:
+    """
+    List the session dates ('YYYY-MM-DD') already ingested into the intraday store.
+
+    Args:
+        dataset_dir (str): Root directory of the store.
+        include_empty (bool): Also list the sessions fetched without any bar, which have
+            no partition (see `record_empty_session`).
+    """
+    if not os.path.isdir(dataset_dir):
+        return []
+    dates = {name.split("=", 1)[1] for name in os.listdir(dataset_dir) if name.startswith("Date=")}
+    if include_empty:
+        dates |= set(load_empty_sessions(dataset_dir))
+    return sorted(dates)
+
+
+def update_minute_bars(days: int = 5):
+    """
+    Ingest the minute bars of the last sessions missing from the bronze intraday store.
+
+    Bars are downloaded and written one session and `CHUNK_SIZE` tickers at a time, so
+    memory stays bounded regardless of the universe size. A session whose download fails
+    is removed from the store, so the next run fetches it again; a session downloaded
+    without any bar is recorded (see `record_empty_session`) and not fetched again.
+
+    Args:
+        days (int): Number of calendar days to look back (Yahoo keeps about 30 days of
+            one-minute bars).
+
+    Returns:
+        list[str]: Session dates written.
+    """
+    with stage_run("intraday_bars") as run:
+        with run.span("load"):
+            tickers = load_all_tickers(load_universes())
+            stored = set(get_stored_dates())
+
+        # Only completed sessions are stored, so today's partial session is never ingested
+        today = datetime.today()
+        sessions = [f"{day:%Y-%m-%d}" for day in trading_days((today - timedelta(days=days)).date(),
+                                                              (today - timedelta(days=1)).date())]
+        missing = [session for session in sessions if session not in stored]
+        if not missing:
+            print("Minute bars are up to date. Skipping data fetch.")
+            return []
+
+        written = []
+        for session in missing:
+            end_date = f"{pd.Timestamp(session) + timedelta(days=1):%Y-%m-%d}"
+            rows = 0
+            try:
+                for first in range(0, len(tickers), CHUNK_SIZE):
+                    with run.span("fetch") as fetch_span:
+                        bars = fetch_minute_bars(tickers[first:first + CHUNK_SIZE], session, end_date)
+                        fetch_span.record_frame(bars)
+                    with run.span("write") as write_span:
+                        rows += save_minute_bars(bars)
+                        write_span.record(rows=len(bars))
+            except Exception:
+                # A partially written session would look complete to the next run
+                shutil.rmtree(os.path.join(BRONZE_INTRADAY_DIR, f"Date={session}"), ignore_errors=True)
+                raise
+            if rows:
+                written.append(session)
+            else:
+                print(f"No minute bars for {session}; recording it as an empty session.")
+                record_empty_session(session)
+
+    print(f"Minute bars saved for sessions: {', '.join(written) or 'none'}")
+    return written
+
+
+if __name__ == "__main__":
+    update_minute_bars()
@@ -0,0 +1,355 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+from common.instrumentation import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# File path for the point-in-time S&P 500 membership history
+SP500_MEMBERSHIP_FILE = "data/bronze/stocks/SP500-membership-history.csv"
+# Every change of the Wikipedia changes table already processed, applied or not
+SP500_CHANGE_LOG_FILE = "data/bronze/stocks/SP500-membership-changes.csv"
+
+HISTORY_COLUMNS = ["Symbol", "added", "removed"]
+CHANGE_LOG_COLUMNS = ["Date", "Symbol", "Action"]
+
+
+def load_membership_history(file_path: str) -> pd.DataFrame:
+    """
+    Load the membership history table.
+
+    Each row is one membership interval: the ticker was a constituent from `added`
+    (inclusive) until `removed` (exclusive). A missing `added` means the ticker joined
+    before the recorded history starts; a missing `removed` means it is still a member.
+
+    Args:
+        file_path (str): Path to the membership history CSV.
+
+    Returns:
+        pd.DataFrame: Membership history with 'Symbol', 'added' and 'removed' columns.
+    """
+    if not os.path.exists(file_path):
+        return pd.DataFrame({
+            "Symbol": pd.Series(dtype="object"),
+            "added": pd.Series(dtype="datetime64[ns]"),
+            "removed": pd.Series(dtype="datetime64[ns]"),
+        })
+    history = pd.read_csv(file_path)[HISTORY_COLUMNS]
+    history[["added", "removed"]] = history[["added", "removed"]].apply(pd.to_datetime)
+    return history
+
+
+def save_membership_history(history: pd.DataFrame, file_path: str) -> None:
+    """
+    Save the membership history table, sorted by ticker and start date.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    history = history.sort_values(["Symbol", "added"], na_position="first", ignore_index=True)
+    history.to_csv(file_path, index=False, date_format="%Y-%m-%d")
+
+
+def reconstruct_membership_history(current_tickers, changes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reconstruct membership intervals by walking the changes table backwards from today's
+    constituents.
+
+    Args:
+        current_tickers (list[str]): Current constituents.
+        changes (pd.DataFrame): Changes with 'Date', 'Added' and 'Removed' columns
+            ('Added'/'Removed' may be empty when a change only adds or removes).
+
+    Returns:
+        pd.DataFrame: Membership history with 'Symbol', 'added' and 'removed' columns.
+    """
+    intervals = [[symbol, pd.NaT, pd.NaT] for symbol in current_tickers]
+    # Intervals whose start date is not known yet, keyed by ticker
+    pending = {symbol: position for position, symbol in enumerate(current_tickers)}
+
+    for change in changes.sort_values("Date", ascending=False, kind="stable").itertuples(index=False):
+        if isinstance(change.Added, str) and change.Added:
+            if change.Added in pending:
+                intervals[pending.pop(change.Added)][1] = change.Date
+            else:
+                logger.warning(f"Skipping inconsistent addition of '{change.Added}' on {change.Date:%Y-%m-%d}.")
+        if isinstance(change.Removed, str) and change.Removed:
+            if change.Removed not in pending:
+                pending[change.Removed] = len(intervals)
+                intervals.append([change.Removed, pd.NaT, change.Date])
+            else:
+                logger.warning(f"Skipping inconsistent removal of '{change.Removed}' on {change.Date:%Y-%m-%d}.")
+
+    history = pd.DataFrame(intervals, columns=HISTORY_COLUMNS)
+    history[["added", "removed"]] = history[["added", "removed"]].apply(pd.to_datetime)
+    return history
+
+
+def change_events(changes: pd.DataFrame) -> set:
+    """
+    Split a changes table into single events.
+
+    Args:
+        changes (pd.DataFrame): Changes with 'Date', 'Added' and 'Removed' columns.
+
+    Returns:
+        set: (Date, Symbol, Action) tuples, with Action 'added' or 'removed'.
+    """
+    events = set()
+    for column, action in [("Added", "added"), ("Removed", "removed")]:
+        dated = changes[changes[column].notna() & (changes[column] != "")]
+        events.update(zip(dated["Date"], dated[column], [action] * len(dated)))
+    return events
+
+
+def load_change_log(file_path: str):
+    """
+    Load the changes already processed by earlier updates.
+
+    Returns:
+        set | None: (Date, Symbol, Action) tuples, or None if no log has been written yet.
+    """
+    if not os.path.exists(file_path):
+        return None
+    log = pd.read_csv(file_path, parse_dates=["Date"])
+    return set(zip(log["Date"], log["Symbol"], log["Action"]))
+
+
+def save_change_log(events: set, file_path: str) -> None:
+    """
+    Save the processed changes, sorted by date.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    log = pd.DataFrame(sorted(events), columns=CHANGE_LOG_COLUMNS)
+    log.to_csv(file_path, index=False, date_format="%Y-%m-%d")
+
+
+def recorded_events(history: pd.DataFrame) -> set:
+    """
+    Get the changes already recorded in a membership history.
+
+    Returns:
+        set: (Date, Symbol, Action) tuples, with Action 'added' or 'removed'.
+    """
+    events = set()
+    for action in ["added", "removed"]:
+        dated = history[history[action].notna()]
+        events.update(zip(dated[action], dated["Symbol"], [action] * len(dated)))
+    return events
+
+
+def _covering_interval(intervals: list, positions: list, date):
+    """
+    Get the position of the interval containing a date among a ticker's intervals, or None.
+
+    Args:
+        intervals (list): [Symbol, added, removed] rows of the history.
+        positions (list[int]): Positions of the ticker's intervals in `intervals`.
+        date (pd.Timestamp): Date to look up.
+    """
+    for position in positions:
+        _, added, removed = intervals[position]
+        if (pd.isna(added) or added <= date) and (pd.isna(removed) or removed > date):
+            return position
+    return None
+
+
+@timed()
+def update_membership_history(history: pd.DataFrame, current_tickers, changes: pd.DataFrame,
+                              as_of=None, seen_changes=None) -> pd.DataFrame:
+    """
+    Incrementally update the membership history from a new scrape.
+
+    An empty history is reconstructed from the full changes table. Otherwise every change
+    not recorded yet is applied, whatever its date: changes are de-duplicated on
+    (Date, Symbol, Action) against the history and `seen_changes` rather than cut off at
+    the latest recorded event, so a change Wikipedia publishes late (dated before an
+    earlier scrape) is still applied. When such a change was already picked up by a snapshot reconciliation, the
+    reconciled date (the scrape date) is corrected to the change's date. The result is then
+    reconciled with the current constituents snapshot so that any change missing from the
+    changes table is still recorded (dated `as_of`).
+
+    Args:
+        history (pd.DataFrame): Existing membership history.
+        current_tickers (list[str]): Current constituents from the scrape.
+        changes (pd.DataFrame): Changes with 'Date', 'Added' and 'Removed' columns.
+        as_of (str | pd.Timestamp, optional): Date of the scrape. Defaults to today.
+        seen_changes (set, optional): (Date, Symbol, Action) events processed by earlier
+            updates (see `load_change_log`), including those skipped as inconsistent.
+
+    Returns:
+        pd.DataFrame: Updated membership history.
+    """
+    as_of = pd.Timestamp(as_of).normalize() if as_of is not None else pd.Timestamp.today().normalize()
+    changes = changes[changes["Date"] <= as_of]
+
+    if history.empty:
+        logger.info("No membership history found. Reconstructing from the changes table.")
+        return reconstruct_membership_history(current_tickers, changes)
+
+    recorded = recorded_events(history) | (seen_changes or set())
+    intervals = history[HISTORY_COLUMNS].to_numpy(dtype=object).tolist()
+    # Positions of every ticker's intervals, so each lookup only looks at that ticker's few intervals
+    by_symbol = {}
+    for position, interval in enumerate(intervals):
+        by_symbol.setdefault(interval[0], []).append(position)
+
+    applied = 0
+    for change in changes.sort_values("Date", kind="stable").itertuples(index=False):
+        removed = isinstance(change.Removed, str) and change.Removed
+        if removed and (change.Date, change.Removed, "removed") not in recorded:
+            # Closes the open interval, or moves a later (reconciled) removal back to the change date
+            position = _covering_interval(intervals, by_symbol.get(change.Removed, []), change.Date)
+            if position is not None:
+                intervals[position][2] = change.Date
+                applied += 1
+        added = isinstance(change.Added, str) and change.Added
+        if added and (change.Date, change.Added, "added") not in recorded:
+            positions = by_symbol.setdefault(change.Added, [])
+            if _covering_interval(intervals, positions, change.Date) is None:
+                later = [
+                    position for position in positions
+                    if pd.notna(intervals[position][1]) and intervals[position][1] > change.Date
+                ]
+                if later:
+                    # The addition was reconciled from a later snapshot: move it back to the change date
+                    intervals[min(later, key=lambda position: intervals[position][1])][1] = change.Date
+                else:
+                    positions.append(len(intervals))
+                    intervals.append([change.Added, change.Date, pd.NaT])
+                applied += 1
+
+    # Reconcile with the snapshot in case the changes table missed an event
+    open_intervals = {interval[0]: position for position, interval in enumerate(intervals) if pd.isna(interval[2])}
+    current = set(current_tickers)
+    missing_removals = [symbol for symbol in open_intervals if symbol not in current]
+    for symbol in missing_removals:
+        intervals[open_intervals.pop(symbol)][2] = as_of
+    missing_additions = sorted(current - set(open_intervals))
+    for symbol in missing_additions:
+        intervals.append([symbol, as_of, pd.NaT])
+
+    history = pd.DataFrame(intervals, columns=HISTORY_COLUMNS)
+    history[["added", "removed"]] = history[["added", "removed"]].apply(pd.to_datetime)
+
+    logger.info(
+        f"Membership history updated: {applied} changes from the changes table, "
+        f"{len(missing_additions)} additions and {len(missing_removals)} removals from the snapshot."
+    )
+    return history
+
+
+def build_membership_index(history: pd.DataFrame) -> dict:
+    """
+    Index a membership history for repeated point-in-time lookups (see `members_as_of`).
+
+    The interval boundaries (every 'added' and 'removed' date) are sorted once, and the
+    constituents of every stretch between two consecutive boundaries are stored, so a
+    lookup is a single `np.searchsorted` instead of a scan of the history.
+
+    Args:
+        history (pd.DataFrame): Membership history.
+
+    Returns:
+        dict: The sorted 'boundaries' and the sorted constituents of every stretch
+        ('members'; stretch k starts at boundary k - 1, stretch 0 is before the first one).
+    """
+    added = history["added"].to_numpy(dtype="datetime64[ns]")
+    removed = history["removed"].to_numpy(dtype="datetime64[ns]")
+    boundaries = np.unique(np.concatenate([added[~np.isnat(added)], removed[~np.isnat(removed)]]))
+    # Interval [added, removed) covers the stretches [start, end)
+    starts = np.where(np.isnat(added), 0, np.searchsorted(boundaries, added, side="right"))
+    ends = np.where(np.isnat(removed), len(boundaries) + 1, np.searchsorted(boundaries, removed, side="right"))
+
+    events = [[] for _ in range(len(boundaries) + 1)]
+    for symbol, start, end in zip(history["Symbol"].to_numpy(), starts, ends):
+        events[start].append((symbol, 1))
+        if end <= len(boundaries):
+            events[end].append((symbol, -1))
+
+    counts = {}
+    members = []
+    for stretch_events in events:
+        for symbol, step in stretch_events:
+            counts[symbol] = counts.get(symbol, 0) + step
+        members.append(sorted(symbol for symbol, count in counts.items() if count > 0))
+    return {"boundaries": boundaries, "members": members}
+
+
+def members_as_of(history, date) -> list:
+    """
+    Get the constituents on a given date.
+
+    Args:
+        history (pd.DataFrame | dict): Membership history, or its index from
+            `build_membership_index` for repeated lookups.
+        date (str | pd.Timestamp): Date to look up.
+
+    Returns:
+        list[str]: Sorted list of tickers that were members on that date.
+    """
+    date = np.datetime64(pd.Timestamp(date), "ns")
+    if isinstance(history, dict):
+        return list(history["members"][np.searchsorted(history["boundaries"], date, side="right")])
+    added = history["added"].to_numpy(dtype="datetime64[ns]")
+    removed = history["removed"].to_numpy(dtype="datetime64[ns]")
+    is_member = (np.isnat(added) | (added <= date)) & (np.isnat(removed) | (removed > date))
+    return sorted(set(history["Symbol"].to_numpy()[is_member]))
+
+
+@timed()
+def membership_matrix(history: pd.DataFrame, dates, tickers) -> pd.DataFrame:
+    """
+    Build a boolean membership matrix (dates x tickers).
+
+    Interval boundaries are located with `np.searchsorted` and accumulated in a
+    difference array, so the matrix is built with a single cumulative sum instead of a
+    per-date lookup. Tickers without any recorded interval (e.g. the benchmark index)
+    are treated as members on every date.
+
+    Args:
+        history (pd.DataFrame): Membership history.
+        dates (pd.DatetimeIndex): Sorted dates (rows of the matrix).
+        tickers (list[str]): Tickers (columns of the matrix).
+
+    Returns:
+        pd.DataFrame: Boolean matrix, True where the ticker was a member on that date.
+    """
+    dates = pd.DatetimeIndex(dates)
+    tickers = pd.Index(tickers)
+    columns = tickers.get_indexer(history["Symbol"])
+    intervals = history[columns >= 0]
+    columns = columns[columns >= 0]
+
+    date_values = dates.to_numpy(dtype="datetime64[ns]")
+    added = intervals["added"].to_numpy(dtype="datetime64[ns]")
+    removed = intervals["removed"].to_numpy(dtype="datetime64[ns]")
+    starts = np.where(np.isnat(added), 0, np.searchsorted(date_values, added, side="left"))
+    ends = np.where(np.isnat(removed), len(dates), np.searchsorted(date_values, removed, side="left"))
+
+    delta = np.zeros((len(dates) + 1, len(tickers)), dtype=np.int32)
+    np.add.at(delta, (starts, columns), 1)
+    np.add.at(delta, (ends, columns), -1)
+    matrix = np.cumsum(delta[:-1], axis=0) > 0
+
+    untracked = ~tickers.isin(history["Symbol"])
+    matrix[:, untracked] = True
+    return pd.DataFrame(matrix, index=dates, columns=tickers)
+
+
+def mask_returns(returns: pd.DataFrame, history: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mask returns outside each ticker's membership periods with NaN.
+
+    Args:
+        returns (pd.DataFrame): Wide daily returns indexed by date.
+        history (pd.DataFrame): Membership history.
+
+    Returns:
+        pd.DataFrame: Returns with non-member observations set to NaN.
+    """
+    mask = membership_matrix(history, returns.index, returns.columns)
+    return returns.where(mask.to_numpy())
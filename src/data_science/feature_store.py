@@ -0,0 +1,423 @@
+import hashlib
+import json
+import logging
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from common.instrumentation import stage_run, timed
+from common.paths import SILVER_FEATURES_DIR, SILVER_RETURNS_DIR, find_latest_file
+from common.universes import get_universe
+from data_engineering.corporate_actions import restated_since
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Features of a (Date, Ticker) row only use the returns up to and including that date, i.e.
+# they are known after the close of 'Date'.
+LAGS = [1, 2, 3, 5, 10]  # 'return_lag_k': return k trading days before
+MOMENT_WINDOWS = [21, 63]  # Rolling mean, volatility, skewness and kurtosis
+MOMENTUM_WINDOWS = [21, 63, 252]  # Compounded return over the window
+BETA_WINDOWS = [63, 252]  # Rolling beta against the benchmark
+MIN_PERIODS_RATIO = 0.8  # Share of a window that must have returns for the feature to be set
+# Rows of history needed before the first new date for every feature to be complete
+LOOKBACK_ROWS = max(LAGS + MOMENT_WINDOWS + MOMENTUM_WINDOWS + BETA_WINDOWS)
+
+FEATURE_COLUMNS = (
+    ["return"]
+    + [f"return_lag_{lag}" for lag in LAGS]
+    + [f"{moment}_{window}" for window in MOMENT_WINDOWS for moment in ("mean", "volatility", "skew", "kurtosis")]
+    + [f"momentum_{window}" for window in MOMENTUM_WINDOWS]
+    + ["momentum_12_1", "excess_return"]
+    + [f"excess_momentum_{window}" for window in MOMENTUM_WINDOWS]
+    + [f"beta_{window}" for window in BETA_WINDOWS]
+)
+FEATURE_SCHEMA = pa.schema(
+    [("Date", pa.timestamp("ns")), ("Ticker", pa.string())]
+    + [(column, pa.float32()) for column in FEATURE_COLUMNS]
+    + [("Year", pa.int16())]
+)
+# One directory per year (e.g. data/silver/features/Year=2024/part-241216-0.parquet)
+PARTITIONING = ds.partitioning(pa.schema([("Year", pa.int16())]), flavor="hive")
+STATE_FILE = "_state.json"  # Returns file, last date and tickers the store is up to date with
+CHUNK_SIZE = 100  # Tickers whose features are computed (and written) at once
+
+
+def _min_periods(window: int) -> int:
+    return max(1, int(window * MIN_PERIODS_RATIO))
+
+
+def calculate_features(returns: pd.DataFrame, benchmark: pd.Series) -> dict:
+    """
+    Calculate every feature of some tickers as wide frames, vectorized across tickers.
+
+    Args:
+        returns (pd.DataFrame): Daily returns (DatetimeIndex x tickers).
+        benchmark (pd.Series): Daily returns of the benchmark on the same index.
+
+    Returns:
+        dict: Feature name (see `FEATURE_COLUMNS`) -> wide frame (dates x tickers).
+    """
+    features = {"return": returns}
+    for lag in LAGS:
+        features[f"return_lag_{lag}"] = returns.shift(lag)
+
+    for window in MOMENT_WINDOWS:
+        rolling = returns.rolling(window, min_periods=_min_periods(window))
+        features[f"mean_{window}"] = rolling.mean()
+        features[f"volatility_{window}"] = rolling.std() * np.sqrt(252)
+        # Windows without returns (before a listing) stay NaN; pandas warns about them
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            features[f"skew_{window}"] = rolling.skew()
+            features[f"kurtosis_{window}"] = rolling.kurt()
+
+    log_returns = np.log1p(returns)
+    benchmark_log_returns = np.log1p(benchmark)
+    for window in MOMENTUM_WINDOWS:
+        momentum = np.expm1(log_returns.rolling(window, min_periods=_min_periods(window)).sum())
+        benchmark_momentum = np.expm1(benchmark_log_returns.rolling(window, min_periods=_min_periods(window)).sum())
+        features[f"momentum_{window}"] = momentum
+        features[f"excess_momentum_{window}"] = momentum.sub(benchmark_momentum, axis=0)
+    # Twelve-month momentum skipping the last month (short-term reversal)
+    features["momentum_12_1"] = np.expm1(
+        log_returns.shift(21).rolling(252 - 21, min_periods=_min_periods(252 - 21)).sum()
+    )
+    features["excess_return"] = returns.sub(benchmark, axis=0)
+
+    # Rolling beta = cov(r, r_m) / var(r_m) from rolling means of the products
+    for window in BETA_WINDOWS:
+        min_periods = _min_periods(window)
+        # Only days where both the ticker and the benchmark have a return count
+        both = returns.notna() & benchmark.notna().to_numpy()[:, None]
+        market = pd.DataFrame(np.where(both, benchmark.to_numpy()[:, None], np.nan),
+                              index=returns.index, columns=returns.columns)
+        mean_product = (returns * market).rolling(window, min_periods=min_periods).mean()
+        mean_returns = returns.where(both).rolling(window, min_periods=min_periods).mean()
+        mean_market = market.rolling(window, min_periods=min_periods).mean()
+        market_variance = market.rolling(window, min_periods=min_periods).var(ddof=0)
+        features[f"beta_{window}"] = (mean_product - mean_returns * mean_market) / market_variance
+    return features
+
+
+def features_to_long(features: dict, start=None) -> pd.DataFrame:
+    """
+    Unpivot wide feature frames into one row per (Date, Ticker), sorted by ticker then date.
+
+    Rows without any feature (before a ticker's first return) are dropped.
+
+    Args:
+        features (dict): Feature name -> wide frame (dates x tickers), all on the same index.
+        start (pd.Timestamp, optional): Only keep the dates after this one.
+
+    Returns:
+        pd.DataFrame: 'Date', 'Ticker' and the columns in `FEATURE_COLUMNS` (float32).
+    """
+    first = features["return"]
+    keep_rows = np.ones(len(first), dtype=bool) if start is None else (first.index > start)
+    dates = first.index[keep_rows]
+    n_dates, n_tickers = len(dates), first.shape[1]
+
+    columns = {
+        name: features[name].to_numpy(dtype="float32")[keep_rows].ravel(order="F")
+        for name in FEATURE_COLUMNS
+    }
+    available = np.zeros(n_dates * n_tickers, dtype=bool)
+    for values in columns.values():
+        available |= ~np.isnan(values)
+
+    long_data = pd.DataFrame({
+        "Date": np.tile(dates.to_numpy(), n_tickers)[available],
+        "Ticker": np.repeat(first.columns.to_numpy(dtype=object), n_dates)[available],
+    })
+    for name, values in columns.items():
+        long_data[name] = values[available]
+    return long_data
+
+
+def iter_feature_rows(returns: pd.DataFrame, benchmark_ticker: str, start=None):
+    """
+    Compute the long feature rows of every ticker, a chunk of tickers at a time to bound memory.
+
+    Args:
+        returns (pd.DataFrame): Daily returns (DatetimeIndex x tickers) including the benchmark.
+        benchmark_ticker (str): Ticker the relative features are measured against.
+        start (pd.Timestamp, optional): Only return the dates after this one (earlier rows
+            are the lookback of the rolling features).
+
+    Yields:
+        pd.DataFrame: Long feature rows (see `features_to_long`) of `CHUNK_SIZE` tickers.
+
+    Raises:
+        ValueError: If the benchmark ticker is not in the returns.
+    """
+    if benchmark_ticker not in returns.columns:
+        raise ValueError(f"Benchmark ticker '{benchmark_ticker}' not found in the returns.")
+    benchmark = returns[benchmark_ticker]
+    for position in range(0, returns.shape[1], CHUNK_SIZE):
+        chunk = returns.iloc[:, position:position + CHUNK_SIZE]
+        yield features_to_long(calculate_features(chunk, benchmark), start=start)
+
+
+@timed()
+def compute_feature_rows(returns: pd.DataFrame, benchmark_ticker: str, start=None) -> pd.DataFrame:
+    """
+    Compute the long feature rows of every ticker at once (see `iter_feature_rows`).
+    """
+    return pd.concat(iter_feature_rows(returns, benchmark_ticker, start=start), ignore_index=True)
+
+
+def read_returns(returns_file: str, tickers=None, start=None) -> pd.DataFrame:
+    """
+    Read wide daily returns, optionally only some tickers and the dates from `start` on.
+    """
+    columns = None if tickers is None else ["Date"] + list(tickers)
+    filters = [("Date", ">=", pd.Timestamp(start))] if start is not None else None
+    returns = pq.read_table(returns_file, columns=columns, filters=filters).to_pandas()
+    returns = returns.set_index("Date").sort_index()
+    returns.index = pd.to_datetime(returns.index)
+    return returns.astype("float64")
+
+
+def load_state(dataset_dir: str) -> dict:
+    state_file = os.path.join(dataset_dir, STATE_FILE)
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file) as file:
+        return json.load(file)
+
+
+def save_feature_rows(rows: pd.DataFrame, dataset_dir: str, basename: str) -> int:
+    """
+    Append feature rows to the store, partitioned by year.
+
+    Args:
+        rows (pd.DataFrame): Long feature rows.
+        dataset_dir (str): Root directory of the store.
+        basename (str): Name prefix of the written files (one per year partition); writing
+            the same name again replaces those files.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if rows.empty:
+        return 0
+    rows = rows.assign(Year=rows["Date"].dt.year.astype("int16"))
+    table = pa.Table.from_pandas(rows, schema=FEATURE_SCHEMA, preserve_index=False)
+    os.makedirs(dataset_dir, exist_ok=True)
+    ds.write_dataset(
+        table,
+        dataset_dir,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{basename}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return len(rows)
+
+
+def _clear_partitions(dataset_dir: str):
+    """
+    Remove every feature file (but not the directory) before a full rebuild.
+    """
+    for directory, _, file_names in os.walk(dataset_dir):
+        for file_name in file_names:
+            if file_name.endswith(".parquet"):
+                os.remove(os.path.join(directory, file_name))
+    state_file = os.path.join(dataset_dir, STATE_FILE)
+    if os.path.exists(state_file):
+        os.remove(state_file)
+
+
+@timed()
+def update_feature_store(returns_file: str, dataset_dir: str = SILVER_FEATURES_DIR, benchmark_ticker: str = None,
+                         full: bool = False) -> int:
+    """
+    Add the features of the dates (and tickers) missing from the store.
+
+    Only the new dates plus `LOOKBACK_ROWS` rows of history are read, which is enough for
+    every rolling window, so the appended rows equal those of a full recomputation. Tickers
+    appearing for the first time get their whole history, and the store is rebuilt when new
+    corporate actions restated the history of some tickers. Files are named after the dates
+    (or tickers) they hold, so rerunning an interrupted update rewrites the same files.
+
+    Args:
+        returns_file (str): Path to the daily returns Parquet file.
+        dataset_dir (str): Root directory of the store.
+        benchmark_ticker (str, optional): Benchmark of the relative features. Defaults to the
+            benchmark of the default universe.
+        full (bool): Recompute the whole store.
+
+    Returns:
+        int: Number of rows written.
+
+    Raises:
+        ValueError: If the store was built against another benchmark (and `full` is False).
+    """
+    benchmark_ticker = benchmark_ticker or get_universe()["benchmark"]
+    tickers = [name for name in pq.read_schema(returns_file).names if name != "Date"]
+    dates = pd.DatetimeIndex(pq.read_table(returns_file, columns=["Date"]).column("Date").to_pandas()).sort_values()
+    state = {} if full else load_state(dataset_dir)
+    if state and state["benchmark"] != benchmark_ticker:
+        raise ValueError(f"The feature store was built against '{state['benchmark']}': rebuild it with full=True.")
+    restated = restated_since(state["returns_file"]) if state else []
+    if restated:
+        # Their rows are spread over every file: rebuilding is simpler than rewriting them
+        logger.info(f"Corporate actions restated the history of {len(restated)} tickers: rebuilding the features.")
+        state = {}
+
+    written = 0
+    if not state:
+        _clear_partitions(dataset_dir)
+        logger.info(f"Building the feature store from {len(dates)} days x {len(tickers)} tickers.")
+        basename = f"part-{dates[0]:%y%m%d}-{dates[-1]:%y%m%d}"
+        for number, rows in enumerate(iter_feature_rows(read_returns(returns_file), benchmark_ticker)):
+            written += save_feature_rows(rows, dataset_dir, f"{basename}-{number}")
+    else:
+        last_date = pd.Timestamp(state["last_date"])
+        stored = set(state["tickers"])
+        # Tickers new to the store: their whole history up to the last stored date
+        new_tickers = [ticker for ticker in tickers if ticker not in stored and ticker != benchmark_ticker]
+        if new_tickers:
+            logger.info(f"Adding the history of {len(new_tickers)} new tickers to the feature store.")
+            returns = read_returns(returns_file, new_tickers + [benchmark_ticker])
+            digest = hashlib.md5(",".join(sorted(new_tickers)).encode()).hexdigest()[:8]
+            chunks = iter_feature_rows(returns[returns.index <= last_date], benchmark_ticker)
+            for number, rows in enumerate(chunks):
+                rows = rows[rows["Ticker"] != benchmark_ticker]
+                written += save_feature_rows(rows, dataset_dir, f"tickers-{last_date:%y%m%d}-{digest}-{number}")
+
+        first_new = dates.searchsorted(last_date, side="right")
+        if first_new < len(dates):
+            # Enough history before the first new date for the longest window
+            returns = read_returns(returns_file, start=dates[max(0, first_new - LOOKBACK_ROWS)])
+            logger.info(f"Appending {len(dates) - first_new} new days to the feature store.")
+            basename = f"part-{dates[first_new]:%y%m%d}-{dates[-1]:%y%m%d}"
+            for number, rows in enumerate(iter_feature_rows(returns, benchmark_ticker, start=last_date)):
+                written += save_feature_rows(rows, dataset_dir, f"{basename}-{number}")
+        elif not new_tickers:
+            logger.info("Feature store is already up to date.")
+
+    # Written last: an interrupted update is redone from the previous state
+    os.makedirs(dataset_dir, exist_ok=True)
+    with open(os.path.join(dataset_dir, STATE_FILE), "w") as file:
+        json.dump({
+            "returns_file": os.path.basename(returns_file),
+            "last_date": f"{max(dates[-1], pd.Timestamp(state.get('last_date', dates[-1]))):%Y-%m-%d}",
+            "benchmark": benchmark_ticker,
+            "tickers": sorted(set(tickers) | set(state.get("tickers", []))),
+        }, file, indent=2)
+    return written
+
+
+def open_feature_store(dataset_dir: str = SILVER_FEATURES_DIR) -> ds.Dataset:
+    """
+    Open the feature store as a (lazy) PyArrow dataset ("_state.json" is skipped like any "_" file).
+    """
+    return ds.dataset(dataset_dir, format="parquet", partitioning=PARTITIONING)
+
+
+def load_features(tickers=None, start=None, end=None, columns=None, dataset_dir: str = SILVER_FEATURES_DIR):
+    """
+    Load feature rows, reading only the year partitions and columns needed.
+
+    Args:
+        tickers (list[str], optional): Tickers to load. Loads all tickers if None.
+        start (str | pd.Timestamp, optional): First date (inclusive).
+        end (str | pd.Timestamp, optional): Last date (inclusive).
+        columns (list[str], optional): Features to load. Loads all features if None.
+        dataset_dir (str): Root directory of the store.
+
+    Returns:
+        pd.DataFrame: 'Date', 'Ticker' and the feature columns, sorted by date then ticker.
+    """
+    predicate = None
+    conditions = []
+    if tickers is not None:
+        conditions.append(ds.field("Ticker").isin(list(tickers)))
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions += [ds.field("Year") >= start.year, ds.field("Date") >= start]
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions += [ds.field("Year") <= end.year, ds.field("Date") <= end]
+    for condition in conditions:
+        predicate = condition if predicate is None else predicate & condition
+
+    columns = ["Date", "Ticker"] + list(columns or FEATURE_COLUMNS)
+    features = open_feature_store(dataset_dir).to_table(columns=columns, filter=predicate).to_pandas()
+    return features.sort_values(["Date", "Ticker"], ignore_index=True)
+
+
+def join_features(events: pd.DataFrame, columns=None, tolerance=None, dataset_dir: str = SILVER_FEATURES_DIR):
+    """
+    Attach to every event the latest features known strictly before it (point-in-time join).
+
+    Features of a date are only known after that day's close, so an event on date t gets the
+    features of the previous trading day or earlier (`merge_asof` with
+    `allow_exact_matches=False`): a training set built this way never sees the returns of
+    the day it predicts.
+
+    Args:
+        events (pd.DataFrame): Rows with 'Date' and 'Ticker' columns (e.g. prediction dates and
+            their targets); other columns are kept.
+        columns (list[str], optional): Features to join. Joins all features if None.
+        tolerance (pd.Timedelta, optional): Oldest features to accept (e.g. pd.Timedelta("7D")).
+            Defaults to features up to a year older than the event.
+        dataset_dir (str): Root directory of the store.
+
+    Returns:
+        pd.DataFrame: The events with the feature columns, in the events' order.
+
+    Raises:
+        ValueError: If the events miss the 'Date' or 'Ticker' column.
+    """
+    missing = {"Date", "Ticker"} - set(events.columns)
+    if missing:
+        raise ValueError(f"Events must include the columns: {sorted(missing)}")
+    events = events.assign(Date=pd.to_datetime(events["Date"]))
+    lookback = pd.Timedelta(tolerance) if tolerance is not None else pd.Timedelta(days=366)
+    features = load_features(
+        tickers=events["Ticker"].unique(),
+        start=events["Date"].min() - lookback,
+        end=events["Date"].max(),
+        columns=columns,
+        dataset_dir=dataset_dir,
+    )
+    ordered = events.reset_index(drop=True).rename_axis("_event").reset_index().sort_values("Date", kind="stable")
+    joined = pd.merge_asof(ordered, features, on="Date", by="Ticker",
+                           allow_exact_matches=False, tolerance=lookback, direction="backward")
+    joined = joined.sort_values("_event").drop(columns="_event")
+    joined.index = events.index
+    return joined
+
+
+def main(full: bool = False):
+    """
+    Update the feature store from the latest daily returns file.
+
+    Args:
+        full (bool): Rebuild the store from the full history.
+    """
+    try:
+        with stage_run("feature_store") as run:
+            returns_file = find_latest_file(SILVER_RETURNS_DIR, "returns_cleaned_*.parquet")
+            if returns_file is None:
+                raise FileNotFoundError(f"No daily return files found in directory '{SILVER_RETURNS_DIR}'.")
+            with run.span("update") as update_span:
+                rows = update_feature_store(returns_file, full=full)
+                update_span.record(rows=rows)
+            logger.info(f"Wrote {rows} feature rows to '{SILVER_FEATURES_DIR}'.")
+    except Exception as e:
+        logger.error(f"Failed to update the feature store: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
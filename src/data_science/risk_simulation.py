@@ -0,0 +1,396 @@
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from common.instrumentation import stage_run, timed
+from common.paths import GOLD_DIR, SILVER_RETURNS_DIR, extract_date_part, find_latest_file
+from common.universes import load_universe_tickers, load_universes
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+RISK_DIR = os.path.join(GOLD_DIR, "risk")  # VaR/CVaR tables, one per returns file
+
+# Scenario generators:
+#   - "bootstrap": daily log returns of all assets resampled together from the history,
+#   - "normal": multivariate normal daily log returns with the historical mean and covariance,
+#   - "t": multivariate Student t daily log returns with the same mean and covariance.
+METHODS = ["bootstrap", "normal", "t"]
+HORIZONS = [1, 5, 10, 21]  # Trading days
+CONFIDENCE_LEVELS = [0.95, 0.99]
+N_SCENARIOS = 100_000
+SEED = 360
+
+LOOKBACK_DAYS = 756  # Three years of daily returns
+MIN_COVERAGE = 0.9  # Assets with returns on fewer days of the lookback are left out
+T_DEGREES_OF_FREEDOM = 5
+# Scenarios are drawn in blocks of this many, each from its own child of the seed, so
+# the scenarios do not depend on the batch size or the number of workers
+SEED_BLOCK = 4096
+# Memory budget of one batch of scenarios (the scenario matrices of a batch, per worker)
+MAX_BATCH_BYTES = 256 * 2 ** 20
+# Arrays of (scenarios x assets) alive at once while a batch is simulated
+BATCH_ARRAYS = 3
+# Scenarios are simulated in single precision: twice the draws and matrix products per
+# second, far more precision than the loss quantiles need
+SCENARIO_DTYPE = np.float32
+
+# Scenario model of the current process, set once per worker by `_init_worker`
+_model = None
+
+
+@timed()
+def load_return_history(returns_file: str, tickers: list, lookback: int = LOOKBACK_DAYS) -> pd.DataFrame:
+    """
+    Load the daily log returns of some assets over the lookback window.
+
+    Assets with returns on fewer than `MIN_COVERAGE` of the days are left out; the remaining
+    missing returns are treated as days without a price change.
+
+    Args:
+        returns_file (str): Path to the daily returns Parquet file.
+        tickers (list[str]): Assets to load.
+        lookback (int): Number of most recent trading days to keep.
+
+    Returns:
+        pd.DataFrame: Daily log returns (dates x assets), without missing values.
+    """
+    columns = ["Date"] + list(dict.fromkeys(tickers))
+    returns = pd.read_parquet(returns_file, columns=columns).set_index("Date").sort_index()
+    returns = returns.iloc[-lookback:]
+
+    coverage = returns.notna().mean()
+    dropped = coverage.index[coverage < MIN_COVERAGE]
+    if len(dropped) > 0:
+        logger.warning(f"{len(dropped)} assets with returns on less than {MIN_COVERAGE:.0%} of the last "
+                       f"{len(returns)} days are left out: {list(dropped[:10])}")
+    returns = returns.drop(columns=dropped)
+    return np.log1p(returns.fillna(0.0))
+
+
+def equal_weight_portfolios(universes: dict, columns) -> pd.DataFrame:
+    """
+    Build an equal-weighted portfolio of the constituents of every universe.
+
+    Args:
+        universes (dict): Universe name -> definition (see `common.universes`).
+        columns (list[str]): Assets available for the simulation.
+
+    Returns:
+        pd.DataFrame: Weights (assets x portfolios), each column summing to 1.
+    """
+    available = set(columns)
+    benchmarks = {universe["benchmark"] for universe in universes.values()}
+    weights = {}
+    for name, universe in universes.items():
+        tickers = load_universe_tickers(universe)
+        tickers = [ticker for ticker in (columns if tickers is None else tickers)
+                   if ticker in available and ticker not in benchmarks]
+        if tickers:
+            weights[name] = pd.Series(1.0 / len(tickers), index=list(dict.fromkeys(tickers)))
+    return pd.DataFrame(weights).reindex(list(columns)).fillna(0.0)
+
+
+def fit_scenario_model(log_returns: pd.DataFrame, method: str, degrees_of_freedom: int = T_DEGREES_OF_FREEDOM) -> dict:
+    """
+    Estimate what a scenario generator needs from the historical daily log returns.
+
+    Args:
+        log_returns (pd.DataFrame): Daily log returns (dates x assets), without missing values.
+        method (str): One of `METHODS`.
+        degrees_of_freedom (int): Degrees of freedom of the Student t scenarios (> 2).
+
+    Returns:
+        dict: The method, the historical matrix (bootstrap) or the mean and Cholesky factor
+        of the covariance (normal and t), and the degrees of freedom.
+
+    Raises:
+        ValueError: If the method is unknown.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown scenario method '{method}'. Choose from: {', '.join(METHODS)}.")
+    values = log_returns.to_numpy(dtype="float64")
+    model = {"method": method, "degrees_of_freedom": degrees_of_freedom, "n_assets": values.shape[1]}
+    if method == "bootstrap":
+        model["history"] = np.ascontiguousarray(values, dtype=SCENARIO_DTYPE)
+        return model
+
+    covariance = np.cov(values, rowvar=False)
+    try:
+        cholesky = np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        # Nearly collinear assets: nudge the diagonal to make the covariance positive definite
+        ridge = 1e-10 * np.trace(covariance) / len(covariance)
+        cholesky = np.linalg.cholesky(covariance + ridge * np.eye(len(covariance)))
+    model["mean"] = values.mean(axis=0).astype(SCENARIO_DTYPE)
+    model["cholesky_t"] = np.ascontiguousarray(cholesky.T, dtype=SCENARIO_DTYPE)
+    return model
+
+
+def _init_worker(model: dict):
+    global _model
+    _model = model
+
+
+def simulate_batch(seed_sequences: list, block_sizes: list, horizons: list, weights: np.ndarray) -> np.ndarray:
+    """
+    Simulate the losses of the portfolios over every horizon for one batch of scenarios.
+
+    Each scenario is a path of daily asset log returns shared by all horizons: the
+    cumulative log returns are accumulated from one horizon to the next. A Student t day
+    is a normal draw scaled by sqrt((df - 2) / W) with W ~ chi-square(df), so the sum of
+    the days between two horizons is one normal draw scaled by the root of the summed
+    squared scales (exact); normal scenarios are the case where every scale is 1. The
+    Cholesky factor is then applied once per horizon to the accumulated draws, instead of
+    once per day. Portfolios are bought and held over the horizon. Every block of scenarios
+    draws from its own generator, while the arithmetic runs on the whole batch.
+
+    Args:
+        seed_sequences (list[np.random.SeedSequence]): Seeds of the blocks of this batch.
+        block_sizes (list[int]): Number of scenarios in each block.
+        horizons (list[int]): Horizons in trading days, increasing.
+        weights (np.ndarray): Portfolio weights (assets x portfolios).
+
+    Returns:
+        np.ndarray: Losses as fractions of the portfolio value (scenarios x horizons x portfolios).
+    """
+    model = _model
+    bounds = np.cumsum([0] + list(block_sizes))
+    blocks = [(np.random.default_rng(seed_sequence), slice(start, stop))
+              for seed_sequence, start, stop in zip(seed_sequences, bounds[:-1], bounds[1:])]
+    n_scenarios = int(bounds[-1])
+    method = model["method"]
+    losses = np.empty((n_scenarios, len(horizons), weights.shape[1]), dtype=SCENARIO_DTYPE)
+    accumulated = np.zeros((n_scenarios, model["n_assets"]), dtype=SCENARIO_DTYPE)
+    weights = weights.astype(SCENARIO_DTYPE)
+
+    # Scratch matrix for the resampled days and the asset returns of every horizon
+    scratch = np.empty_like(accumulated)
+
+    previous = 0
+    for position, horizon in enumerate(horizons):
+        steps = horizon - previous
+        if method == "bootstrap":
+            history = model["history"]
+            for _ in range(steps):
+                days = np.concatenate([rng.integers(0, len(history), block.stop - block.start)
+                                       for rng, block in blocks])
+                np.take(history, days, axis=0, out=scratch)
+                accumulated += scratch
+            np.expm1(accumulated, out=scratch)
+        else:
+            draws = np.empty_like(accumulated)
+            for rng, block in blocks:
+                rng.standard_normal(dtype=SCENARIO_DTYPE, out=draws[block])
+            if method == "normal":
+                draws *= math.sqrt(steps)
+            else:
+                df = model["degrees_of_freedom"]
+                variance = np.concatenate([((df - 2) / rng.chisquare(df, (steps, block.stop - block.start))).sum(axis=0)
+                                           for rng, block in blocks])
+                draws *= np.sqrt(variance).astype(SCENARIO_DTYPE)[:, None]
+            accumulated += draws
+            del draws
+            np.matmul(accumulated, model["cholesky_t"], out=scratch)
+            scratch += horizon * model["mean"]
+            np.expm1(scratch, out=scratch)
+        # Buy-and-hold portfolio return: weighted sum of the asset returns
+        losses[:, position, :] = -(scratch @ weights)
+        previous = horizon
+    return losses
+
+
+def get_batch_size(n_assets: int, max_batch_bytes: int = MAX_BATCH_BYTES) -> int:
+    """
+    Get the number of scenarios per batch that keeps a batch within the memory budget,
+    in whole seed blocks (at least one).
+    """
+    itemsize = np.dtype(SCENARIO_DTYPE).itemsize
+    return max(1, int(max_batch_bytes // (BATCH_ARRAYS * itemsize * n_assets)) // SEED_BLOCK) * SEED_BLOCK
+
+
+@contextmanager
+def _single_threaded_blas():
+    """
+    Limit BLAS to one thread in the worker processes started within the block, so that
+    parallel batches do not oversubscribe the cores.
+    """
+    names = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]
+    saved = {name: os.environ.get(name) for name in names}
+    os.environ.update({name: "1" for name in names})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@timed()
+def simulate_losses(model: dict, weights: pd.DataFrame, n_scenarios: int = N_SCENARIOS, horizons=HORIZONS,
+                    seed: int = SEED, workers: int = None, max_batch_bytes: int = MAX_BATCH_BYTES):
+    """
+    Simulate portfolio losses in memory-bounded batches, in parallel across processes.
+
+    Every block of `SEED_BLOCK` scenarios gets its own child of one `SeedSequence`, and
+    batches are made of whole blocks, so the scenarios only depend on the seed, not on the
+    memory budget or the number of workers.
+
+    Args:
+        model (dict): Scenario model from `fit_scenario_model`.
+        weights (pd.DataFrame): Portfolio weights (assets x portfolios), in the model's asset order.
+        n_scenarios (int): Total number of scenarios.
+        horizons (list[int]): Horizons in trading days.
+        seed (int): Seed of the simulation.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs;
+            with 1, batches run in this process.
+        max_batch_bytes (int): Memory budget of one batch.
+
+    Returns:
+        tuple[np.ndarray, dict]: Losses (scenarios x horizons x portfolios), and run statistics
+        (batches, batch size, seconds, scenarios per second).
+    """
+    horizons = sorted(set(horizons))
+    full_blocks, remainder = divmod(n_scenarios, SEED_BLOCK)
+    block_sizes = [SEED_BLOCK] * full_blocks + ([remainder] if remainder else [])
+    block_seeds = np.random.SeedSequence(seed).spawn(len(block_sizes))
+    blocks_per_batch = get_batch_size(model["n_assets"], max_batch_bytes) // SEED_BLOCK
+    batch_size = min(n_scenarios, blocks_per_batch * SEED_BLOCK)
+    seeds = [block_seeds[i:i + blocks_per_batch] for i in range(0, len(block_sizes), blocks_per_batch)]
+    sizes = [block_sizes[i:i + blocks_per_batch] for i in range(0, len(block_sizes), blocks_per_batch)]
+    weight_values = weights.to_numpy(dtype="float64")
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(model)
+        batches = [simulate_batch(batch_seed, size, horizons, weight_values) for batch_seed, size in zip(seeds, sizes)]
+    else:
+        with _single_threaded_blas(), ProcessPoolExecutor(
+            max_workers=min(workers, len(sizes)), mp_context=get_context("spawn"),
+            initializer=_init_worker, initargs=(model,),
+        ) as executor:
+            batches = list(executor.map(simulate_batch, seeds, sizes, [horizons] * len(sizes),
+                                        [weight_values] * len(sizes)))
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        "batches": len(sizes),
+        "batch_size": batch_size,
+        "workers": min(workers, len(sizes)),
+        "seconds": round(elapsed, 3),
+        "scenarios_per_second": round(n_scenarios / elapsed, 1),
+    }
+    logger.info(f"Simulated {n_scenarios} '{model['method']}' scenarios x {model['n_assets']} assets "
+                f"x {len(horizons)} horizons in {elapsed:.2f} s ({stats['scenarios_per_second']:.0f} scenarios/s, "
+                f"{len(sizes)} batches of up to {batch_size} on {stats['workers']} workers)")
+    return np.concatenate(batches), stats
+
+
+def summarize_losses(losses: np.ndarray, horizons, portfolios, confidence_levels=CONFIDENCE_LEVELS) -> pd.DataFrame:
+    """
+    Calculate the Value at Risk and Conditional Value at Risk of simulated losses.
+
+    VaR is the loss quantile at the confidence level; CVaR (expected shortfall) is the
+    mean of the losses at or beyond the VaR.
+
+    Args:
+        losses (np.ndarray): Losses (scenarios x horizons x portfolios).
+        horizons (list[int]): Horizons of the second axis.
+        portfolios (list[str]): Portfolios of the third axis.
+        confidence_levels (list[float]): Confidence levels (e.g. 0.99).
+
+    Returns:
+        pd.DataFrame: 'Portfolio', 'Horizon', 'Confidence', 'VaR' and 'CVaR' columns, as
+        fractions of the portfolio value.
+    """
+    rows = []
+    for confidence in confidence_levels:
+        var = np.quantile(losses, confidence, axis=0)
+        tail = losses >= var
+        cvar = (losses * tail).sum(axis=0) / tail.sum(axis=0)
+        for h, horizon in enumerate(sorted(set(horizons))):
+            for p, portfolio in enumerate(portfolios):
+                rows.append({"Portfolio": portfolio, "Horizon": horizon, "Confidence": confidence,
+                             "VaR": var[h, p], "CVaR": cvar[h, p]})
+    return pd.DataFrame(rows)
+
+
+def run_risk_simulation(returns_file: str, weights: pd.DataFrame = None, methods=METHODS,
+                        n_scenarios: int = N_SCENARIOS, horizons=HORIZONS, confidence_levels=CONFIDENCE_LEVELS,
+                        seed: int = SEED, workers: int = None) -> pd.DataFrame:
+    """
+    Estimate the VaR and CVaR of portfolios with every scenario generator.
+
+    Args:
+        returns_file (str): Path to the daily returns Parquet file.
+        weights (pd.DataFrame, optional): Portfolio weights (assets x portfolios). Defaults to
+            an equal-weighted portfolio of every configured universe.
+        methods (list[str]): Scenario generators (see `METHODS`).
+        n_scenarios (int): Number of scenarios per generator.
+        horizons (list[int]): Horizons in trading days.
+        confidence_levels (list[float]): Confidence levels.
+        seed (int): Seed of the simulation.
+        workers (int, optional): Number of worker processes.
+
+    Returns:
+        pd.DataFrame: 'Portfolio', 'Method', 'Horizon', 'Confidence', 'VaR', 'CVaR',
+        'Scenarios' and 'Scenarios per Second' columns.
+    """
+    if weights is None:
+        tickers = [name for name in pq.read_schema(returns_file).names if name != "Date"]
+        weights = equal_weight_portfolios(load_universes(), tickers)
+    weights = weights.loc[:, weights.abs().sum() > 0]
+    log_returns = load_return_history(returns_file, list(weights.index[weights.abs().sum(axis=1) > 0]))
+    # Assets left out of the history are left out of the portfolios too
+    weights = weights.reindex(log_returns.columns).fillna(0.0)
+    weights = weights / weights.sum()
+
+    results = []
+    for method in methods:
+        model = fit_scenario_model(log_returns, method)
+        losses, stats = simulate_losses(model, weights, n_scenarios, horizons, seed, workers)
+        summary = summarize_losses(losses, horizons, list(weights.columns), confidence_levels)
+        summary.insert(1, "Method", method)
+        summary["Scenarios"] = n_scenarios
+        summary["Scenarios per Second"] = stats["scenarios_per_second"]
+        results.append(summary)
+    return pd.concat(results, ignore_index=True)
+
+
+def main():
+    """
+    Estimate the VaR and CVaR of an equal-weighted portfolio of every universe from the latest daily returns.
+    """
+    try:
+        with stage_run("risk_simulation") as run:
+            returns_file = find_latest_file(SILVER_RETURNS_DIR, "returns_cleaned_*.parquet")
+            if returns_file is None:
+                raise FileNotFoundError(f"No daily return files found in directory '{SILVER_RETURNS_DIR}'.")
+            with run.span("simulate") as simulate_span:
+                risk = run_risk_simulation(returns_file)
+                simulate_span.record(rows=N_SCENARIOS * len(METHODS))
+            with run.span("write") as write_span:
+                os.makedirs(RISK_DIR, exist_ok=True)
+                output_file = os.path.join(RISK_DIR, f"risk_{extract_date_part(returns_file)}.parquet")
+                risk.to_parquet(output_file, index=False, engine="pyarrow")
+                write_span.record_file(output_file)
+            logger.info(f"Saved VaR/CVaR to {output_file}:\n{risk[risk['Horizon'] == 1].to_string(index=False)}")
+    except Exception as e:
+        logger.error(f"Failed to run the risk simulation: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
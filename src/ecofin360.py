@@ -0,0 +1,343 @@
+"""
+Command-line entry point for the EcoFin360 pipeline: `python src/ecofin360.py <stage>`.
+
+Each subcommand runs one pipeline stage. Stage modules (and with them pandas, pyarrow,
+yfinance, ...) are only imported once a stage actually has work to do: the "already up
+to date" checks below only look at file names and modification times, so a no-op run
+returns without loading any data library.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+from common.paths import (
+    BRONZE_INTRADAY_DIR,
+    BRONZE_STOCKS_DIR,
+    EMPTY_SESSIONS_FILE,
+    GOLD_DIR,
+    SILVER_FEATURES_DIR,
+    SILVER_INTRADAY_DIR,
+    SILVER_LONG_FORMAT_DIR,
+    SILVER_PERFORMANCE_DIR,
+    SILVER_RETURNS_DIR,
+    SILVER_STOCKS_DIR,
+    cleaned_price_file,
+    daily_price_file,
+    extract_date_part,
+    find_latest_file,
+    find_returns_file,
+    long_format_part_name,
+    performance_file_name,
+)
+from common.market_calendar import is_trading_day
+from common.universes import load_universes
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("ecofin360")
+
+
+def _is_newer(output_file: str, input_file: str) -> bool:
+    return os.path.exists(output_file) and os.path.getmtime(output_file) >= os.path.getmtime(input_file)
+
+
+def check_prices():
+    """
+    Return why the prices stage can be skipped, or None if it has work to do.
+    """
+    daily_file = daily_price_file()
+    if os.path.exists(daily_file):
+        return f"today's prices already exist ({daily_file})"
+    return None
+
+
+def check_clean():
+    """
+    Return why the cleaning stage can be skipped, or None if it has work to do.
+    """
+    raw_file = find_latest_file(BRONZE_STOCKS_DIR, "*-adj-close.csv")
+    if raw_file is None:
+        return None
+    cleaned_file = cleaned_price_file(raw_file)
+    if _is_newer(cleaned_file, raw_file):
+        return f"{cleaned_file} is up to date"
+    return None
+
+
+def check_returns():
+    """
+    Return why the daily returns stage can be skipped, or None if it has work to do.
+    """
+    cleaned_file = find_latest_file(SILVER_STOCKS_DIR, "cleaned_*adj-close.parquet")
+    date_part = extract_date_part(cleaned_file) if cleaned_file else None
+    if date_part is None:
+        return None
+    returns_file = find_returns_file(date_part)
+    if returns_file is not None and _is_newer(returns_file, cleaned_file):
+        return f"{returns_file} is up to date"
+    return None
+
+
+def check_performance():
+    """
+    Return why the annual performance stage can be skipped, or None if it has work to do.
+    """
+    returns_file = find_latest_file(SILVER_RETURNS_DIR, "returns_cleaned_*.parquet")
+    date_part = extract_date_part(returns_file) if returns_file else None
+    if date_part is None:
+        return None
+    names = list(load_universes())
+    performance_files = [
+        os.path.join(SILVER_PERFORMANCE_DIR, performance_file_name(date_part, name)) for name in names
+    ]
+    if all(_is_newer(performance_file, returns_file) for performance_file in performance_files):
+        return f"metrics of {', '.join(names)} for {date_part} are up to date"
+    return None
+
+
+def check_long_format():
+    """
+    Return why the long-format stage can be skipped, or None if it has work to do.
+    """
+    # The stage converts the latest cleaned prices and the returns of the same date
+    cleaned_file = find_latest_file(SILVER_STOCKS_DIR, "cleaned_*adj-close.parquet")
+    date_part = extract_date_part(cleaned_file) if cleaned_file else None
+    if date_part is None or find_returns_file(date_part) is None:
+        return None
+    # Every run writes files named after its date in the ticker partitions it appends to
+    if glob.glob(os.path.join(SILVER_LONG_FORMAT_DIR, "*", long_format_part_name(date_part))):
+        return f"dates up to {date_part} are already in {SILVER_LONG_FORMAT_DIR}"
+    return None
+
+
+def check_gold():
+    """
+    Return why the gold materialization stage can be skipped, or None if it has work to do.
+    """
+    returns_file = find_latest_file(SILVER_RETURNS_DIR, "returns_cleaned_*.parquet")
+    if returns_file is None:
+        return None
+    # The state file is written after every gold table
+    state_file = os.path.join(GOLD_DIR, "_state.json")
+    if not _is_newer(state_file, returns_file):
+        return None
+    with open(state_file) as file:
+        state = json.load(file)
+    if state.get("returns_file") == os.path.basename(returns_file):
+        return f"gold tables are up to date with {returns_file}"
+    return None
+
+
+def check_risk():
+    """
+    Return why the risk simulation stage can be skipped, or None if it has work to do.
+    """
+    returns_file = find_latest_file(SILVER_RETURNS_DIR, "returns_cleaned_*.parquet")
+    date_part = extract_date_part(returns_file) if returns_file else None
+    if date_part is None:
+        return None
+    risk_file = os.path.join(GOLD_DIR, "risk", f"risk_{date_part}.parquet")
+    if _is_newer(risk_file, returns_file):
+        return f"{risk_file} is up to date"
+    return None
+
+
+def check_features():
+    """
+    Return why the feature store stage can be skipped, or None if it has work to do.
+    """
+    returns_file = find_latest_file(SILVER_RETURNS_DIR, "returns_cleaned_*.parquet")
+    if returns_file is None:
+        return None
+    # The state file is written after the new feature rows
+    state_file = os.path.join(SILVER_FEATURES_DIR, "_state.json")
+    if not _is_newer(state_file, returns_file):
+        return None
+    with open(state_file) as file:
+        state = json.load(file)
+    if state.get("returns_file") == os.path.basename(returns_file):
+        return f"features are up to date with {returns_file}"
+    return None
+
+
+def _list_sessions(dataset_dir: str) -> set:
+    if not os.path.isdir(dataset_dir):
+        return set()
+    return {name.split("=", 1)[1] for name in os.listdir(dataset_dir) if name.startswith("Date=")}
+
+
+def check_intraday(days: int = 5):
+    """
+    Return why the minute bar ingestion can be skipped, or None if it has work to do.
+    """
+    today = date.today()
+    sessions = {
+        f"{day:%Y-%m-%d}" for day in (today - timedelta(days=offset) for offset in range(1, days + 1))
+        if is_trading_day(day)
+    }
+    ingested = _list_sessions(BRONZE_INTRADAY_DIR)
+    # Sessions fetched without any bar have no partition
+    empty_sessions_file = os.path.join(BRONZE_INTRADAY_DIR, EMPTY_SESSIONS_FILE)
+    if os.path.exists(empty_sessions_file):
+        with open(empty_sessions_file) as file:
+            ingested |= set(json.load(file))
+    if sessions <= ingested:
+        return f"minute bars of the last {days} days are already in {BRONZE_INTRADAY_DIR}"
+    return None
+
+
+def check_resample():
+    """
+    Return why the intraday resampling stage can be skipped, or None if it has work to do.
+    """
+    # Daily bars are written last for each session, so they mark it as resampled
+    if _list_sessions(BRONZE_INTRADAY_DIR) <= _list_sessions(os.path.join(SILVER_INTRADAY_DIR, "bars_1D")):
+        return "every stored session is already resampled"
+    return None
+
+
+def run_tickers():
+    from data_engineering.fetch_universe_tickers import update_universe_tickers
+    update_universe_tickers()
+
+
+def run_prices():
+    from data_engineering.download_historical_prices import save_daily_prices
+    save_daily_prices()
+
+
+def run_clean():
+    from transformations.clean_stock_data import process_latest_stock_data
+    process_latest_stock_data()
+
+
+def run_returns():
+    from transformations.calculate_daily_return import main
+    main()
+
+
+def run_performance():
+    from transformations.analyze_annual_stock_performance import main
+    main()
+
+
+def run_long_format():
+    from transformations.long_format import main
+    main()
+
+
+def run_gold():
+    from transformations.materialize_gold_views import main
+    main()
+
+
+def run_risk():
+    from data_science.risk_simulation import main
+    main()
+
+
+def run_features():
+    from data_science.feature_store import main
+    main()
+
+
+def run_intraday():
+    from data_engineering.intraday_bars import update_minute_bars
+    update_minute_bars()
+
+
+def run_resample():
+    from transformations.resample_intraday_bars import main
+    main()
+
+
+# Pipeline stages in execution order: name -> (help, up-to-date check, runner)
+STAGES = {
+    "tickers": ("Fetch the tickers of every universe (and the S&P 500 membership history)", None, run_tickers),
+    "prices": ("Download raw closes and corporate actions, and save adjusted closes", check_prices, run_prices),
+    "clean": ("Clean the latest adjusted closes into the silver layer", check_clean, run_clean),
+    "returns": ("Calculate daily returns from the latest cleaned prices", check_returns, run_returns),
+    "performance": ("Calculate annual performance metrics of every universe", check_performance, run_performance),
+    "long-format": ("Append the latest prices and returns to the long-format dataset", check_long_format,
+                    run_long_format),
+    "gold": ("Update the gold tables (monthly/yearly returns, sectors, rankings)", check_gold, run_gold),
+    "risk": ("Simulate the VaR/CVaR of an equal-weighted portfolio of every universe", check_risk, run_risk),
+    "features": ("Append the features of the new dates to the forecasting feature store", check_features,
+                 run_features),
+    "intraday": ("Ingest the minute bars of the last sessions", check_intraday, run_intraday),
+    "resample": ("Resample minute bars to 5-min/hourly/daily bars and daily returns", check_resample,
+                 run_resample),
+}
+
+# Stages left out of `run` unless --intraday is given
+INTRADAY_STAGES = ["intraday", "resample"]
+
+
+def run_stage(name: str, force: bool = False) -> bool:
+    """
+    Run one pipeline stage unless its outputs are already up to date.
+
+    Args:
+        name (str): Stage name (a key of `STAGES`).
+        force (bool): Run the stage even if its outputs are up to date.
+
+    Returns:
+        bool: False if the stage failed (the error is logged), True otherwise.
+    """
+    _, check, runner = STAGES[name]
+    reason = check() if check is not None and not force else None
+    if reason:
+        logger.info(f"[{name}] Already up to date: {reason}. Skipping.")
+        return True
+    start = time.perf_counter()
+    try:
+        runner()
+    except Exception as e:
+        logger.error(f"[{name}] Failed after {time.perf_counter() - start:.2f} s: {e}")
+        return False
+    logger.info(f"[{name}] Finished in {time.perf_counter() - start:.2f} s")
+    return True
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="ecofin360", description="Run the EcoFin360 data pipeline stages.")
+    subparsers = parser.add_subparsers(dest="stage", required=True, metavar="stage")
+    for name, (help_text, _, _) in STAGES.items():
+        stage_parser = subparsers.add_parser(name, help=help_text, description=help_text)
+        stage_parser.add_argument("--force", action="store_true", help="Run even if the outputs are up to date")
+    run_parser = subparsers.add_parser("run", help="Run every stage in order", description="Run every stage in order")
+    run_parser.add_argument("--force", action="store_true", help="Run stages even if their outputs are up to date")
+    run_parser.add_argument("--skip", nargs="+", default=[], choices=list(STAGES), help="Stages to leave out")
+    run_parser.add_argument("--intraday", action="store_true", help="Also ingest and resample minute bars")
+    serve_parser = subparsers.add_parser("serve", help="Serve metrics, returns and correlations over HTTP",
+                                         description="Serve metrics, returns and correlations over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    serve_parser.add_argument("--port", type=int, default=8360, help="Port to listen on")
+    serve_parser.add_argument("--cache-mb", type=float, default=64, help="Size of the response cache in MB")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.stage == "serve":
+        from serving.metrics_api import main as serve
+        serve(args.host, args.port, args.cache_mb)
+        return 0
+    if args.stage == "run":
+        skipped = set(args.skip) | (set() if args.intraday else set(INTRADAY_STAGES))
+        stages = [name for name in STAGES if name not in skipped]
+    else:
+        stages = [args.stage]
+    for name in stages:
+        # Later stages read the outputs of the earlier ones: stop at the first failure
+        if not run_stage(name, force=args.force):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,456 @@
+"""
+Asyncio HTTP service for performance metrics, return series and correlations.
+
+Endpoints (GET, JSON responses):
+    /health                                          data version and cache statistics
+    /metrics?universe=sp500[&tickers=AAPL,MSFT]      performance metrics of a universe
+    /metrics/<ticker>                                metrics of one ticker in every universe
+    /returns?tickers=AAPL,MSFT[&start=&end=]         daily returns over a date range
+    /correlation?tickers=AAPL,MSFT,NVDA[&start=&end=]  correlation submatrix over a date range
+
+Returns are served from an uncompressed Arrow IPC copy of the latest silver returns file,
+memory-mapped so column slices are zero-copy views of the page cache. Encoded responses
+are kept in an LRU cache bounded by their total size in bytes, which is cleared whenever
+the served silver files (the latest returns file and the metrics files) change.
+
+Usage (from the repository root):
+    python src/ecofin360.py serve --port 8360
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from common.paths import SILVER_PERFORMANCE_DIR, SILVER_RETURNS_DIR, find_latest_file, parse_performance_file_name
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+SERVING_DIR = "data/silver/serving/"  # Memory-mappable Arrow copies of the silver returns
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8360
+DEFAULT_CACHE_MB = 64
+
+# How often (in seconds) the source files are checked for a new pipeline run
+VERSION_CHECK_INTERVAL = 1.0
+
+STATUS_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                  431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    """
+    Error answered to the client with an HTTP status code and a JSON message.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """
+    Least-recently-used cache of encoded responses, bounded by their total size in bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key))
+        self._entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+        }
+
+
+def to_json_list(values: np.ndarray) -> list:
+    """
+    Convert a float array to a JSON-ready list, with NaN as null.
+    """
+    return [None if value != value else value for value in values.tolist()]
+
+
+def parse_tickers(query: dict, required: bool = True) -> list:
+    tickers = [ticker for value in query.get("tickers", []) for ticker in value.split(",") if ticker]
+    if required and not tickers:
+        raise RequestError(400, "The 'tickers' parameter is required (comma-separated).")
+    return list(dict.fromkeys(tickers))
+
+
+def parse_date(query: dict, name: str):
+    if name not in query:
+        return None
+    try:
+        return np.datetime64(pd.Timestamp(query[name][0]), "ns")
+    except ValueError:
+        raise RequestError(400, f"Invalid '{name}' date: {query[name][0]}")
+
+
+class SilverData:
+    """
+    Memory-mapped view of the latest silver daily returns and performance metrics.
+    """
+
+    def __init__(self, returns_dir=SILVER_RETURNS_DIR, performance_dir=SILVER_PERFORMANCE_DIR,
+                 serving_dir=SERVING_DIR):
+        self.returns_dir = returns_dir
+        self.performance_dir = performance_dir
+        self.serving_dir = serving_dir
+        self.version = None
+        self.returns_file = None
+        self.dates = np.array([], dtype="datetime64[ns]")
+        self.columns = {}
+        self.performance = {}
+        self._table = None
+
+    def get_version(self):
+        """
+        Identify the current state of the served files (paths and modification times).
+
+        Only the files the service reads count: other pipeline outputs (e.g. the run log,
+        appended to by every stage) do not invalidate the cache.
+        """
+        files = [find_latest_file(self.returns_dir, "returns_cleaned_*.parquet")]
+        if os.path.isdir(self.performance_dir):
+            files += sorted(
+                os.path.join(self.performance_dir, name) for name in os.listdir(self.performance_dir)
+                if name.endswith(".parquet")
+            )
+        return tuple((path, os.path.getmtime(path)) for path in files if path and os.path.exists(path))
+
+    def _memory_map_returns(self, returns_file):
+        """
+        Memory-map the Arrow IPC copy of a returns file, writing the copy first if needed.
+        """
+        arrow_file = os.path.join(self.serving_dir, os.path.basename(returns_file).replace(".parquet", ".arrow"))
+        if not os.path.exists(arrow_file) or os.path.getmtime(arrow_file) < os.path.getmtime(returns_file):
+            table = pq.read_table(returns_file)
+            # Missing returns become NaN so every column converts to NumPy without a copy
+            columns = [
+                pc.fill_null(column, np.nan) if pa.types.is_floating(column.type) else column
+                for column in table.columns
+            ]
+            table = pa.table(columns, names=table.column_names).combine_chunks()
+            os.makedirs(self.serving_dir, exist_ok=True)
+            temporary_file = f"{arrow_file}.tmp"
+            with pa.OSFile(temporary_file, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temporary_file, arrow_file)
+            logger.info(f"Wrote memory-mappable returns to: {arrow_file}")
+        return pa.ipc.open_file(pa.memory_map(arrow_file, "r")).read_all()
+
+    def reloaded(self):
+        """
+        Return a new view of the same directories, loaded with the latest files.
+        """
+        data = SilverData(self.returns_dir, self.performance_dir, self.serving_dir)
+        data.load()
+        return data
+
+    def load(self):
+        """
+        Load the latest returns and performance metrics.
+        """
+        version = self.get_version()
+        returns_file = find_latest_file(self.returns_dir, "returns_cleaned_*.parquet")
+        if returns_file is not None:
+            self._table = self._memory_map_returns(returns_file)
+            self.dates = self._table.column("Date").to_numpy()
+            self.columns = {name: index for index, name in enumerate(self._table.column_names) if name != "Date"}
+        else:
+            self._table, self.dates, self.columns = None, np.array([], dtype="datetime64[ns]"), {}
+        self.returns_file = returns_file
+
+        # Latest metrics file of every universe (see `performance_file_name`)
+        latest = {}
+        if os.path.isdir(self.performance_dir):
+            files = []
+            for name in os.listdir(self.performance_dir):
+                parsed = parse_performance_file_name(name)
+                if parsed is not None:
+                    files.append((*parsed, name))
+            # Sorted by date, so the latest file of a universe comes last
+            for _, universe, name in sorted(files):
+                latest[universe] = os.path.join(self.performance_dir, name)
+        self.performance = {
+            universe: pd.read_parquet(path).set_index("Ticker") for universe, path in latest.items()
+        }
+        self.version = version
+        logger.info(f"Loaded {len(self.columns)} return series and metrics of {len(self.performance)} universes.")
+
+    def column(self, ticker) -> np.ndarray:
+        if ticker not in self.columns:
+            raise RequestError(404, f"Unknown ticker: {ticker}")
+        return self._table.column(self.columns[ticker]).to_numpy()
+
+    def date_range(self, start, end) -> slice:
+        first = 0 if start is None else int(np.searchsorted(self.dates, start, side="left"))
+        last = len(self.dates) if end is None else int(np.searchsorted(self.dates, end, side="right"))
+        return slice(first, last)
+
+    def returns(self, tickers, start=None, end=None):
+        """
+        Get the daily returns of some tickers over a date range.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Dates and a (dates x tickers) matrix of returns.
+        """
+        rows = self.date_range(start, end)
+        matrix = np.column_stack([self.column(ticker)[rows] for ticker in tickers]) if tickers else None
+        return self.dates[rows], matrix
+
+
+class MetricsService:
+    """
+    Request handling for the HTTP service: routing, caching and invalidation.
+    """
+
+    def __init__(self, data: SilverData, cache_bytes=DEFAULT_CACHE_MB * 2 ** 20):
+        self.data = data
+        self.cache = LRUCache(cache_bytes)
+        self._checked_at = 0.0
+        self._reload_lock = asyncio.Lock()
+
+    async def refresh(self):
+        """
+        Reload the data and clear the cache after a new pipeline run (checked at most once a second).
+
+        The version check (a directory listing and stat calls) and the loading run in the
+        default executor, so the event loop keeps answering requests (from the previous data)
+        meanwhile. The reloaded data replaces the current one in a single assignment, so
+        requests already being computed keep a consistent view of the previous files.
+        """
+        now = time.monotonic()
+        if now - self._checked_at < VERSION_CHECK_INTERVAL and self.data.version is not None:
+            return
+        self._checked_at = now
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self.data.get_version) == self.data.version:
+            return
+        async with self._reload_lock:
+            # Another request may have reloaded the data while this one waited
+            if await loop.run_in_executor(None, self.data.get_version) != self.data.version:
+                self.data = await loop.run_in_executor(None, self.data.reloaded)
+                self.cache.clear()
+
+    async def handle(self, method, target):
+        """
+        Answer one request.
+
+        Returns:
+            tuple[int, bytes]: HTTP status and JSON body.
+        """
+        if method != "GET":
+            return 405, json.dumps({"error": f"Method {method} not allowed."}).encode()
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip("/") or "/"
+        query = parse_qs(url.query)
+        try:
+            await self.refresh()
+            if path == "/health":
+                return 200, self.health()
+
+            key = (path, tuple(sorted((name, tuple(values)) for name, values in query.items())))
+            body = self.cache.get(key)
+            if body is None:
+                data = self.data
+                body = await asyncio.get_running_loop().run_in_executor(None, self.route, data, path, query)
+                if data is self.data:
+                    self.cache.put(key, body)
+            return 200, body
+        except RequestError as e:
+            return e.status, json.dumps({"error": str(e)}).encode()
+        except Exception as e:
+            logger.error(f"Error handling {target}: {e}")
+            return 500, json.dumps({"error": "Internal server error."}).encode()
+
+    def route(self, data, path, query) -> bytes:
+        if path == "/metrics":
+            return self.metrics(data, query)
+        if path.startswith("/metrics/"):
+            return self.ticker_metrics(data, path[len("/metrics/"):])
+        if path == "/returns":
+            return self.returns(data, query)
+        if path == "/correlation":
+            return self.correlation(data, query)
+        raise RequestError(404, f"Unknown endpoint: {path}")
+
+    def health(self) -> bytes:
+        return json.dumps({
+            "status": "ok",
+            "returns_file": self.data.returns_file,
+            "tickers": len(self.data.columns),
+            "universes": sorted(self.data.performance),
+            "cache": self.cache.stats(),
+        }).encode()
+
+    @staticmethod
+    def metrics(data, query) -> bytes:
+        universe = query.get("universe", [None])[0]
+        if universe not in data.performance:
+            raise RequestError(404, f"Unknown universe: {universe}. Available: {', '.join(sorted(data.performance))}")
+        performance = data.performance[universe]
+        tickers = parse_tickers(query, required=False)
+        if tickers:
+            unknown = [ticker for ticker in tickers if ticker not in performance.index]
+            if unknown:
+                raise RequestError(404, f"Unknown tickers in universe '{universe}': {', '.join(unknown)}")
+            performance = performance.loc[tickers]
+        records = performance.reset_index()
+        records = records.astype(object).where(records.notna(), None)
+        return json.dumps({"universe": universe, "metrics": records.to_dict("records")}).encode()
+
+    @staticmethod
+    def ticker_metrics(data, ticker) -> bytes:
+        metrics = {
+            universe: {
+                name: (None if pd.isna(value) else value)
+                for name, value in performance.loc[ticker].items()
+            }
+            for universe, performance in data.performance.items() if ticker in performance.index
+        }
+        if not metrics:
+            raise RequestError(404, f"Unknown ticker: {ticker}")
+        return json.dumps({"ticker": ticker, "metrics": metrics}).encode()
+
+    @staticmethod
+    def returns(data, query) -> bytes:
+        tickers = parse_tickers(query)
+        dates, matrix = data.returns(tickers, parse_date(query, "start"), parse_date(query, "end"))
+        return json.dumps({
+            "dates": np.datetime_as_string(dates, unit="D").tolist(),
+            "returns": {ticker: to_json_list(matrix[:, position]) for position, ticker in enumerate(tickers)},
+        }).encode()
+
+    @staticmethod
+    def correlation(data, query) -> bytes:
+        tickers = parse_tickers(query)
+        if len(tickers) < 2:
+            raise RequestError(400, "At least two tickers are needed for a correlation matrix.")
+        dates, matrix = data.returns(tickers, parse_date(query, "start"), parse_date(query, "end"))
+        # Pairwise-complete correlations, as tickers list and delist at different dates
+        correlation = pd.DataFrame(matrix, columns=tickers).corr().round(4).to_numpy()
+        return json.dumps({
+            "tickers": tickers,
+            "start": np.datetime_as_string(dates[0], unit="D") if len(dates) else None,
+            "end": np.datetime_as_string(dates[-1], unit="D") if len(dates) else None,
+            "observations": len(dates),
+            "matrix": [to_json_list(row) for row in correlation],
+        }).encode()
+
+
+async def handle_connection(service: MetricsService, reader, writer):
+    """
+    Serve the HTTP/1.1 requests of one (keep-alive) connection.
+    """
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                writer.write(b"HTTP/1.1 431 Request Header Fields Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                break
+
+            request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+            try:
+                method, target, version = request_line.split(" ", 2)
+            except ValueError:
+                break
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+
+            try:
+                content_length = int(headers.get("content-length", 0) or 0)
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                # The end of the request body is unknown: answer and close the connection
+                status, body = 400, json.dumps({"error": "Invalid Content-Length header."}).encode()
+                keep_alive = False
+            else:
+                if content_length:
+                    await reader.readexactly(content_length)
+                status, body = await service.handle(method, target)
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, cache_mb=DEFAULT_CACHE_MB, data: SilverData = None):
+    """
+    Run the HTTP service until cancelled.
+    """
+    service = MetricsService(data or SilverData(), cache_bytes=int(cache_mb * 2 ** 20))
+    # Load before accepting connections
+    await service.refresh()
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(service, reader, writer), host, port
+    )
+    logger.info(f"Serving metrics on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main(host=DEFAULT_HOST, port=DEFAULT_PORT, cache_mb=DEFAULT_CACHE_MB):
+    try:
+        asyncio.run(serve(host, port, cache_mb))
+    except KeyboardInterrupt:
+        logger.info("Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,21 @@
 import os
 import re
+import numpy as np
 import pandas as pd
 import logging
 
+from common.instrumentation import span, stage_run
+from common.paths import SILVER_PERFORMANCE_DIR, SILVER_RETURNS_DIR, SILVER_STOCKS_DIR, performance_file_name
+from common.universes import DEFAULT_UNIVERSE, get_universe, load_universe_tickers, load_universes
+from data_engineering.sp500_membership import load_membership_history, mask_returns
+from transformations.gap_handling import complete_tickers, get_coverage_path, load_coverage
+
 # Initialize logger and relevant directory paths
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-DAILY_RETURN_DIR = "data/silver/returns/"  # Directory for daily returns
-ANNUAL_PERFORMANCE_DIR = "data/silver/performance/"  # Directory for annual performance output
-os.makedirs(ANNUAL_PERFORMANCE_DIR, exist_ok=True)
+DAILY_RETURN_DIR = SILVER_RETURNS_DIR  # Directory for daily returns
+ANNUAL_PERFORMANCE_DIR = SILVER_PERFORMANCE_DIR  # Directory for annual performance output
 
 
 def get_latest_daily_return_parquet_file(directory: str) -> str:
@@ -64,101 +70,294 @@ def extract_date_from_file(file_name: str) -> str:
     raise ValueError(f"File name does not contain a valid date: {file_name}")
 
 
-def calculate_annual_metrics_for_latest(folder_path: str, output_dir: str) -> None:
+STATISTICS = ["mean", "std", "var"]
+
+
+def _complete_annual_statistics(daily_returns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calculate the yearly statistics of tickers whose only missing return is the first day's.
+
+    The years are contiguous row ranges of the sorted returns, so the sums of every year
+    come from `np.add.reduceat` over the whole block, without checking for NaN.
+    """
+    values = daily_returns.to_numpy(dtype="float64")[1:]
+    years = daily_returns.index.year.to_numpy()[1:]
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    counts = np.diff(np.r_[starts, len(values)])[:, None]
+    mean = np.add.reduceat(values, starts, axis=0) / counts
+    deviations = values - np.repeat(mean, counts.ravel(), axis=0)
+    # A year with a single return has no variance (0 / 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = np.add.reduceat(deviations * deviations, starts, axis=0) / (counts - 1)
+    statistics = np.stack([mean, np.sqrt(var), var], axis=2).reshape(len(starts), -1)
+    columns = pd.MultiIndex.from_product([daily_returns.columns, STATISTICS])
+    return pd.DataFrame(statistics, index=years[starts], columns=columns)
+
+
+def calculate_annual_statistics(daily_returns: pd.DataFrame, complete=None) -> pd.DataFrame:
     """
-    Calculate annual stock performance metrics from the latest daily return data.
+    Calculate the mean, standard deviation and variance of daily returns for every year.
+
+    Tickers in `complete` (prices without missing values, see `gap_handling.complete_tickers`)
+    have no missing return after the first day, so they skip pandas' NaN-aware aggregation.
 
     Args:
-        folder_path (str): Path to the latest Parquet file.
-        output_dir (str): Directory to save annual performance outputs.
+        daily_returns (pd.DataFrame): Daily returns (DatetimeIndex x tickers).
+        complete (list[str], optional): Tickers without missing prices.
+
+    Returns:
+        pd.DataFrame: One row per year, with ('ticker', 'mean' | 'std' | 'var') columns.
     """
-    try:
-        file_name = os.path.basename(folder_path)
-        date_part = extract_date_from_file(file_name)
+    if complete is None or len(daily_returns) < 2 or not daily_returns.index.is_monotonic_increasing:
+        return daily_returns.groupby(daily_returns.index.year).agg(STATISTICS)
+    # The first return of prices without missing values is the only NaN
+    is_complete = daily_returns.columns.isin(complete) & daily_returns.iloc[0].isna().to_numpy()
+    if not is_complete.any():
+        return daily_returns.groupby(daily_returns.index.year).agg(STATISTICS)
+
+    years = daily_returns.index.year.unique()
+    frames = [_complete_annual_statistics(daily_returns.loc[:, is_complete]).reindex(years)]
+    if not is_complete.all():
+        remaining = daily_returns.loc[:, ~is_complete]
+        frames.append(remaining.groupby(remaining.index.year).agg(STATISTICS))
+    statistics = pd.concat(frames, axis=1)
+    return statistics.reindex(columns=pd.MultiIndex.from_product([daily_returns.columns, STATISTICS]))
+
+
+def calculate_performance_metrics(annual_data: pd.DataFrame, tickers: list, benchmark_ticker: str) -> pd.DataFrame:
+    """
+    Calculate annualized performance metrics for some tickers from their yearly statistics.
 
-        logger.info(f"Reading daily return data from: {folder_path}")
-        daily_returns = pd.read_parquet(folder_path)
+    Args:
+        annual_data (pd.DataFrame): Yearly statistics from `calculate_annual_statistics`.
+        tickers (list[str]): Tickers to report, in order.
+        benchmark_ticker (str): Ticker the betas are measured against.
+
+    Returns:
+        pd.DataFrame: One row per ticker with its average annual return, volatility,
+        variance and beta.
+    """
+    mean = annual_data.xs("mean", axis=1, level=1)[tickers].mean()
+    std = annual_data.xs("std", axis=1, level=1)[tickers].mean()
+    var = annual_data.xs("var", axis=1, level=1)[tickers].mean()
+
+    # Benchmark Annual Volatility
+    benchmark_volatility = annual_data[benchmark_ticker]["std"].mean() * (252 ** 0.5)
+    logger.info(f"Annual Volatility of the benchmark ticker '{benchmark_ticker}': {benchmark_volatility:.4f}")
+
+    annual_volatility = std * (252 ** 0.5)
+    beta = annual_volatility / benchmark_volatility if benchmark_volatility > 0 else annual_volatility * float("nan")
+    return pd.DataFrame({
+        "Ticker": tickers,
+        "Average Annual Return": (mean * 252).round(2).to_numpy(),
+        "Annual Volatility": annual_volatility.round(2).to_numpy(),
+        "Annual Variance": (var * 252).round(2).to_numpy(),
+        "Beta": beta.round(2).to_numpy(),
+    })
+
+
+def get_universe_view(universe: dict, columns) -> list:
+    """
+    Get the tickers of a universe present in the shared returns, its benchmark included.
 
-        # Ensure 'Date' column is set as a DatetimeIndex
-        if 'Date' in daily_returns.columns:
-            daily_returns['Date'] = pd.to_datetime(daily_returns['Date'])
-            daily_returns.set_index('Date', inplace=True)
+    Tickers keep the order of the returns columns (alphabetical, indices last), which is
+    the row order of the metrics files written before universes existed.
 
-        if not isinstance(daily_returns.index, pd.DatetimeIndex):
-            raise ValueError("Daily returns data index must be a DatetimeIndex.")
+    The view holds the universe's current constituents: without a membership history to
+    mask their returns with (see `calculate_universe_metrics`), the metrics cover today's
+    members over the whole period and leave out former members, so they are biased
+    towards survivors.
 
-        # Check for the benchmark ticker
-        benchmark_ticker = "^GSPC"
-        if benchmark_ticker not in daily_returns.columns:
-            raise ValueError(f"Benchmark ticker '{benchmark_ticker}' not found in the data.")
+    Args:
+        universe (dict): Universe definition (see `common.universes`).
+        columns (pd.Index): Tickers in the shared returns.
 
-        # Annualized metrics calculations for all tickers
-        logger.info(f"Calculating metrics for all tickers (benchmark included)...")
-        annual_data = daily_returns.groupby(daily_returns.index.year).agg(["mean", "std", "var"])
+    Returns:
+        list[str]: Tickers of the universe view (the benchmark included).
 
-        # Benchmark Annual Volatility
-        benchmark_volatility = (
-                annual_data[benchmark_ticker]["std"].mean() * (252 ** 0.5)
-        )
-        logger.info(
-            f"Annual Volatility of the benchmark ticker '{benchmark_ticker}': {benchmark_volatility:.4f}"
+    Raises:
+        FileNotFoundError: If the universe's tickers file does not exist (fetch the tickers first).
+        ValueError: If the benchmark ticker is not in the returns.
+    """
+    benchmark_ticker = universe["benchmark"]
+    if benchmark_ticker not in columns:
+        raise ValueError(f"Benchmark ticker '{benchmark_ticker}' not found in the data.")
+
+    tickers = load_universe_tickers(universe)
+    if tickers == [] and universe.get("tickers_file") and not os.path.exists(universe["tickers_file"]):
+        raise FileNotFoundError(
+            f"Tickers file '{universe['tickers_file']}' of universe '{universe['name']}' not found. "
+            f"Fetch the tickers first."
         )
+    if tickers is None:
+        return list(columns)
+    missing = [ticker for ticker in tickers if ticker not in columns]
+    if missing:
+        logger.warning(f"{len(missing)} tickers of universe '{universe['name']}' have no returns yet.")
+    members = set(tickers) | {benchmark_ticker}
+    return [ticker for ticker in columns if ticker in members]
 
-        # Calculate metrics for each ticker
-        metrics = []
-        for ticker in daily_returns.columns:
-            ticker_data = annual_data[ticker]
-            avg_annual_return = ticker_data["mean"].mean() * 252
-            avg_annual_volatility = ticker_data["std"].mean() * (252 ** 0.5)
-            avg_annual_variance = ticker_data["var"].mean() * 252
-            beta = avg_annual_volatility / benchmark_volatility if benchmark_volatility > 0 else None
-            metrics.append(
-                [
-                    ticker,
-                    round(avg_annual_return, 2),
-                    round(avg_annual_volatility, 2),
-                    round(avg_annual_variance, 2),
-                    round(beta, 2),
-                ]
-            )
-
-        # Create DataFrame for all metrics
-        performance_df = pd.DataFrame(
-            metrics,
-            columns=[
-                "Ticker",
-                "Average Annual Return",
-                "Annual Volatility",
-                "Annual Variance",
-                "Beta",
-            ],
-        )
 
-        # Define output file paths
-        csv_output_file = os.path.join(output_dir, f"performance_{date_part}-SP500-adj-close.csv")
-        parquet_output_file = os.path.join(output_dir, f"performance_{date_part}-SP500-adj-close.parquet")
+def calculate_universe_metrics(folder_path: str, output_dir: str, universes: dict, membership_histories=None,
+                               coverage: pd.DataFrame = None) -> dict:
+    """
+    Calculate annual performance metrics for several universes from one daily returns file.
+
+    Returns are stored once per ticker for all universes, so each universe is a view over
+    the shared returns: the yearly statistics of all tickers are computed once and every
+    universe selects its tickers and benchmark from them. Universes with a point-in-time
+    membership history get their own statistics on the masked returns.
+
+    Args:
+        folder_path (str): Path to the latest daily returns Parquet file.
+        output_dir (str): Directory to save annual performance outputs.
+        universes (dict): Universe name -> definition (see `common.universes`).
+        membership_histories (dict, optional): Universe name -> membership history. Returns
+            outside each ticker's membership periods are excluded for these universes.
+        coverage (pd.DataFrame, optional): Coverage of the cleaned prices the returns were
+            computed from (see `gap_handling.build_coverage`); tickers without missing prices
+            take the fast path of `calculate_annual_statistics`.
+
+    Returns:
+        dict: Universe name -> performance metrics.
 
-        # Save to CSV
-        logger.info(f"Saving performance data to CSV: {csv_output_file}")
-        performance_df.to_csv(csv_output_file, index=False)
+    Raises:
+        FileNotFoundError: If the tickers file of a universe does not exist.
+        ValueError: If the benchmark of a universe is not in the returns (raised after the
+            metrics of the other universes are saved).
+    """
+    membership_histories = membership_histories or {}
+    file_name = os.path.basename(folder_path)
+    date_part = extract_date_from_file(file_name)
 
-        # Save to Parquet
-        logger.info(f"Saving performance data to Parquet: {parquet_output_file}")
-        performance_df.to_parquet(parquet_output_file, index=False, engine="pyarrow")
+    logger.info(f"Reading daily return data from: {folder_path}")
+    with span("load") as load_span:
+        daily_returns = pd.read_parquet(folder_path)
+        load_span.record_file(folder_path)
+        load_span.record(rows=len(daily_returns))
+
+    # Ensure 'Date' column is set as a DatetimeIndex
+    if 'Date' in daily_returns.columns:
+        daily_returns['Date'] = pd.to_datetime(daily_returns['Date'])
+        daily_returns.set_index('Date', inplace=True)
+
+    if not isinstance(daily_returns.index, pd.DatetimeIndex):
+        raise ValueError("Daily returns data index must be a DatetimeIndex.")
+
+    complete = complete_tickers(coverage, daily_returns.index) if coverage is not None else None
+    shared_annual_data = None
+    performances = {}
+    skipped = {}
+    for name, universe in universes.items():
+        with span(name):
+            try:
+                view = get_universe_view(universe, daily_returns.columns)
+            except ValueError as e:
+                logger.error(f"Skipping universe '{name}': {e}")
+                skipped[name] = str(e)
+                continue
+
+            logger.info(f"Calculating metrics for {len(view)} tickers of universe '{name}' (benchmark included)...")
+            with span("compute") as compute_span:
+                history = membership_histories.get(name)
+                if history is not None:
+                    # Only use returns from periods in which each ticker was an index member
+                    logger.info("Masking returns with the point-in-time membership history...")
+                    view_returns = mask_returns(daily_returns[view], history)
+                    annual_data = calculate_annual_statistics(view_returns)
+                    compute_span.record_frame(view_returns)
+                else:
+                    if universe.get("tickers_file"):
+                        logger.warning(f"No membership history for universe '{name}': its metrics only cover "
+                                       f"the current constituents (survivorship bias).")
+                    if shared_annual_data is None:
+                        shared_annual_data = calculate_annual_statistics(daily_returns, complete)
+                        compute_span.record_frame(daily_returns)
+                    annual_data = shared_annual_data
+                performance_df = calculate_performance_metrics(annual_data, view, universe["benchmark"])
+
+            # Define output file paths
+            csv_output_file = os.path.join(output_dir, performance_file_name(date_part, name, ".csv"))
+            parquet_output_file = os.path.join(output_dir, performance_file_name(date_part, name))
+
+            with span("write") as write_span:
+                os.makedirs(output_dir, exist_ok=True)
+
+                # Save to CSV
+                logger.info(f"Saving performance data to CSV: {csv_output_file}")
+                performance_df.to_csv(csv_output_file, index=False)
+
+                # Save to Parquet
+                logger.info(f"Saving performance data to Parquet: {parquet_output_file}")
+                performance_df.to_parquet(parquet_output_file, index=False, engine="pyarrow")
+                write_span.record(rows=len(performance_df))
+                write_span.record_file(csv_output_file)
+                write_span.record_file(parquet_output_file)
+
+            # Display a sample
+            logger.info(f"Sample of calculated annual performance metrics for '{name}':\n{performance_df.head()}")
+            performances[name] = performance_df
+
+    if skipped:
+        # The stage must fail: the metrics of these universes are missing or stale
+        raise ValueError("; ".join(f"universe '{name}': {error}" for name, error in skipped.items()))
+    return performances
+
+
+def calculate_annual_metrics_for_latest(folder_path: str, output_dir: str, membership_history=None,
+                                        universe=None) -> pd.DataFrame:
+    """
+    Calculate annual stock performance metrics for one universe from the latest daily return data.
 
-        # Display a sample
-        logger.info(f"Sample of calculated annual performance metrics:")
-        print(performance_df.head())
+    Args:
+        folder_path (str): Path to the latest Parquet file.
+        output_dir (str): Directory to save annual performance outputs.
+        membership_history (pd.DataFrame, optional): Point-in-time index membership history.
+            When given, returns outside each ticker's membership periods are excluded.
+        universe (dict, optional): Universe definition. Defaults to the configured default universe.
 
+    Returns:
+        pd.DataFrame: Performance metrics of the universe.
+    """
+    try:
+        universe = universe or get_universe()
+        name = universe.get("name", DEFAULT_UNIVERSE)
+        histories = {name: membership_history} if membership_history is not None else None
+        return calculate_universe_metrics(folder_path, output_dir, {name: universe}, histories)[name]
     except Exception as e:
         logger.error(f"Failed to calculate annual performance metrics: {e}")
         raise
 
 
+def main(names=None):
+    """
+    Calculate annual performance metrics of every configured universe for the latest daily returns file.
 
-if __name__ == "__main__":
+    Args:
+        names (list[str], optional): Universes to calculate. Defaults to all configured universes.
+    """
     try:
-        latest_file = get_latest_daily_return_parquet_file(DAILY_RETURN_DIR)
-        calculate_annual_metrics_for_latest(latest_file, ANNUAL_PERFORMANCE_DIR)
+        with stage_run("analyze_annual_stock_performance"):
+            latest_file = get_latest_daily_return_parquet_file(DAILY_RETURN_DIR)
+            universes = load_universes()
+            universes = {name: universes[name] for name in names or universes}
+
+            histories = {}
+            for name, universe in universes.items():
+                if universe.get("membership_file"):
+                    history = load_membership_history(universe["membership_file"])
+                    if not history.empty:
+                        histories[name] = history
+
+            # Coverage saved next to the cleaned prices the returns were computed from
+            cleaned_file = os.path.join(SILVER_STOCKS_DIR, os.path.basename(latest_file).removeprefix("returns_"))
+            coverage = load_coverage(get_coverage_path(cleaned_file))
+
+            calculate_universe_metrics(latest_file, ANNUAL_PERFORMANCE_DIR, universes, histories, coverage)
     except Exception as e:
         logger.error(f"Error in processing: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
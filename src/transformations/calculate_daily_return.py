@@ -4,14 +4,16 @@ import pandas as pd
 import logging
 import re
 
+from common.instrumentation import stage_run
+from common.paths import SILVER_RETURNS_DIR, SILVER_STOCKS_DIR
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 # Directories for input and output
-CLEANED_DATA_DIR = "data/silver/stocks/"  # Directory for cleaned data
-DAILY_RETURN_DIR = "data/silver/returns/"  # Output directory for daily returns
-os.makedirs(DAILY_RETURN_DIR, exist_ok=True)
+CLEANED_DATA_DIR = SILVER_STOCKS_DIR  # Directory for cleaned data
+DAILY_RETURN_DIR = SILVER_RETURNS_DIR  # Output directory for daily returns
 
 
 def get_latest_file(directory: str, pattern: str) -> str:
@@ -20,7 +22,7 @@ def get_latest_file(directory: str, pattern: str) -> str:
 
     Args:
         directory (str): Path to the directory containing the files.
-        pattern (str): Glob pattern for matching filenames (e.g., 'cleaned_*SP500-adj-close').
+        pattern (str): Glob pattern for matching filenames (e.g., 'cleaned_*adj-close.parquet').
 
     Returns:
         str: Path to the latest file based on modification time.
@@ -99,8 +101,10 @@ def save_daily_returns(daily_returns: pd.DataFrame, date_part: str, output_dir:
         output_dir (str): Base directory for saving files.
     """
     # Define file paths
-    csv_file = os.path.join(output_dir, f"returns_cleaned_{date_part}-SP500-adj-close.csv")
-    parquet_file = os.path.join(output_dir, f"returns_cleaned_{date_part}-SP500-adj-close.parquet")
+    csv_file = os.path.join(output_dir, f"returns_cleaned_{date_part}-adj-close.csv")
+    parquet_file = os.path.join(output_dir, f"returns_cleaned_{date_part}-adj-close.parquet")
+
+    os.makedirs(output_dir, exist_ok=True)
 
     # Save as CSV
     logger.info(f"Saving daily returns to CSV: {csv_file}")
@@ -116,35 +120,46 @@ def main():
     Main function to calculate and save daily returns for the latest cleaned stock data file.
     """
     try:
-        # Get the latest cleaned file
-        latest_file = get_latest_file(CLEANED_DATA_DIR, "cleaned_*SP500-adj-close.parquet")
-
-        # Extract the date from the filename
-        date_part = extract_date(
-            os.path.basename(latest_file), r"cleaned_(\d{6})-"
-        )
-
-        # Load the cleaned data
-        logger.info(f"Loading data from: {latest_file}")
-        stock_data = pd.read_parquet(latest_file)
-
-        # Calculate daily returns
-        logger.info("Calculating daily returns...")
-        daily_returns = calculate_daily_returns(stock_data)
-
-        # Save the daily returns
-        save_daily_returns(daily_returns, date_part, DAILY_RETURN_DIR)
-
-        # Display a sample of the results
-        logger.info("Sample of the calculated daily returns:")
-        logger.info(f"\n{daily_returns.head()}")
+        with stage_run("calculate_daily_return") as run:
+            # Get the latest cleaned file
+            latest_file = get_latest_file(CLEANED_DATA_DIR, "cleaned_*adj-close.parquet")
+
+            # Extract the date from the filename
+            date_part = extract_date(
+                os.path.basename(latest_file), r"cleaned_(\d{6})-"
+            )
+
+            # Load the cleaned data
+            logger.info(f"Loading data from: {latest_file}")
+            with run.span("load") as load_span:
+                stock_data = pd.read_parquet(latest_file)
+                load_span.record_file(latest_file)
+                load_span.record(rows=len(stock_data))
+
+            # Calculate daily returns
+            logger.info("Calculating daily returns...")
+            with run.span("compute") as compute_span:
+                daily_returns = calculate_daily_returns(stock_data)
+                compute_span.record_frame(daily_returns)
+
+            # Save the daily returns
+            with run.span("write") as write_span:
+                save_daily_returns(daily_returns, date_part, DAILY_RETURN_DIR)
+                write_span.record(rows=len(daily_returns))
+
+            # Display a sample of the results
+            logger.info("Sample of the calculated daily returns:")
+            logger.info(f"\n{daily_returns.head()}")
 
     except FileNotFoundError as e:
         logger.error(f"FileNotFoundError: {e}")
+        raise
     except ValueError as e:
         logger.error(f"ValueError: {e}")
+        raise
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}")
+        raise
 
 
 if __name__ == "__main__":
@@ -4,14 +4,24 @@ import logging
 
 import pandas as pd
 
+from common.instrumentation import span, stage_run
+from common.paths import BRONZE_STOCKS_DIR, SILVER_STOCKS_DIR, cleaned_price_file
+from transformations.gap_handling import (
+    FFILL_LIMIT,
+    align_to_trading_days,
+    build_coverage,
+    fill_gaps,
+    get_coverage_path,
+    save_coverage,
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 # Paths
-BRONZE_LAYER_DIR = "data/bronze/stocks/"
-SILVER_LAYER_DIR = "data/silver/stocks/"
-os.makedirs(SILVER_LAYER_DIR, exist_ok=True)
+BRONZE_LAYER_DIR = BRONZE_STOCKS_DIR
+SILVER_LAYER_DIR = SILVER_STOCKS_DIR
 
 
 def get_latest_file(directory: str, file_pattern: str) -> str:
@@ -20,7 +30,7 @@ def get_latest_file(directory: str, file_pattern: str) -> str:
 
     Args:
         directory (str): Path to the directory containing files.
-        file_pattern (str): Pattern to match files (e.g., '*-SP500-adj-close.csv').
+        file_pattern (str): Pattern to match files (e.g., '*-adj-close.csv').
 
     Returns:
         str: Path to the latest file based on modification time.
@@ -36,15 +46,18 @@ def get_latest_file(directory: str, file_pattern: str) -> str:
     return latest_file
 
 
-def clean_stock_data(file_path: str) -> pd.DataFrame:
+def clean_stock_data(file_path: str, ffill_limit: int = FFILL_LIMIT, return_coverage: bool = False):
     """
     Cleans a raw stock data file where rows are dates and columns are tickers.
 
     Args:
         file_path (str): Path to the raw stock data file.
+        ffill_limit (int): Longest gap of missing prices, in trading days, to forward-fill.
+        return_coverage (bool): Also return the coverage of every ticker.
 
     Returns:
-        pd.DataFrame: Cleaned stock data.
+        pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]: Cleaned stock data, and with
+        `return_coverage` the coverage of every ticker (see `gap_handling.build_coverage`).
 
     Raises:
         Exception: If the data processing fails.
@@ -52,27 +65,37 @@ def clean_stock_data(file_path: str) -> pd.DataFrame:
     logger.info(f"Loading raw stock data from: {file_path}")
     try:
         # Load raw stock data
-        data = pd.read_csv(file_path, index_col=0, parse_dates=True)
+        with span("load") as load_span:
+            data = pd.read_csv(file_path, index_col=0, parse_dates=True)
+            load_span.record_file(file_path)
+            load_span.record(rows=len(data))
+
+        with span("clean") as clean_span:
+            # Remove duplicate rows
+            data = data[~data.index.duplicated(keep="first")]
+
+            # Ensure the date index is sorted
+            if not data.index.is_monotonic_increasing:
+                data = data.sort_index()
+                logger.info("Date index sorted.")
 
-        # Remove duplicate rows
-        data = data[~data.index.duplicated(keep="first")]
+            # Align to the NYSE trading days (no rows on weekends and exchange holidays)
+            data = align_to_trading_days(data)
 
-        # Ensure the date index is sorted
-        if not data.index.is_monotonic_increasing:
-            data = data.sort_index()
-            logger.info("Date index sorted.")
+            # Drop columns with all NaN values
+            data = data.dropna(axis=1, how="all")
 
-        # Align to business-day frequency
-        data = data.asfreq("B")
+            # Forward-fill short gaps and record which prices were observed
+            data, observed = fill_gaps(data, limit=ffill_limit)
+            coverage = build_coverage(data, observed) if return_coverage else None
 
-        # Drop columns with all NaN values
-        data = data.dropna(axis=1, how="all")
+            # Round adjusted close prices to 4 decimal places
+            data = data.round(4)
 
-        # Round adjusted close prices to 4 decimal places
-        data = data.round(4)
+            clean_span.record_frame(data)
 
         logger.info("Stock data cleaned successfully.")
-        return data
+        return (data, coverage) if return_coverage else data
     except Exception as e:
         logger.error(f"Error cleaning stock data: {e}")
         raise
@@ -88,13 +111,19 @@ def save_data(data: pd.DataFrame, csv_path: str, parquet_path: str):
         parquet_path (str): Path to save the data as a Parquet file.
     """
     try:
-        # Save as CSV
-        logger.info(f"Saving data to CSV: {csv_path}")
-        data.to_csv(csv_path, index=True)
+        with span("write") as write_span:
+            os.makedirs(os.path.dirname(parquet_path) or ".", exist_ok=True)
 
-        # Save as a single Parquet file
-        logger.info(f"Saving data to Parquet: {parquet_path}")
-        data.to_parquet(parquet_path, index=True, engine="pyarrow")
+            # Save as CSV
+            logger.info(f"Saving data to CSV: {csv_path}")
+            data.to_csv(csv_path, index=True)
+
+            # Save as a single Parquet file
+            logger.info(f"Saving data to Parquet: {parquet_path}")
+            data.to_parquet(parquet_path, index=True, engine="pyarrow")
+            write_span.record(rows=len(data))
+            write_span.record_file(csv_path)
+            write_span.record_file(parquet_path)
 
         logger.info("Data saved successfully.")
     except Exception as e:
@@ -108,28 +137,32 @@ def process_latest_stock_data():
     and saves it both as a single .parquet file and a .csv file.
     """
     try:
-        # Find the latest combined stock data file
-        latest_file_path = get_latest_file(BRONZE_LAYER_DIR, "*-SP500-adj-close.csv")
+        with stage_run("clean_stock_data"):
+            # Find the latest combined stock data file
+            latest_file_path = get_latest_file(BRONZE_LAYER_DIR, "*-adj-close.csv")
 
-        # Generate output paths
-        latest_file_name = os.path.basename(latest_file_path)
-        csv_output_path = os.path.join(SILVER_LAYER_DIR, f"cleaned_{latest_file_name}")
-        parquet_output_path = os.path.join(SILVER_LAYER_DIR, f"cleaned_{latest_file_name.replace('.csv', '.parquet')}")
+            # Generate output paths
+            latest_file_name = os.path.basename(latest_file_path)
+            csv_output_path = os.path.join(SILVER_LAYER_DIR, f"cleaned_{latest_file_name}")
+            parquet_output_path = cleaned_price_file(latest_file_path)
 
-        # Clean the data
-        cleaned_data = clean_stock_data(latest_file_path)
+            # Clean the data
+            cleaned_data, coverage = clean_stock_data(latest_file_path, return_coverage=True)
 
-        # Save the cleaned data
-        save_data(cleaned_data, csv_output_path, parquet_output_path)
+            # Save the cleaned data, with the coverage of every ticker next to it
+            save_data(cleaned_data, csv_output_path, parquet_output_path)
+            save_coverage(coverage, get_coverage_path(parquet_output_path))
 
-        # Display a sample of the cleaned data
-        logger.info("Sample of the cleaned stock data:")
-        logger.info(f"\n{cleaned_data.head()}")
+            # Display a sample of the cleaned data
+            logger.info("Sample of the cleaned stock data:")
+            logger.info(f"\n{cleaned_data.head()}")
 
     except FileNotFoundError as e:
         logger.error(f"FileNotFoundError: {e}")
+        raise
     except Exception as e:
         logger.error(f"An error occurred during processing: {e}")
+        raise
 
 if __name__ == "__main__":
     process_latest_stock_data()
@@ -0,0 +1,192 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from common.instrumentation import timed
+from common.market_calendar import trading_days
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Missing prices on trading days are forward-filled only when the gap (consecutive missing
+# trading days between two quotes) is at most this long; longer gaps (suspensions) stay NaN
+FFILL_LIMIT = 5
+FILL_CHUNK_SIZE = 128  # Tickers with gaps filled at once
+
+COVERAGE_COLUMNS = ["Ticker", "First Date", "Last Date", "Observed Days", "Filled Days", "Missing Days", "Bitmask"]
+
+
+def align_to_trading_days(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reindex wide data (dates x tickers) to the NYSE trading days between its first and last date.
+
+    Weekends and exchange holidays get no row, so a holiday does not turn the next day's
+    return into NaN. Dates with quotes are always kept, even if the calendar has them as
+    closed; empty rows on closed days are dropped.
+
+    Args:
+        data (pd.DataFrame): Wide data with a sorted DatetimeIndex.
+
+    Returns:
+        pd.DataFrame: The data on the trading-day index.
+    """
+    if data.empty:
+        return data
+    calendar = pd.DatetimeIndex(trading_days(data.index[0].date(), data.index[-1].date()))
+    quoted = data.index[data.notna().any(axis=1).to_numpy()]
+    unexpected = quoted.difference(calendar)
+    if len(unexpected) > 0:
+        logger.warning(f"{len(unexpected)} dates with quotes are exchange holidays: {list(unexpected.date[:5])}")
+    index = calendar.union(quoted)
+    index.name = data.index.name
+    return data.reindex(index)
+
+
+@timed()
+def fill_gaps(data: pd.DataFrame, limit: int = FFILL_LIMIT):
+    """
+    Forward-fill the missing prices of gaps of at most `limit` trading days.
+
+    Gaps are found on the whole matrix at once: the positions of the previous and next
+    quote of every cell come from running maxima/minima of the quote positions, so a
+    gap's length is known without looping over tickers. A gap is either filled entirely
+    or left missing, and NaNs before a ticker's first or after its last quote are never
+    filled. Tickers without any gap (most of them) are skipped.
+
+    Args:
+        data (pd.DataFrame): Wide prices (dates x tickers) on the trading-day index.
+        limit (int): Longest gap, in trading days, to fill.
+
+    Returns:
+        tuple[pd.DataFrame, np.ndarray]: The filled prices, and the boolean matrix of the
+        quotes observed before filling.
+    """
+    values = data.to_numpy(dtype="float64", copy=True)
+    observed = ~np.isnan(values)
+    n_dates = len(values)
+    positions = np.arange(n_dates, dtype="int32")[:, None]
+
+    first = np.where(observed.any(axis=0), observed.argmax(axis=0), n_dates)
+    last = np.where(observed.any(axis=0), n_dates - 1 - observed[::-1].argmax(axis=0), -1)
+    # Fast path: tickers quoted on every trading day of their live range have nothing to fill
+    gapped = np.flatnonzero(observed.sum(axis=0) < np.maximum(last - first + 1, 0))
+    if len(gapped) == 0 or limit <= 0:
+        return data.copy(), observed
+
+    filled_count = 0
+    # Gapped tickers are processed in chunks to bound the temporary position matrices
+    for start in range(0, len(gapped), FILL_CHUNK_SIZE):
+        columns = gapped[start:start + FILL_CHUNK_SIZE]
+        gap_values = values[:, columns]
+        gap_observed = observed[:, columns]
+        previous = np.where(gap_observed, positions, np.int32(-1))
+        np.maximum.accumulate(previous, axis=0, out=previous)
+        following = np.where(gap_observed, positions, np.int32(n_dates))[::-1]
+        np.minimum.accumulate(following, axis=0, out=following)
+        following = following[::-1]
+        fill = ~gap_observed & (previous >= 0) & (following - previous <= limit + 1) & (following < n_dates)
+        gap_values[fill] = gap_values[previous[fill], np.nonzero(fill)[1]]
+        values[:, columns] = gap_values
+        filled_count += int(fill.sum())
+
+    filled = pd.DataFrame(values, index=data.index, columns=data.columns)
+    logger.info(f"Forward-filled {filled_count} missing prices of {len(gapped)} tickers (gaps of at most {limit} days).")
+    return filled, observed
+
+
+@timed()
+def build_coverage(data: pd.DataFrame, observed: np.ndarray) -> pd.DataFrame:
+    """
+    Summarize the coverage of every ticker, with a compact bitmask of its observed quotes.
+
+    The bitmask packs one bit per row of `data` (1 = quote observed, 0 = missing or
+    forward-filled) with `np.packbits`: 8 trading days per byte.
+
+    Args:
+        data (pd.DataFrame): Filled wide prices (dates x tickers).
+        observed (np.ndarray): Boolean matrix of the quotes observed before filling.
+
+    Returns:
+        pd.DataFrame: One row per ticker with the columns in `COVERAGE_COLUMNS`.
+    """
+    available = data.notna().to_numpy()
+    has_quotes = observed.any(axis=0)
+    first = np.where(has_quotes, observed.argmax(axis=0), 0)
+    last = np.where(has_quotes, len(observed) - 1 - observed[::-1].argmax(axis=0), -1)
+    live_days = np.maximum(last - first + 1, 0)
+
+    packed = np.packbits(observed, axis=0)
+    dates = data.index
+    return pd.DataFrame({
+        "Ticker": data.columns,
+        "First Date": dates[first].where(has_quotes),
+        "Last Date": dates[np.maximum(last, 0)].where(has_quotes),
+        "Observed Days": observed.sum(axis=0),
+        "Filled Days": (available & ~observed).sum(axis=0),
+        "Missing Days": live_days - available.sum(axis=0),
+        "Bitmask": [packed[:, column].tobytes() for column in range(packed.shape[1])],
+    })[COVERAGE_COLUMNS]
+
+
+def get_coverage_path(data_path: str) -> str:
+    """
+    Get the path of the coverage table stored next to a cleaned prices file
+    (e.g. 'cleaned_241216-adj-close.parquet' -> 'coverage_241216-adj-close.parquet').
+    """
+    directory, file_name = os.path.split(data_path)
+    return os.path.join(directory, f"coverage_{file_name.removeprefix('cleaned_')}")
+
+
+def complete_tickers(coverage: pd.DataFrame, dates: pd.DatetimeIndex) -> list:
+    """
+    Get the tickers with a price on every row of the data the coverage was built from.
+
+    Their prices have no missing value (quoted or forward-filled from the first to the last
+    date), so their returns need no NaN handling.
+
+    Args:
+        coverage (pd.DataFrame): Coverage table from `build_coverage`.
+        dates (pd.DatetimeIndex): Index of the data the coverage was built from.
+
+    Returns:
+        list[str]: Tickers without missing prices.
+    """
+    if len(dates) == 0:
+        return []
+    complete = (
+        (coverage["Missing Days"] == 0)
+        & (coverage["First Date"] == dates[0])
+        & (coverage["Last Date"] == dates[-1])
+    )
+    return coverage.loc[complete, "Ticker"].tolist()
+
+
+def save_coverage(coverage: pd.DataFrame, path: str):
+    """
+    Save a coverage table as Parquet (see `get_coverage_path`).
+
+    Args:
+        coverage (pd.DataFrame): Coverage table from `build_coverage`.
+        path (str): Path of the Parquet file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    coverage.to_parquet(path, index=False, engine="pyarrow")
+
+
+def load_coverage(path: str):
+    """
+    Load a coverage table saved by `save_coverage`.
+
+    Args:
+        path (str): Path of the Parquet file.
+
+    Returns:
+        pd.DataFrame | None: The coverage table, or None if the file does not exist (prices
+        cleaned before coverage tables were saved).
+    """
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
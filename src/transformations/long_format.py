@@ -0,0 +1,432 @@
+import os
+import glob
+import json
+import logging
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from common.instrumentation import stage_run, timed
+from common.paths import (
+    SILVER_LONG_FORMAT_DIR,
+    SILVER_RETURNS_DIR,
+    SILVER_STOCKS_DIR,
+    find_returns_file,
+    long_format_part_name,
+)
+from common.universes import load_universes
+from data_engineering.fetch_universe_tickers import load_universe_constituents
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Paths
+CLEANED_DATA_DIR = SILVER_STOCKS_DIR  # Directory for cleaned (wide) prices
+DAILY_RETURN_DIR = SILVER_RETURNS_DIR  # Directory for daily (wide) returns
+TICKER_DIMENSION_FILE = "data/silver/dimensions/tickers.parquet"  # Ticker dimension table
+LONG_FORMAT_DIR = SILVER_LONG_FORMAT_DIR  # Long-format dataset, partitioned by ticker_id
+
+LONG_COLUMNS = ["Date", "ticker_id", "price", "return"]
+# Date range, row count and digest of the rows last written for every ticker (skipped by
+# readers like any "_" file), so an update never reads the partitions of unchanged tickers
+STATE_FILE = "_state.json"
+TICKER_ATTRIBUTES = ["Security", "GICS Sector", "GICS Sub-Industry", "CIK"]
+
+
+def build_ticker_dimension(tickers_file, dimension_file: str) -> pd.DataFrame:
+    """
+    Build (or extend) the ticker dimension table with stable integer ticker ids.
+
+    Existing ids are never reassigned: tickers already present in the dimension keep
+    their id, and tickers appearing for the first time get the next free ids in the
+    order they are listed in the tickers file. Descriptive attributes (security name,
+    GICS sector and sub-industry, CIK) are refreshed from the tickers file when present.
+
+    Args:
+        tickers_file (str | pd.DataFrame): Path to the tickers CSV, or the tickers themselves
+            (must contain a 'Symbol' column).
+        dimension_file (str): Path to the Parquet file holding the ticker dimension.
+
+    Returns:
+        pd.DataFrame: Ticker dimension with 'ticker_id', 'Symbol' and attribute columns.
+
+    Raises:
+        ValueError: If the tickers file has no 'Symbol' column.
+    """
+    if isinstance(tickers_file, pd.DataFrame):
+        tickers = tickers_file
+    else:
+        tickers = pd.read_csv(tickers_file, dtype=str)
+    if "Symbol" not in tickers.columns:
+        raise ValueError("The tickers must include a 'Symbol' column.")
+
+    if os.path.exists(dimension_file):
+        dimension = pd.read_parquet(dimension_file)
+    else:
+        dimension = pd.DataFrame({"ticker_id": pd.Series(dtype="int32"), "Symbol": pd.Series(dtype="object")})
+
+    symbols = tickers["Symbol"].drop_duplicates()
+    new_symbols = symbols[~symbols.isin(dimension["Symbol"])]
+    if not new_symbols.empty:
+        next_id = int(dimension["ticker_id"].max()) + 1 if not dimension.empty else 0
+        additions = pd.DataFrame({
+            "ticker_id": np.arange(next_id, next_id + len(new_symbols), dtype="int32"),
+            "Symbol": new_symbols.to_numpy(),
+        })
+        dimension = pd.concat([dimension, additions], ignore_index=True)
+        logger.info(f"Added {len(new_symbols)} tickers to the ticker dimension.")
+
+    dimension["ticker_id"] = dimension["ticker_id"].astype("int32")
+
+    # Refresh descriptive attributes from the latest tickers file
+    attributes = [column for column in TICKER_ATTRIBUTES if column in tickers.columns]
+    if attributes:
+        latest = tickers.drop_duplicates("Symbol").set_index("Symbol")[attributes]
+        dimension = dimension.drop(columns=attributes, errors="ignore")
+        dimension = dimension.join(latest, on="Symbol")
+
+    os.makedirs(os.path.dirname(dimension_file), exist_ok=True)
+    dimension.to_parquet(dimension_file, index=False, engine="pyarrow")
+    return dimension
+
+
+def _to_date_index(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return a wide frame indexed by 'Date', accepting 'Date' either as a column or the index.
+    """
+    if "Date" in data.columns:
+        data = data.set_index("Date")
+    elif data.index.name != "Date":
+        raise ValueError("The dataset must include a 'Date' column or index.")
+    data.index = pd.to_datetime(data.index)
+    return data
+
+
+@timed()
+def wide_to_long(prices: pd.DataFrame, returns: pd.DataFrame, ticker_dimension: pd.DataFrame) -> pd.DataFrame:
+    """
+    Unpivot wide price and return matrices (dates x tickers) into the long format.
+
+    The conversion works directly on the underlying NumPy arrays: values are flattened
+    in column-major order so each ticker's dates stay contiguous, and the 'Date' and
+    'ticker_id' columns are produced with `np.tile`/`np.repeat` instead of `melt`.
+
+    Args:
+        prices (pd.DataFrame): Wide adjusted close prices with a 'Date' column or index.
+        returns (pd.DataFrame): Wide daily returns with a 'Date' column or index.
+        ticker_dimension (pd.DataFrame): Ticker dimension with 'ticker_id' and 'Symbol'.
+
+    Returns:
+        pd.DataFrame: Long data with 'Date', 'ticker_id', 'price' and 'return' columns,
+        sorted by ticker then date. Rows where both price and return are missing are dropped.
+
+    Raises:
+        ValueError: If a ticker in the data is missing from the ticker dimension.
+    """
+    prices = _to_date_index(prices)
+    returns = _to_date_index(returns).reindex(index=prices.index, columns=prices.columns)
+
+    id_lookup = pd.Series(ticker_dimension["ticker_id"].to_numpy(), index=ticker_dimension["Symbol"])
+    unknown = prices.columns.difference(id_lookup.index)
+    if len(unknown) > 0:
+        raise ValueError(f"Tickers missing from the ticker dimension: {list(unknown)}")
+    ticker_ids = id_lookup.loc[prices.columns].to_numpy(dtype="int32")
+
+    n_dates, n_tickers = prices.shape
+    price_values = prices.to_numpy(dtype="float64").ravel(order="F")
+    return_values = returns.to_numpy(dtype="float64").ravel(order="F")
+    keep = ~(np.isnan(price_values) & np.isnan(return_values))
+
+    return pd.DataFrame({
+        "Date": np.tile(prices.index.to_numpy(), n_tickers)[keep],
+        "ticker_id": np.repeat(ticker_ids, n_dates)[keep],
+        "price": price_values[keep],
+        "return": return_values[keep],
+    })
+
+
+@timed()
+def long_to_wide(long_data: pd.DataFrame, ticker_dimension: pd.DataFrame, value: str = "price") -> pd.DataFrame:
+    """
+    Pivot long data back into a wide matrix (dates x tickers).
+
+    Row and column positions are derived with `np.unique(..., return_inverse=True)` and
+    the values are scattered into a preallocated NaN matrix, avoiding `pivot_table`.
+    If a (date, ticker) pair appears more than once, the last occurrence wins.
+
+    Args:
+        long_data (pd.DataFrame): Long data with 'Date', 'ticker_id' and the value column.
+        ticker_dimension (pd.DataFrame): Ticker dimension with 'ticker_id' and 'Symbol'.
+        value (str): Name of the value column to pivot ('price' or 'return').
+
+    Returns:
+        pd.DataFrame: Wide frame indexed by 'Date' with one column per ticker symbol.
+
+    Raises:
+        ValueError: If the value column is missing or a ticker id is not in the dimension.
+    """
+    if value not in long_data.columns:
+        raise ValueError(f"Column '{value}' not found in the long data.")
+
+    dates, date_positions = np.unique(long_data["Date"].to_numpy(), return_inverse=True)
+    ticker_ids, ticker_positions = np.unique(long_data["ticker_id"].to_numpy(), return_inverse=True)
+
+    symbol_lookup = pd.Series(ticker_dimension["Symbol"].to_numpy(), index=ticker_dimension["ticker_id"])
+    unknown = pd.Index(ticker_ids).difference(symbol_lookup.index)
+    if len(unknown) > 0:
+        raise ValueError(f"Ticker ids missing from the ticker dimension: {list(unknown)}")
+
+    matrix = np.full((len(dates), len(ticker_ids)), np.nan)
+    matrix[date_positions, ticker_positions] = long_data[value].to_numpy(dtype="float64")
+
+    return pd.DataFrame(
+        matrix,
+        index=pd.DatetimeIndex(dates, name="Date"),
+        columns=pd.Index(symbol_lookup.loc[ticker_ids].to_numpy()),
+    )
+
+
+def load_stored_rows(dataset_dir: str) -> pd.DataFrame:
+    """
+    Load every row stored in the long-format dataset.
+
+    Args:
+        dataset_dir (str): Path to the partitioned long-format dataset.
+
+    Returns:
+        pd.DataFrame: Long data with 'Date', 'ticker_id', 'price' and 'return' columns (empty
+        if the dataset does not exist yet).
+    """
+    if not os.path.isdir(dataset_dir) or not glob.glob(os.path.join(dataset_dir, "*", "*.parquet")):
+        return pd.DataFrame({
+            "Date": pd.Series(dtype="datetime64[ns]"),
+            "ticker_id": pd.Series(dtype="int32"),
+            "price": pd.Series(dtype="float64"),
+            "return": pd.Series(dtype="float64"),
+        })
+    return load_long_format(dataset_dir)
+
+
+def _write_partitions(long_data: pd.DataFrame, date_part: str, dataset_dir: str):
+    long_data.to_parquet(
+        dataset_dir,
+        index=False,
+        engine="pyarrow",
+        partition_cols=["ticker_id"],
+        basename_template=long_format_part_name(date_part, "{i}"),
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def summarize_history(long_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Summarize the rows of every ticker with an order-independent digest.
+
+    The digest is the sum (modulo 2**64) of a hash of every row's date, price and return:
+    the digest of appended rows adds up with the digest of the earlier ones, and a changed,
+    added or removed row changes it.
+
+    Args:
+        long_data (pd.DataFrame): Long data with 'Date', 'ticker_id', 'price' and 'return' columns.
+
+    Returns:
+        pd.DataFrame: 'first' and 'last' date, 'rows' and 'digest' (uint64), indexed by 'ticker_id'.
+    """
+    hashes = pd.util.hash_pandas_object(long_data[["Date", "price", "return"]], index=False).to_numpy()
+    ids = long_data["ticker_id"].to_numpy()
+    order = np.argsort(ids, kind="stable")
+    ids, hashes = ids[order], hashes[order]
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype=int)
+    summary = long_data.groupby("ticker_id")["Date"].agg(first="min", last="max", rows="size")
+    summary["digest"] = np.add.reduceat(hashes, starts) if len(ids) else np.array([], dtype="uint64")
+    summary.index = summary.index.astype("int32")
+    return summary
+
+
+def load_state(dataset_dir: str):
+    """
+    Load the summary of the rows last written for every ticker (see `summarize_history`).
+
+    Returns:
+        pd.DataFrame | None: The summary, or None if the dataset has no state file.
+    """
+    state_file = os.path.join(dataset_dir, STATE_FILE)
+    if not os.path.exists(state_file):
+        return None
+    with open(state_file) as file:
+        tickers = json.load(file)["tickers"]
+    state = pd.DataFrame.from_dict(tickers, orient="index", columns=["first", "last", "rows", "digest"])
+    state.index = state.index.astype("int32").rename("ticker_id")
+    state[["first", "last"]] = state[["first", "last"]].apply(pd.to_datetime)
+    state["rows"] = state["rows"].astype("int64")
+    state["digest"] = state["digest"].map(int).astype("uint64")
+    return state
+
+
+def save_state(state: pd.DataFrame, dataset_dir: str):
+    """
+    Save the summary of the rows last written for every ticker.
+    """
+    tickers = {
+        str(ticker_id): {"first": f"{row.first:%Y-%m-%d}", "last": f"{row.last:%Y-%m-%d}",
+                         "rows": int(row.rows), "digest": str(row.digest)}
+        for ticker_id, row in zip(state.index, state.itertuples(index=False))
+    }
+    with open(os.path.join(dataset_dir, STATE_FILE), "w") as file:
+        json.dump({"tickers": tickers}, file)
+
+
+def save_long_format(long_data: pd.DataFrame, date_part: str, dataset_dir: str) -> int:
+    """
+    Write the long-format rows missing from (or changed in) the dataset partitioned by 'ticker_id'.
+
+    The rows are compared with the state of every ticker (its last written date, row count
+    and digest, see `summarize_history`) rather than with the stored rows:
+    - rows of new dates after a ticker's last stored date are appended as a new file per
+      partition (named after `date_part`), so a daily run only writes the new days;
+    - tickers whose rows up to their last stored date differ from the state (e.g. a ticker
+      added to a universe, history backfilled, or prices/returns corrected retroactively)
+      get their partition read and rewritten with the stored and new rows merged, the new
+      values winning.
+    Only the partitions being rewritten are read. A dataset written before the state file
+    existed is read once to build it. Re-running on the same data writes nothing.
+
+    Args:
+        long_data (pd.DataFrame): Long data produced by `wide_to_long`.
+        date_part (str): Date string (YYMMDD) used to name the written files.
+        dataset_dir (str): Path to the partitioned long-format dataset.
+
+    Returns:
+        int: Number of rows written.
+    """
+    state = load_state(dataset_dir)
+    if state is None:
+        stored = load_stored_rows(dataset_dir)
+        if not stored.empty:
+            logger.info("No long-format state found: summarizing the stored rows once.")
+        state = summarize_history(stored)
+
+    ticker_ids = long_data["ticker_id"]
+    last_stored = ticker_ids.map(state["last"]).to_numpy(dtype="datetime64[ns]")
+    # Rows at or before their ticker's last stored date are already stored, unless the history changed
+    is_stored = ~np.isnat(last_stored) & (long_data["Date"].to_numpy() <= last_stored)
+    incoming = summarize_history(long_data[is_stored])
+    known = state.loc[state.index.isin(ticker_ids.unique())]
+    # Tickers without any row up to their last stored date changed too
+    matching = known.loc[known.index.isin(incoming.index)]
+    same = (incoming.loc[matching.index, ["rows", "digest"]] == matching[["rows", "digest"]]).all(axis=1)
+    changed = known.index.difference(same.index[same.to_numpy()])
+
+    # A partition already holding a file named after this run would have it overwritten
+    existing_files = {
+        int(os.path.basename(os.path.dirname(path)).split("=", 1)[1])
+        for path in glob.glob(os.path.join(dataset_dir, "ticker_id=*", long_format_part_name(date_part)))
+    }
+    clashing = ~is_stored & ticker_ids.isin(existing_files).to_numpy()
+    rewrite_ids = np.union1d(changed.to_numpy(), ticker_ids.to_numpy()[clashing]).astype("int32")
+
+    appended = long_data[~is_stored & ~ticker_ids.isin(rewrite_ids).to_numpy()]
+    if appended.empty and len(rewrite_ids) == 0:
+        logger.info("Long-format dataset is already up to date.")
+        return 0
+
+    os.makedirs(dataset_dir, exist_ok=True)
+    written = 0
+    if not appended.empty:
+        logger.info(f"Appending {len(appended)} rows to long-format dataset: {dataset_dir}")
+        _write_partitions(appended, date_part, dataset_dir)
+        written += len(appended)
+        added = summarize_history(appended)
+        previous = state.loc[state.index.isin(added.index)]
+        added.loc[previous.index, "first"] = previous["first"]
+        added.loc[previous.index, "rows"] += previous["rows"]
+        added.loc[previous.index, "digest"] += previous["digest"]
+        state = pd.concat([state.drop(index=added.index, errors="ignore"), added])
+    if len(rewrite_ids) > 0:
+        new_rows = long_data[ticker_ids.isin(rewrite_ids).to_numpy()]
+        rewritten = pd.concat([load_long_format(dataset_dir, ticker_ids=rewrite_ids), new_rows], ignore_index=True)
+        rewritten = rewritten.drop_duplicates(["ticker_id", "Date"], keep="last")
+        rewritten = rewritten.sort_values(["ticker_id", "Date"], ignore_index=True)
+        logger.info(f"Rewriting the partitions of {len(rewrite_ids)} tickers with new or corrected history.")
+        for ticker_id in rewrite_ids:
+            shutil.rmtree(os.path.join(dataset_dir, f"ticker_id={ticker_id}"), ignore_errors=True)
+        _write_partitions(rewritten, date_part, dataset_dir)
+        written += len(rewritten)
+        # The state follows the rows of this run, so rerunning on the same data matches it
+        state = pd.concat([state.drop(index=rewrite_ids, errors="ignore"), summarize_history(new_rows)])
+
+    # Written last: an interrupted update is redone from the previous state
+    save_state(state.sort_index(), dataset_dir)
+    return written
+
+
+def load_long_format(dataset_dir: str, ticker_ids=None) -> pd.DataFrame:
+    """
+    Load the long-format dataset, reading only the partitions of the requested tickers.
+
+    Args:
+        dataset_dir (str): Path to the partitioned long-format dataset.
+        ticker_ids (list[int], optional): Ticker ids to load. Loads all tickers if None.
+
+    Returns:
+        pd.DataFrame: Long data with 'Date', 'ticker_id', 'price' and 'return' columns.
+    """
+    filters = [("ticker_id", "in", list(ticker_ids))] if ticker_ids is not None else None
+    long_data = pd.read_parquet(dataset_dir, engine="pyarrow", filters=filters)
+    long_data["ticker_id"] = long_data["ticker_id"].astype("int32")
+    return long_data[LONG_COLUMNS].sort_values(["ticker_id", "Date"], ignore_index=True)
+
+
+def main():
+    """
+    Convert the latest cleaned prices and daily returns into the long format and append them
+    to the long-format dataset.
+    """
+    try:
+        with stage_run("long_format") as run:
+            prices_files = glob.glob(os.path.join(CLEANED_DATA_DIR, "cleaned_*adj-close.parquet"))
+            if not prices_files:
+                raise FileNotFoundError(f"No cleaned price files found in directory '{CLEANED_DATA_DIR}'.")
+            prices_file = max(prices_files, key=os.path.getmtime)
+
+            match = re.search(r"cleaned_(\d{6})-", os.path.basename(prices_file))
+            if not match:
+                raise ValueError(f"File name does not contain a valid date: {prices_file}")
+            date_part = match.group(1)
+            returns_file = find_returns_file(date_part)
+            if returns_file is None:
+                raise FileNotFoundError(f"No daily returns file for {date_part} in directory '{DAILY_RETURN_DIR}'.")
+
+            with run.span("load") as load_span:
+                logger.info(f"Loading prices from: {prices_file}")
+                prices = pd.read_parquet(prices_file)
+                logger.info(f"Loading daily returns from: {returns_file}")
+                returns = pd.read_parquet(returns_file)
+                load_span.record_file(prices_file)
+                load_span.record_file(returns_file)
+
+            with run.span("compute") as compute_span:
+                constituents = load_universe_constituents(load_universes())
+                ticker_dimension = build_ticker_dimension(constituents, TICKER_DIMENSION_FILE)
+                long_data = wide_to_long(prices, returns, ticker_dimension)
+                compute_span.record_frame(long_data)
+
+            with run.span("write") as write_span:
+                write_span.record(rows=save_long_format(long_data, date_part, LONG_FORMAT_DIR))
+
+    except FileNotFoundError as e:
+        logger.error(f"FileNotFoundError: {e}")
+        raise
+    except ValueError as e:
+        logger.error(f"ValueError: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from common.instrumentation import stage_run, timed
+from common.paths import GOLD_DIR, SILVER_RETURNS_DIR, find_latest_file
+from common.universes import load_universe_tickers, load_universes
+from data_engineering.corporate_actions import restated_since
+from data_engineering.fetch_universe_tickers import load_universe_constituents
+from transformations.long_format import TICKER_DIMENSION_FILE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Gold tables, each sorted by its key columns so dashboard tiles read them as is. The per-ticker
+# monthly tables hold one row per ticker and month (about 150k rows for 500 tickers over 25 years,
+# a few MB); the others are much smaller.
+GOLD_TABLES = {
+    "monthly_returns": ["Ticker", "Year", "Month"],
+    "yearly_returns": ["Ticker", "Year"],
+    "sector_returns": ["Sector", "Date"],
+    "cumulative_returns": ["Ticker", "Date"],
+    "top_performers": ["Universe", "Period", "Rank"],
+}
+STATE_FILE = "_state.json"  # Written last: the returns file and date the tables are up to date with
+
+ROLLING_WINDOW = 63  # Trading days in the rolling sector volatility (about three months)
+TOP_N = 10
+# Trailing ranking periods, in months (the current, possibly partial, month included)
+TRAILING_PERIODS = {"1M": 1, "3M": 3, "6M": 6, "1Y": 12, "3Y": 36, "5Y": 60}
+
+
+def read_returns(returns_file: str, start=None) -> pd.DataFrame:
+    """
+    Read the wide daily returns, only from `start` on when given.
+
+    Returns:
+        pd.DataFrame: Daily returns (DatetimeIndex x tickers).
+    """
+    filters = [("Date", ">=", pd.Timestamp(start))] if start is not None else None
+    returns = pq.read_table(returns_file, filters=filters).to_pandas()
+    returns = returns.set_index("Date").sort_index()
+    returns.index = pd.to_datetime(returns.index)
+    return returns
+
+
+def load_sectors() -> pd.Series:
+    """
+    Get the GICS sector of every ticker, from the ticker dimension when it has been built.
+
+    Returns:
+        pd.Series: Sector indexed by ticker symbol (tickers without a sector are left out).
+    """
+    if os.path.exists(TICKER_DIMENSION_FILE):
+        tickers = pd.read_parquet(TICKER_DIMENSION_FILE)
+    else:
+        tickers = load_universe_constituents(load_universes())
+    if "GICS Sector" not in tickers.columns:
+        return pd.Series(dtype="object")
+    sectors = tickers.set_index("Symbol")["GICS Sector"]
+    return sectors[sectors.notna() & (sectors != "")]
+
+
+def _compound(log_returns: pd.DataFrame, keys) -> pd.DataFrame:
+    """
+    Compound daily log returns over groups of rows; groups without any return stay NaN.
+    """
+    return np.expm1(log_returns.groupby(keys).sum(min_count=1))
+
+
+@timed()
+def calculate_monthly_returns(returns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compound daily returns into the return of every ticker in every month.
+
+    Returns:
+        pd.DataFrame: 'Ticker', 'Year', 'Month', 'Return' and 'Trading Days' columns.
+    """
+    log_returns = np.log1p(returns)
+    keys = [returns.index.year.rename("Year"), returns.index.month.rename("Month")]
+    monthly = _compound(log_returns, keys).stack().rename("Return").to_frame()
+    monthly["Trading Days"] = returns.notna().groupby(keys).sum().stack().reindex(monthly.index)
+    monthly.index = monthly.index.set_names("Ticker", level=-1)
+    return monthly.reset_index()[["Ticker", "Year", "Month", "Return", "Trading Days"]]
+
+
+@timed()
+def calculate_yearly_returns(returns: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compound daily returns into the return of every ticker in every year, with its annualized volatility.
+
+    Returns:
+        pd.DataFrame: 'Ticker', 'Year', 'Return', 'Volatility' and 'Trading Days' columns.
+    """
+    years = returns.index.year.rename("Year")
+    yearly = _compound(np.log1p(returns), years).stack().rename("Return").to_frame()
+    yearly["Volatility"] = (returns.groupby(years).std() * np.sqrt(252)).stack().reindex(yearly.index)
+    yearly["Trading Days"] = returns.notna().groupby(years).sum().stack().reindex(yearly.index)
+    yearly.index = yearly.index.set_names("Ticker", level=-1)
+    return yearly.reset_index()[["Ticker", "Year", "Return", "Volatility", "Trading Days"]]
+
+
+@timed()
+def calculate_sector_returns(returns: pd.DataFrame, sectors: pd.Series, start=None, previous=None) -> pd.DataFrame:
+    """
+    Calculate the equal-weighted daily return of every sector, its cumulative return and
+    its rolling annualized volatility.
+
+    Args:
+        returns (pd.DataFrame): Daily returns (DatetimeIndex x tickers), starting at least
+            `ROLLING_WINDOW` trading days before `start` when the rolling volatility must be continued.
+        sectors (pd.Series): Sector indexed by ticker symbol.
+        start (pd.Timestamp, optional): First date to output.
+        previous (pd.Series, optional): Cumulative return of each sector just before `start`,
+            which the new cumulative returns continue from.
+
+    Returns:
+        pd.DataFrame: 'Sector', 'Date', 'Return', 'Cumulative Return' and 'Rolling Volatility' columns.
+    """
+    members = sectors.reindex(returns.columns).dropna()
+    sector_returns = returns[members.index].T.groupby(members).mean().T
+    volatility = sector_returns.rolling(ROLLING_WINDOW, min_periods=ROLLING_WINDOW // 3).std() * np.sqrt(252)
+    if start is not None:
+        sector_returns = sector_returns[sector_returns.index >= start]
+        volatility = volatility.loc[sector_returns.index]
+
+    growth = (1 + sector_returns.fillna(0)).cumprod()
+    if previous is not None:
+        growth = growth * (1 + previous.reindex(growth.columns).fillna(0))
+
+    sector_series = pd.DataFrame({
+        "Return": sector_returns.stack(future_stack=True),
+        "Cumulative Return": (growth - 1).stack(future_stack=True),
+        "Rolling Volatility": volatility.stack(future_stack=True),
+    })
+    sector_series.index = sector_series.index.set_names(["Date", "Sector"])
+    return sector_series.dropna(subset=["Return"]).reset_index()[
+        ["Sector", "Date", "Return", "Cumulative Return", "Rolling Volatility"]
+    ]
+
+
+def calculate_cumulative_returns(monthly: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the month-end cumulative return curve of every ticker from its monthly returns.
+
+    Returns:
+        pd.DataFrame: 'Ticker', 'Date' (month end) and 'Cumulative Return' columns.
+    """
+    monthly = monthly.sort_values(["Ticker", "Year", "Month"])
+    dates = pd.to_datetime(pd.DataFrame({"year": monthly["Year"], "month": monthly["Month"], "day": 1}))
+    cumulative = np.expm1(np.log1p(monthly["Return"]).groupby(monthly["Ticker"]).cumsum())
+    return pd.DataFrame({
+        "Ticker": monthly["Ticker"].to_numpy(),
+        "Date": (dates + pd.offsets.MonthEnd(0)).to_numpy(),
+        "Cumulative Return": cumulative.to_numpy(),
+    })
+
+
+def get_ranked_tickers(universe: dict, columns, benchmarks) -> list:
+    """
+    Get the tickers of a universe to rank: its constituents with returns, benchmarks left out.
+    """
+    tickers = load_universe_tickers(universe)
+    if tickers is None:
+        tickers = list(columns)
+    return [ticker for ticker in dict.fromkeys(tickers) if ticker in columns and ticker not in benchmarks]
+
+
+@timed()
+def calculate_top_performers(monthly: pd.DataFrame, yearly: pd.DataFrame, universes: dict, top_n: int = TOP_N):
+    """
+    Rank the best performing tickers of every universe over trailing periods and calendar years.
+
+    Trailing returns compound the last months of the monthly returns (the latest, possibly
+    partial, month included); only tickers with a return in every month of a period are ranked.
+    Constituents are the current ones.
+
+    Args:
+        monthly (pd.DataFrame): Monthly returns from `calculate_monthly_returns`.
+        yearly (pd.DataFrame): Yearly returns from `calculate_yearly_returns`.
+        universes (dict): Universe name -> definition (see `common.universes`).
+        top_n (int): Number of tickers kept per universe and period.
+
+    Returns:
+        pd.DataFrame: 'Universe', 'Period', 'Rank', 'Ticker' and 'Return' columns.
+    """
+    months = monthly["Year"] * 12 + monthly["Month"] - 1
+    latest_month = months.max()
+    log_returns = np.log1p(monthly["Return"])
+
+    periods = []
+    for period, length in TRAILING_PERIODS.items():
+        in_period = months > latest_month - length
+        grouped = log_returns[in_period].groupby(monthly["Ticker"][in_period])
+        complete = grouped.count() == length
+        periods.append(pd.DataFrame({"Period": period, "Return": np.expm1(grouped.sum()[complete])}))
+    periods = [frame.rename_axis("Ticker").reset_index() for frame in periods]
+    # The calendar year of the latest month is still running: it is ranked as 'YTD'
+    current_year = latest_month // 12
+    periods.append(pd.DataFrame({
+        "Ticker": yearly["Ticker"].to_numpy(),
+        "Period": np.where(yearly["Year"] == current_year, "YTD", yearly["Year"].astype(str)),
+        "Return": yearly["Return"].to_numpy(),
+    }))
+    returns = pd.concat(periods, ignore_index=True)
+
+    benchmarks = {universe["benchmark"] for universe in universes.values()}
+    rankings = []
+    for name, universe in universes.items():
+        tickers = get_ranked_tickers(universe, set(returns["Ticker"]), benchmarks)
+        ranked = returns[returns["Ticker"].isin(tickers)].sort_values(
+            ["Period", "Return", "Ticker"], ascending=[True, False, True]
+        )
+        ranked = ranked.groupby("Period").head(top_n).copy()
+        ranked["Rank"] = ranked.groupby("Period").cumcount().add(1).astype("int16")
+        ranked["Universe"] = name
+        rankings.append(ranked)
+    if not rankings:
+        return pd.DataFrame(columns=["Universe", "Period", "Rank", "Ticker", "Return"])
+    return pd.concat(rankings, ignore_index=True)[["Universe", "Period", "Rank", "Ticker", "Return"]]
+
+
+def load_state(gold_dir: str) -> dict:
+    state_file = os.path.join(gold_dir, STATE_FILE)
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file) as file:
+        return json.load(file)
+
+
+def get_fingerprint(columns, sectors: pd.Series, universes: dict) -> str:
+    """
+    Hash the tickers, their sectors and the universes: when any of them changes, the
+    history of the gold tables changes too and they are rebuilt from scratch.
+    """
+    content = json.dumps({
+        "tickers": sorted(columns),
+        "sectors": sectors.reindex(sorted(columns)).fillna("").tolist(),
+        "universes": universes,
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def load_gold_table(gold_dir: str, name: str) -> pd.DataFrame:
+    return pd.read_parquet(os.path.join(gold_dir, f"{name}.parquet"))
+
+
+def save_gold_table(table: pd.DataFrame, gold_dir: str, name: str) -> str:
+    """
+    Sort a gold table by its key columns and write it, replacing the previous version atomically.
+
+    Returns:
+        str: Path of the written file.
+    """
+    path = os.path.join(gold_dir, f"{name}.parquet")
+    os.makedirs(gold_dir, exist_ok=True)
+    table = table.sort_values(GOLD_TABLES[name], ignore_index=True, kind="stable")
+    table.to_parquet(f"{path}.tmp", index=False, engine="pyarrow")
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def _replace_from(existing: pd.DataFrame, update: pd.DataFrame, keep) -> pd.DataFrame:
+    """
+    Keep the rows of `existing` selected by the boolean mask `keep` and add the updated rows.
+    """
+    return pd.concat([existing[keep], update], ignore_index=True)
+
+
+@timed()
+def materialize_gold_views(returns_file: str, gold_dir: str = GOLD_DIR, universes: dict = None,
+                           sectors: pd.Series = None, top_n: int = TOP_N, full: bool = False) -> dict:
+    """
+    Update the gold tables from the latest daily returns.
+
+    Only the returns of the last materialized year (plus the rolling volatility lookback) are
+    read: monthly and yearly returns and sector series are recomputed from the start of that
+    year and replace the stored rows, the cumulative curves and rankings are derived from the
+    monthly and yearly tables (one row per ticker and month or year, far fewer than the daily
+    returns). The tables are rebuilt from scratch when the tickers,
+    their sectors or the universes change, when new corporate actions restated the history
+    of some tickers, when a table is missing, or when `full` is set.
+
+    Args:
+        returns_file (str): Path to the daily returns Parquet file.
+        gold_dir (str): Directory of the gold tables.
+        universes (dict, optional): Universe name -> definition. Defaults to the configured universes.
+        sectors (pd.Series, optional): Sector indexed by ticker. Defaults to `load_sectors()`.
+        top_n (int): Number of tickers kept per universe and period in the rankings.
+        full (bool): Rebuild every table from the full history.
+
+    Returns:
+        dict: Table name -> number of rows (empty if the tables were already up to date).
+    """
+    universes = load_universes() if universes is None else universes
+    sectors = load_sectors() if sectors is None else sectors
+    if sectors.empty:
+        logger.warning("No GICS sectors in the ticker attributes: the sector series will be empty.")
+    columns = [name for name in pq.read_schema(returns_file).names if name != "Date"]
+    fingerprint = get_fingerprint(columns, sectors, universes)
+
+    state = load_state(gold_dir)
+    incremental = (
+        not full
+        and state.get("fingerprint") == fingerprint
+        and all(os.path.exists(os.path.join(gold_dir, f"{name}.parquet")) for name in GOLD_TABLES)
+    )
+    restated = restated_since(state["returns_file"]) if incremental else []
+    if restated:
+        logger.info(f"Corporate actions restated the history of {len(restated)} tickers: rebuilding the gold tables.")
+        incremental = False
+
+    if incremental:
+        last_date = pd.Timestamp(state["last_date"])
+        rebuild_from = pd.Timestamp(year=last_date.year, month=1, day=1)
+        # Weekdays include holidays: a margin of twice the window keeps at least `ROLLING_WINDOW`
+        # trading days before the rebuilt year, so the rolling volatility matches a full rebuild
+        returns = read_returns(returns_file, start=rebuild_from - pd.offsets.BDay(2 * ROLLING_WINDOW))
+        if returns.index.max() <= last_date and state.get("returns_file") == os.path.basename(returns_file):
+            logger.info(f"Gold tables are already up to date with {returns_file}.")
+            return {}
+        logger.info(f"Updating gold tables from {rebuild_from:%Y-%m-%d} (last materialized date {last_date:%Y-%m-%d}).")
+    else:
+        rebuild_from = None
+        returns = read_returns(returns_file)
+        logger.info(f"Rebuilding gold tables from the full history of {returns_file}.")
+
+    recent = returns if rebuild_from is None else returns[returns.index >= rebuild_from]
+    monthly = calculate_monthly_returns(recent)
+    yearly = calculate_yearly_returns(recent)
+
+    previous_growth = None
+    if incremental:
+        stored_sectors = load_gold_table(gold_dir, "sector_returns")
+        before = stored_sectors[stored_sectors["Date"] < rebuild_from]
+        previous_growth = before.sort_values("Date").groupby("Sector")["Cumulative Return"].last()
+    sector_series = calculate_sector_returns(returns, sectors, start=rebuild_from, previous=previous_growth)
+
+    if incremental:
+        stored_monthly = load_gold_table(gold_dir, "monthly_returns")
+        monthly = _replace_from(stored_monthly, monthly, stored_monthly["Year"] < rebuild_from.year)
+        stored_yearly = load_gold_table(gold_dir, "yearly_returns")
+        yearly = _replace_from(stored_yearly, yearly, stored_yearly["Year"] < rebuild_from.year)
+        sector_series = _replace_from(stored_sectors, sector_series, stored_sectors["Date"] < rebuild_from)
+
+    tables = {
+        "monthly_returns": monthly,
+        "yearly_returns": yearly,
+        "sector_returns": sector_series,
+        "cumulative_returns": calculate_cumulative_returns(monthly),
+        "top_performers": calculate_top_performers(monthly, yearly, universes, top_n),
+    }
+    for name, table in tables.items():
+        save_gold_table(table, gold_dir, name)
+
+    with open(os.path.join(gold_dir, STATE_FILE), "w") as file:
+        json.dump({
+            "returns_file": os.path.basename(returns_file),
+            "last_date": f"{returns.index.max():%Y-%m-%d}",
+            "fingerprint": fingerprint,
+        }, file, indent=2)
+    return {name: len(table) for name, table in tables.items()}
+
+
+def main(full: bool = False):
+    """
+    Update the gold tables from the latest daily returns file.
+
+    Args:
+        full (bool): Rebuild every table from the full history.
+    """
+    try:
+        with stage_run("materialize_gold_views") as run:
+            returns_file = find_latest_file(SILVER_RETURNS_DIR, "returns_cleaned_*.parquet")
+            if returns_file is None:
+                raise FileNotFoundError(f"No daily return files found in directory '{SILVER_RETURNS_DIR}'.")
+            with run.span("materialize") as materialize_span:
+                rows = materialize_gold_views(returns_file, full=full)
+                for name in rows:
+                    materialize_span.record_file(os.path.join(GOLD_DIR, f"{name}.parquet"))
+            for name, count in rows.items():
+                size = os.path.getsize(os.path.join(GOLD_DIR, f"{name}.parquet"))
+                logger.info(f"Gold table '{name}': {count} rows, {size / 1024:.1f} KB")
+    except Exception as e:
+        logger.error(f"Failed to materialize the gold tables: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from common.instrumentation import stage_run
+from common.paths import BRONZE_INTRADAY_DIR, SILVER_INTRADAY_DIR
+from data_engineering.intraday_bars import BAR_COLUMNS, get_stored_dates, list_partitions, open_minute_bars
+from transformations.calculate_daily_return import calculate_daily_returns, save_daily_returns
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Target bar sizes (pandas offset aliases); '1D' bars are stamped at midnight of the session
+RESAMPLE_FREQUENCIES = ["5min", "1h", "1D"]
+# Intraday bars start at the session open (e.g. hourly bars at 9:30, 10:30, ..., 15:30)
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=30)
+RESAMPLED_COLUMNS = ["Datetime", "Ticker", "Open", "High", "Low", "Close", "Volume", "Bars", "Realized Volatility"]
+INTRADAY_RETURN_DIR = os.path.join(SILVER_INTRADAY_DIR, "returns/")  # Daily returns from the daily bars
+
+# Number of tickers whose minute bars are held in memory at once
+CHUNK_SIZE = 100
+
+
+def get_resampled_dir(freq: str, output_dir: str = SILVER_INTRADAY_DIR) -> str:
+    """
+    Get the directory of the bars resampled to a frequency (e.g. 'data/silver/intraday/bars_5min/').
+    """
+    return os.path.join(output_dir, f"bars_{freq}/")
+
+
+def minute_log_returns(bars: pd.DataFrame) -> np.ndarray:
+    """
+    Compute the log return of every minute bar within its ticker and session.
+
+    The first bar of each session uses its own open (log(close / open)), so overnight
+    gaps are excluded from the intraday realized volatility.
+
+    Args:
+        bars (pd.DataFrame): Minute bars sorted by 'Ticker' then 'Datetime'.
+
+    Returns:
+        np.ndarray: Log returns aligned with the rows of `bars`.
+    """
+    close = bars["Close"].to_numpy(dtype="float64")
+    log_returns = np.empty(len(bars))
+    log_returns[1:] = np.log(close[1:] / close[:-1])
+
+    # Bars starting a new ticker or session have no previous close to compare with
+    tickers = bars["Ticker"].to_numpy()
+    sessions = bars["Datetime"].to_numpy().astype("datetime64[D]")
+    first = np.ones(len(bars), dtype=bool)
+    first[1:] = (tickers[1:] != tickers[:-1]) | (sessions[1:] != sessions[:-1])
+    log_returns[first] = np.log(close[first] / bars["Open"].to_numpy(dtype="float64")[first])
+    return log_returns
+
+
+def aggregate_bars(bars: pd.DataFrame, freq: str, log_returns: np.ndarray = None) -> pd.DataFrame:
+    """
+    Aggregate minute bars to OHLCV bars of a coarser frequency, with realized volatility.
+
+    Intraday bars are anchored at the session open (`SESSION_OPEN`) rather than at
+    midnight, so the first hourly bar covers 9:30-10:30 instead of 9:30-10:00.
+
+    Args:
+        bars (pd.DataFrame): Minute bars sorted by 'Ticker' then 'Datetime'.
+        freq (str): Target bar size (e.g. '5min', '1h', '1D').
+        log_returns (np.ndarray, optional): Minute log returns from `minute_log_returns`;
+            computed when not given.
+
+    Returns:
+        pd.DataFrame: One row per ticker and bar with the columns in `RESAMPLED_COLUMNS`.
+        'Realized Volatility' is the square root of the summed squared minute log returns
+        (not annualized).
+    """
+    if log_returns is None:
+        log_returns = minute_log_returns(bars)
+
+    # Floor every timestamp to the start of its bar with integer arithmetic
+    step = pd.Timedelta(freq).value
+    offset = SESSION_OPEN.value if step < pd.Timedelta("1D").value else 0
+    timestamps = bars["Datetime"].to_numpy().astype("datetime64[ns]").view("int64")
+    buckets = ((timestamps - offset) // step * step + offset).view("datetime64[ns]")
+
+    grouped = pd.DataFrame({
+        "Ticker": bars["Ticker"].to_numpy(),
+        "Datetime": buckets,
+        "Open": bars["Open"].to_numpy(),
+        "High": bars["High"].to_numpy(),
+        "Low": bars["Low"].to_numpy(),
+        "Close": bars["Close"].to_numpy(),
+        "Volume": bars["Volume"].to_numpy(),
+        "Squared Return": log_returns ** 2,
+    }).groupby(["Ticker", "Datetime"], sort=False)
+
+    resampled = grouped.agg(
+        Open=("Open", "first"),
+        High=("High", "max"),
+        Low=("Low", "min"),
+        Close=("Close", "last"),
+        Volume=("Volume", "sum"),
+        Bars=("Close", "size"),
+        **{"Realized Volatility": ("Squared Return", "sum")},
+    ).reset_index()
+    resampled["Realized Volatility"] = np.sqrt(resampled["Realized Volatility"])
+    return resampled[RESAMPLED_COLUMNS]
+
+
+def iter_resampled_bars(dataset: ds.Dataset, freqs=RESAMPLE_FREQUENCIES, dates=None, chunk_size: int = CHUNK_SIZE):
+    """
+    Stream the minute bar store session by session and resample it to several frequencies.
+
+    Only `chunk_size` tickers of one session are read at a time (using partition pruning),
+    and every chunk is aggregated to all frequencies before the next one is read, so
+    memory stays bounded regardless of the universe size.
+
+    Args:
+        dataset (ds.Dataset): Minute bar store opened with `open_minute_bars`.
+        freqs (list[str]): Target bar sizes.
+        dates (list[str], optional): Sessions ('YYYY-MM-DD') to resample. Defaults to all.
+        chunk_size (int): Number of tickers read at once.
+
+    Yields:
+        tuple[str, dict[str, pd.DataFrame]]: The session date and its resampled bars per frequency.
+    """
+    partitions = list_partitions(dataset)
+    if dates is not None:
+        partitions = partitions[partitions["Date"].isin(dates)]
+
+    for date, tickers in partitions.groupby("Date")["Ticker"]:
+        tickers = tickers.tolist()
+        chunks = {freq: [] for freq in freqs}
+        for first in range(0, len(tickers), chunk_size):
+            table = dataset.to_table(
+                columns=BAR_COLUMNS,
+                filter=(ds.field("Date") == date) & ds.field("Ticker").isin(tickers[first:first + chunk_size]),
+            )
+            bars = table.sort_by([("Ticker", "ascending"), ("Datetime", "ascending")]).to_pandas()
+            log_returns = minute_log_returns(bars)
+            for freq in freqs:
+                chunks[freq].append(aggregate_bars(bars, freq, log_returns))
+        yield date, {freq: pd.concat(frames, ignore_index=True) for freq, frames in chunks.items()}
+
+
+def save_resampled_bars(resampled: pd.DataFrame, date: str, freq: str, output_dir: str = SILVER_INTRADAY_DIR) -> str:
+    """
+    Save the resampled bars of one session, replacing any previous version of it.
+
+    Returns:
+        str: Path of the written Parquet file.
+    """
+    session_dir = os.path.join(get_resampled_dir(freq, output_dir), f"Date={date}")
+    os.makedirs(session_dir, exist_ok=True)
+    file_path = os.path.join(session_dir, "part-0.parquet")
+    pq.write_table(pa.Table.from_pandas(resampled, preserve_index=False), file_path)
+    return file_path
+
+
+def load_resampled_bars(freq: str, output_dir: str = SILVER_INTRADAY_DIR, tickers=None) -> pd.DataFrame:
+    """
+    Load the bars resampled to a frequency, optionally for some tickers only.
+    """
+    resampled_dir = get_resampled_dir(freq, output_dir)
+    if not os.path.isdir(resampled_dir):
+        return pd.DataFrame(columns=RESAMPLED_COLUMNS)
+    filters = [("Ticker", "in", list(tickers))] if tickers is not None else None
+    resampled = pd.read_parquet(resampled_dir, engine="pyarrow", filters=filters, columns=RESAMPLED_COLUMNS)
+    return resampled.sort_values(["Ticker", "Datetime"], ignore_index=True)
+
+
+def to_wide(resampled: pd.DataFrame, value: str = "Close") -> pd.DataFrame:
+    """
+    Pivot resampled bars to a wide frame (bar start x tickers), e.g. daily closes for
+    `calculate_daily_returns`.
+    """
+    wide = resampled.pivot(index="Datetime", columns="Ticker", values=value)
+    wide.index.name = "Date"
+    wide.columns.name = None
+    return wide
+
+
+def main():
+    """
+    Resample the sessions of the minute bar store that were not resampled yet, then
+    recompute daily returns from the daily bars.
+    """
+    try:
+        with stage_run("resample_intraday_bars") as run:
+            resampled_dates = set(get_stored_dates(get_resampled_dir("1D"), include_empty=False))
+            # Sessions fetched without any bar have nothing to resample
+            stored_dates = get_stored_dates(BRONZE_INTRADAY_DIR, include_empty=False)
+            pending = [date for date in stored_dates if date not in resampled_dates]
+            if not pending:
+                logger.info("All stored sessions are already resampled.")
+                return
+
+            with run.span("resample") as resample_span:
+                dataset = open_minute_bars(BRONZE_INTRADAY_DIR)
+                for date, resampled in iter_resampled_bars(dataset, RESAMPLE_FREQUENCIES, dates=pending):
+                    with run.span("write") as write_span:
+                        # The daily bars are written last: their presence marks the session as done
+                        for freq in sorted(resampled, key=lambda name: name == "1D"):
+                            write_span.record_file(save_resampled_bars(resampled[freq], date, freq))
+                            write_span.record(rows=len(resampled[freq]))
+                    resample_span.record(rows=resampled["1D"]["Bars"].sum())
+                    logger.info(f"Resampled session {date} to {', '.join(RESAMPLE_FREQUENCIES)}.")
+
+            # Daily closes from the minute bars feed the regular daily returns calculation
+            with run.span("returns") as returns_span:
+                daily_closes = to_wide(load_resampled_bars("1D"))
+                daily_returns = calculate_daily_returns(daily_closes)
+                date_part = pd.Timestamp(pending[-1]).strftime("%y%m%d")
+                save_daily_returns(daily_returns, date_part, INTRADAY_RETURN_DIR)
+                returns_span.record_frame(daily_returns)
+
+    except FileNotFoundError as e:
+        logger.error(f"FileNotFoundError: {e}")
+        raise
+    except ValueError as e:
+        logger.error(f"ValueError: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+
+# Stage modules are imported from src/ (e.g. `from transformations.long_format import ...`)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+# Synthetic data generators are shared with the benchmark suite (`import synthetic`)
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+from synthetic import generate_prices, generate_returns  # noqa: E402
+
+BENCHMARK = "^GSPC"
+
+
+@pytest.fixture
+def returns():
+    """
+    Four years of synthetic daily returns ('Date', 20 tickers and the benchmark).
+    """
+    return generate_returns(generate_prices(n_tickers=20, years=4, start="2020-01-02", benchmark_ticker=BENCHMARK))
+
+
+@pytest.fixture
+def tickers(returns):
+    """
+    The tickers of `returns`, without the benchmark.
+    """
+    return [column for column in returns.columns if column not in ("Date", BENCHMARK)]
+
+
+@pytest.fixture
+def write_returns(tmp_path, monkeypatch):
+    """
+    Write returns files named like the clean stage's output to `tmp_path/returns`.
+
+    The tests run from `tmp_path`, which has no restatements file, so incremental stages
+    take their incremental path.
+    """
+    monkeypatch.chdir(tmp_path)
+    returns_dir = tmp_path / "returns"
+
+    def write(returns, date_part):
+        returns_dir.mkdir(exist_ok=True)
+        path = returns_dir / f"returns_cleaned_{date_part}-adj-close.parquet"
+        returns.to_parquet(path, index=False)
+        return str(path)
+
+    return write
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.paths import parse_performance_file_name
+from transformations.analyze_annual_stock_performance import calculate_annual_statistics, calculate_universe_metrics
+from transformations.gap_handling import build_coverage, complete_tickers
+
+
+@pytest.fixture
+def returns_file(tmp_path):
+    dates = pd.bdate_range("2022-01-03", "2023-12-29")
+    rng = np.random.default_rng(0)
+    # Shared returns: columns sorted by ticker with the indices last, as downloaded
+    tickers = ["AAPL", "JPM", "MSFT", "NVDA", "^GSPC", "^NDX"]
+    returns = pd.DataFrame(rng.normal(0, 0.01, (len(dates), len(tickers))), index=dates, columns=tickers)
+    path = str(tmp_path / "returns_cleaned_241216-adj-close.parquet")
+    returns.rename_axis("Date").reset_index().to_parquet(path, index=False)
+    return path
+
+
+def _write_tickers(path, symbols):
+    pd.DataFrame({"Symbol": symbols}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_sp500_keeps_the_legacy_file_name_and_row_order(tmp_path, returns_file):
+    universes = {
+        "sp500": {"name": "sp500", "benchmark": "^GSPC",
+                  "tickers_file": _write_tickers(tmp_path / "SP500-tickers.csv", ["MSFT", "AAPL", "JPM"])},
+        "nasdaq100": {"name": "nasdaq100", "benchmark": "^NDX",
+                      "tickers_file": _write_tickers(tmp_path / "NDX-tickers.csv", ["NVDA", "MSFT"])},
+    }
+    output_dir = str(tmp_path / "performance")
+
+    performances = calculate_universe_metrics(returns_file, output_dir, universes)
+
+    assert sorted(os.listdir(output_dir)) == [
+        "performance_241216-SP500-adj-close.csv", "performance_241216-SP500-adj-close.parquet",
+        "performance_241216-nasdaq100.csv", "performance_241216-nasdaq100.parquet",
+    ]
+    # Rows follow the returns columns, not the tickers file
+    assert performances["sp500"]["Ticker"].tolist() == ["AAPL", "JPM", "MSFT", "^GSPC"]
+    assert performances["nasdaq100"]["Ticker"].tolist() == ["MSFT", "NVDA", "^NDX"]
+    assert parse_performance_file_name("performance_241216-SP500-adj-close.parquet") == ("241216", "sp500")
+    assert parse_performance_file_name("performance_241216-nasdaq100.parquet") == ("241216", "nasdaq100")
+
+
+def test_missing_tickers_file_fails(tmp_path, returns_file):
+    universes = {"russell1000": {"name": "russell1000", "benchmark": "^GSPC",
+                                 "tickers_file": str(tmp_path / "RUI-tickers.csv")}}
+    output_dir = str(tmp_path / "performance")
+
+    with pytest.raises(FileNotFoundError, match="RUI-tickers.csv"):
+        calculate_universe_metrics(returns_file, output_dir, universes)
+    assert not os.path.exists(output_dir)
+
+
+def test_complete_tickers_match_the_nan_aware_statistics():
+    dates = pd.bdate_range("2021-12-31", "2023-12-29", name="Date")
+    rng = np.random.default_rng(1)
+    prices = pd.DataFrame(100 * np.exp(rng.normal(0, 0.01, (len(dates), 4)).cumsum(axis=0)),
+                          index=dates, columns=["AAPL", "JPM", "MSFT", "^GSPC"])
+    # JPM lists later, MSFT has a long gap: only AAPL and the index are complete
+    prices.iloc[:40, 1] = np.nan
+    prices.iloc[300:310, 2] = np.nan
+    observed = prices.notna().to_numpy()
+    coverage = build_coverage(prices, observed)
+    complete = complete_tickers(coverage, prices.index)
+    returns = prices.pct_change(fill_method=None)
+
+    statistics = calculate_annual_statistics(returns, complete)
+
+    assert complete == ["AAPL", "^GSPC"]
+    # 2021 only has the first (missing) return
+    assert statistics.index.tolist() == [2021, 2022, 2023]
+    pd.testing.assert_frame_equal(statistics, calculate_annual_statistics(returns), check_exact=False, rtol=1e-9)
+
+
+def test_missing_benchmark_fails_after_the_other_universes(tmp_path, returns_file):
+    universes = {
+        "russell2000": {"name": "russell2000", "benchmark": "^RUT"},
+        "nasdaq100": {"name": "nasdaq100", "benchmark": "^NDX",
+                      "tickers_file": _write_tickers(tmp_path / "NDX-tickers.csv", ["NVDA", "MSFT"])},
+    }
+    output_dir = str(tmp_path / "performance")
+
+    with pytest.raises(ValueError, match="russell2000.*'\\^RUT' not found"):
+        calculate_universe_metrics(returns_file, output_dir, universes)
+    assert sorted(os.listdir(output_dir)) == ["performance_241216-nasdaq100.csv", "performance_241216-nasdaq100.parquet"]
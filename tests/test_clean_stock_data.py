@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from transformations.clean_stock_data import clean_stock_data
+from transformations.gap_handling import COVERAGE_COLUMNS
+
+
+def _write_prices(tmp_path):
+    # 2024-01-15 is Martin Luther King Jr. Day; AAA misses two trading days, BBB lists late
+    dates = pd.to_datetime(["2024-01-10", "2024-01-11", "2024-01-12", "2024-01-15", "2024-01-16",
+                            "2024-01-17", "2024-01-18"])
+    prices = pd.DataFrame({
+        "AAA": [10.0, np.nan, np.nan, np.nan, 11.0, 11.5, 12.0],
+        "BBB": [np.nan, np.nan, 20.0, np.nan, 21.0, 22.0, 23.0],
+    }, index=pd.DatetimeIndex(dates, name="Date"))
+    path = tmp_path / "240118-adj-close.csv"
+    prices.to_csv(path)
+    return str(path)
+
+
+def test_clean_stock_data_returns_the_prices(tmp_path):
+    cleaned = clean_stock_data(_write_prices(tmp_path))
+
+    assert isinstance(cleaned, pd.DataFrame)
+    # The holiday row is dropped and the two-day gap is forward-filled
+    assert pd.Timestamp("2024-01-15") not in cleaned.index
+    assert cleaned["AAA"].tolist() == [10.0, 10.0, 10.0, 11.0, 11.5, 12.0]
+    assert cleaned["BBB"].isna().tolist() == [True, True, False, False, False, False]
+
+
+def test_clean_stock_data_with_coverage(tmp_path):
+    cleaned, coverage = clean_stock_data(_write_prices(tmp_path), return_coverage=True)
+
+    assert list(coverage.columns) == COVERAGE_COLUMNS
+    coverage = coverage.set_index("Ticker")
+    assert coverage.loc["AAA", ["Observed Days", "Filled Days", "Missing Days"]].tolist() == [4, 2, 0]
+    assert coverage.loc["BBB", "First Date"] == pd.Timestamp("2024-01-12")
+    assert len(cleaned) == 6
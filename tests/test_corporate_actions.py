@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from data_engineering.corporate_actions import (
+    DIVIDEND,
+    SPLIT,
+    actions_from_wide,
+    adjust_prices,
+    load_restated_tickers,
+    record_restatements,
+    restated_since,
+    unadjust_dividends,
+    unadjust_splits,
+)
+
+DATES = pd.bdate_range("2024-03-01", periods=10, name="Date")
+
+
+def test_split_inside_incremental_window_is_applied_once():
+    # Stored raw closes: 100 for the first five days
+    stored = pd.DataFrame({"AAA": 100.0}, index=DATES[:5])
+    # Incremental window with a 2:1 split on its third day. Yahoo returns the window already
+    # split-adjusted: the two pre-split days come back as 50 instead of 100
+    window = pd.DataFrame({"AAA": 50.0}, index=DATES[5:])
+    splits = pd.DataFrame({"AAA": [0.0, 0.0, 2.0, 0.0, 0.0]}, index=DATES[5:])
+    actions = actions_from_wide(None, splits)
+    assert actions[["Symbol", "Action", "Value"]].values.tolist() == [["AAA", SPLIT, 2.0]]
+
+    raw_window = unadjust_splits(window, actions)
+    assert raw_window["AAA"].tolist() == [100.0, 100.0, 50.0, 50.0, 50.0]
+
+    closes = raw_window.combine_first(stored)
+    adjusted = adjust_prices(closes, actions)
+    # Every day before the split is halved once: the adjusted series is flat
+    np.testing.assert_allclose(adjusted["AAA"], 50.0)
+    assert not adjusted.pct_change(fill_method=None)["AAA"].iloc[1:].any()
+
+
+def test_dividend_before_split_inside_incremental_window_is_unadjusted():
+    stored = pd.DataFrame({"AAA": 100.0}, index=DATES[:5])
+    # Yahoo returns the window split-adjusted, dividends included: the 1.0 dividend paid on the
+    # window's second day (before the 2:1 split on its third day) comes back as 0.5. Each close
+    # drops by exactly the dividend paid, so the total return is flat throughout
+    window = pd.DataFrame({"AAA": [50.0, 49.5, 49.5, 49.5, 49.25]}, index=DATES[5:])
+    dividends = pd.DataFrame({"AAA": [0.0, 0.5, 0.0, 0.0, 0.25]}, index=DATES[5:])
+    splits = pd.DataFrame({"AAA": [0.0, 0.0, 2.0, 0.0, 0.0]}, index=DATES[5:])
+    actions = actions_from_wide(dividends, splits)
+
+    raw_actions = unadjust_dividends(actions, window)
+    # Only the dividend before the split is scaled back; the one after it is already raw
+    assert raw_actions.loc[raw_actions["Action"] == DIVIDEND, "Value"].tolist() == [1.0, 0.25]
+    assert raw_actions.loc[raw_actions["Action"] == SPLIT, "Value"].tolist() == [2.0]
+
+    closes = unadjust_splits(window, actions).combine_first(stored)
+    assert closes["AAA"].tolist()[5:] == [100.0, 99.0, 49.5, 49.5, 49.25]
+    returns = adjust_prices(closes, raw_actions).pct_change(fill_method=None)["AAA"]
+    # With the fetched 0.5 the 100 -> 99 drop would count as a loss
+    np.testing.assert_allclose(returns.iloc[1:], 0.0, atol=1e-12)
+
+
+def test_unadjust_splits_without_splits_is_a_no_op():
+    window = pd.DataFrame({"AAA": [10.0, 11.0]}, index=DATES[:2])
+    dividends = pd.DataFrame({"AAA": [0.0, 0.5]}, index=DATES[:2])
+    pd.testing.assert_frame_equal(unadjust_splits(window, actions_from_wide(dividends, None)), window)
+
+
+def test_restatements(tmp_path):
+    path = str(tmp_path / "restatements.csv")
+    assert load_restated_tickers("2024-03-01", path) == []
+    record_restatements(["BBB", "AAA"], "2024-03-04", path)
+    record_restatements(["CCC"], "2024-03-06", path)
+    record_restatements(["CCC"], "2024-03-06", path)
+
+    assert load_restated_tickers("2024-03-01", path) == ["AAA", "BBB", "CCC"]
+    assert load_restated_tickers("2024-03-04", path) == ["CCC"]
+    # Stages compare with the date of the returns file they last processed
+    assert restated_since("returns_cleaned_240305-adj-close.parquet", path) == ["CCC"]
+    assert restated_since("returns_cleaned_240306-adj-close.parquet", path) == []
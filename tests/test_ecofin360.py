@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import ecofin360
+
+
+def _fail():
+    raise RuntimeError("no prices")
+
+
+def test_run_stops_with_non_zero_exit_code_on_failure(monkeypatch):
+    ran = []
+    monkeypatch.setattr(ecofin360, "STAGES", {
+        "first": ("", None, _fail),
+        "second": ("", None, lambda: ran.append("second")),
+    })
+
+    assert ecofin360.main(["run"]) == 1
+    assert ran == []
+
+
+def test_run_exits_zero_when_every_stage_succeeds(monkeypatch):
+    ran = []
+    monkeypatch.setattr(ecofin360, "STAGES", {
+        "first": ("", None, lambda: ran.append("first")),
+        "second": ("", None, lambda: ran.append("second")),
+    })
+
+    assert ecofin360.main(["run"]) == 0
+    assert ran == ["first", "second"]
+
+
+@pytest.mark.parametrize("returns_name", [
+    "returns_cleaned_241216-adj-close.parquet",
+    "returns_cleaned_241216-SP500-adj-close.parquet",
+])
+def test_check_returns_finds_both_file_names(tmp_path, monkeypatch, returns_name):
+    monkeypatch.chdir(tmp_path)
+    for directory, name in [("data/silver/stocks", "cleaned_241216-SP500-adj-close.parquet"),
+                            ("data/silver/returns", returns_name)]:
+        os.makedirs(directory)
+        open(os.path.join(directory, name), "w").close()
+
+    assert ecofin360.check_returns() is not None
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from data_science import feature_store
+
+BENCHMARK = "^GSPC"
+
+
+def test_incremental_update_matches_a_full_rebuild(tmp_path, monkeypatch, write_returns, returns, tickers):
+    # The first file misses the last months and two tickers, added by the update
+    partial = returns.loc[returns["Date"] < "2023-06-15"].drop(columns=tickers[-2:])
+    partial_file = write_returns(partial, "230615")
+    latest_file = write_returns(returns, "231229")
+    incremental_dir, full_dir = str(tmp_path / "incremental"), str(tmp_path / "full")
+
+    feature_store.update_feature_store(partial_file, incremental_dir, BENCHMARK)
+    read_from = []
+    read_returns = feature_store.read_returns
+
+    def record_start(path, tickers=None, start=None):
+        read_from.append(start)
+        return read_returns(path, tickers, start)
+
+    monkeypatch.setattr(feature_store, "read_returns", record_start)
+    feature_store.update_feature_store(latest_file, incremental_dir, BENCHMARK)
+    written = feature_store.update_feature_store(latest_file, full_dir, BENCHMARK, full=True)
+
+    incremental = feature_store.load_features(dataset_dir=incremental_dir)
+    full = feature_store.load_features(dataset_dir=full_dir)
+    # The new tickers' history, then the new days with the lookback of the longest window
+    assert read_from[0] is None and read_from[1].year == 2022
+    assert len(full) == written
+    assert set(full["Ticker"]) == set(tickers) | {BENCHMARK}
+    pd.testing.assert_frame_equal(incremental, full, check_exact=False, rtol=1e-5, atol=1e-7)
+    # A rerun has nothing to add
+    assert feature_store.update_feature_store(latest_file, incremental_dir, BENCHMARK) == 0
+
+
+def test_join_features_only_uses_the_previous_days(tmp_path, write_returns, returns):
+    returns_file = write_returns(returns, "231229")
+    dataset_dir = str(tmp_path / "features")
+    feature_store.update_feature_store(returns_file, dataset_dir, BENCHMARK)
+    ticker = returns.columns[1]
+    dates = pd.DatetimeIndex(returns["Date"])
+
+    events = pd.DataFrame({
+        # A trading day, the first day of the store, a Saturday and the last day of the store
+        "Date": [dates[300], dates[0], pd.Timestamp("2023-03-04"), dates[-1]],
+        "Ticker": ticker,
+        "Target": [1.0, 2.0, 3.0, 4.0],
+    }, index=[10, 11, 12, 13])
+    joined = feature_store.join_features(events, columns=["return", "return_lag_1"], dataset_dir=dataset_dir)
+
+    # The events keep their order, index and columns
+    assert joined.index.tolist() == [10, 11, 12, 13]
+    assert joined["Target"].tolist() == [1.0, 2.0, 3.0, 4.0]
+    daily = returns.set_index("Date")[ticker].astype("float32")
+    friday = dates[dates < "2023-03-04"][-1]
+    expected = [daily[dates[299]], np.nan, daily[friday], daily[dates[-2]]]
+    np.testing.assert_array_equal(joined["return"].to_numpy(), np.array(expected, dtype="float32"))
+    assert joined.loc[10, "return_lag_1"] == daily[dates[298]]
+
+
+def test_join_features_ignores_features_older_than_the_tolerance(tmp_path, write_returns, returns):
+    returns_file = write_returns(returns, "231229")
+    dataset_dir = str(tmp_path / "features")
+    feature_store.update_feature_store(returns_file, dataset_dir, BENCHMARK)
+    last_date = pd.Timestamp(returns["Date"].max())
+
+    events = pd.DataFrame({"Date": [last_date + pd.Timedelta(days=10)], "Ticker": [returns.columns[1]]})
+    joined = feature_store.join_features(events, columns=["return"], tolerance=pd.Timedelta("7D"),
+                                         dataset_dir=dataset_dir)
+
+    assert joined["return"].isna().all()
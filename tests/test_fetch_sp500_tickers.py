@@ -0,0 +1,114 @@
+import os
+
+import pandas as pd
+import pytest
+
+from data_engineering import fetch_sp500_tickers as scraper
+
+FIXTURE_FILE = os.path.join(os.path.dirname(__file__), "fixtures", "wikipedia-sp500.html")
+
+
+@pytest.fixture(params=["lxml", "html.parser"])
+def backend(request, monkeypatch):
+    """
+    Run a test with both table parsers: lxml, and BeautifulSoup's html.parser fallback.
+    """
+    if request.param == "html.parser":
+        monkeypatch.setattr(scraper, "lxml", None)
+    elif scraper.lxml is None:
+        pytest.skip("lxml is not installed")
+    return request.param
+
+
+@pytest.fixture
+def page():
+    with open(FIXTURE_FILE, "rb") as fixture:
+        return fixture.read()
+
+
+def test_parse_sp500_constituents(backend, page):
+    constituents = scraper.parse_sp500_constituents(page)
+
+    assert list(constituents.columns) == scraper.CONSTITUENT_COLUMNS
+    # Share classes use '-' as Yahoo Finance does
+    assert constituents["Symbol"].tolist() == ["MMM", "AAPL", "BRK-B", "BF-B", "MSFT", "ZTS"]
+    apple = constituents.set_index("Symbol").loc["AAPL"]
+    assert apple["Security"] == "Apple Inc."
+    assert apple["GICS Sector"] == "Information Technology"
+    assert apple["GICS Sub-Industry"] == "Technology Hardware, Storage & Peripherals"
+    assert apple["CIK"] == "0000320193"
+
+
+def test_parse_sp500_changes(backend, page):
+    changes = scraper.parse_sp500_changes(page)
+
+    expected = pd.DataFrame({
+        "Date": pd.to_datetime(["2024-12-23", "2024-12-23", "2024-10-01", "2024-09-23", "2008-03-20"]),
+        "Added": ["APO", "WDAY", "AMTM", "ERIE", "BRK-B"],
+        "Removed": ["QRVO", "AMTM", "", "BBWI", "BF-A"],
+    })
+    # The second row shares the date of the first one (rowspan)
+    pd.testing.assert_frame_equal(changes.reset_index(drop=True), expected)
+
+
+def test_backends_agree(page, monkeypatch):
+    if scraper.lxml is None:
+        pytest.skip("lxml is not installed")
+    fast = scraper.parse_sp500_constituents(page), scraper.parse_sp500_changes(page)
+    monkeypatch.setattr(scraper, "lxml", None)
+    fallback = scraper.parse_sp500_constituents(page), scraper.parse_sp500_changes(page)
+    pd.testing.assert_frame_equal(fast[0], fallback[0])
+    pd.testing.assert_frame_equal(fast[1], fallback[1])
+
+
+class StubResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code, self.content, self.headers = status_code, content, headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class StubSession:
+    def __init__(self, response):
+        self.response, self.requests = response, []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(headers)
+        return self.response
+
+
+def test_fetch_wikipedia_page_caches_only_when_saved(tmp_path, monkeypatch, page):
+    cache_file, meta_file = str(tmp_path / "page.html"), str(tmp_path / "page.json")
+    session = StubSession(StubResponse(200, page, {"ETag": '"v1"'}))
+    monkeypatch.setattr(scraper, "get_session", lambda: session)
+
+    content, validators = scraper.fetch_wikipedia_page("https://example.org", cache_file, meta_file)
+    assert content == page and validators == {"etag": '"v1"', "last_modified": None}
+    # Nothing is cached until the caller has processed the page
+    assert not os.path.exists(cache_file) and not os.path.exists(meta_file)
+
+    scraper.save_wikipedia_page(content, validators, cache_file, meta_file)
+    session.response = StubResponse(304)
+    content, validators = scraper.fetch_wikipedia_page("https://example.org", cache_file, meta_file)
+    assert session.requests[-1] == {"If-None-Match": '"v1"'}
+    assert content == page and validators is None
+
+
+def test_parse_constituents_of_a_table_without_id(backend):
+    with open(os.path.join(os.path.dirname(__file__), "fixtures", "wikipedia-russell1000.html"), "rb") as fixture:
+        page = fixture.read()
+
+    constituents = scraper.parse_constituents(page, None, {"Security": "Company"})
+
+    # The infobox and the returns table come first but have no 'Symbol' column
+    assert constituents["Symbol"].tolist() == ["MMM", "BRK-B", "ZM"]
+    assert constituents["Security"].tolist() == ["3M", "Berkshire Hathaway", "Zoom Communications"]
+    assert constituents["GICS Sector"].tolist() == ["Industrials", "Financials", "Information Technology"]
+    assert (constituents["CIK"] == "").all()
+
+
+def test_missing_table_without_id(backend, page):
+    with pytest.raises(ValueError, match="'Ticker' column"):
+        scraper.extract_table_rows(page, None, "Ticker")
@@ -0,0 +1,61 @@
+import json
+
+from common.instrumentation import StageRun, find_regressions, load_run_log
+
+
+def test_nested_span_keeps_parent_traced_peak(tmp_path):
+    run_log_file = str(tmp_path / "runs.jsonl")
+    with StageRun("stage", profile="tracemalloc", run_log_file=run_log_file) as run:
+        with run.span("parent") as parent:
+            block = bytearray(8 * 2 ** 20)
+            del block
+            with run.span("child") as child:
+                small = bytearray(2 ** 20)
+                del small
+
+    assert child.traced_peak_mb < 4
+    # The parent's 8 MB peak happened before the child reset the tracemalloc peak
+    assert parent.traced_peak_mb >= 8
+
+
+def test_span_records_rss_growth(tmp_path):
+    with StageRun("stage", run_log_file=str(tmp_path / "runs.jsonl")) as run:
+        with run.span("step") as step:
+            pass
+
+    assert step.rss_growth_mb is None or step.rss_growth_mb >= 0
+    log = load_run_log(str(tmp_path / "runs.jsonl"))
+    assert log.loc[0, "span"] == "step"
+    assert "rss_growth_mb" in log.columns and "process_peak_rss_mb" in log.columns
+
+
+def _write_run(log_file, run_id, started_at, spans):
+    with open(log_file, "a") as log:
+        log.write(json.dumps({
+            "run_id": run_id, "stage": "stage", "started_at": started_at, "seconds": 1.0,
+            "status": "succeeded", "process_peak_rss_mb": 100.0, "rss_growth_mb": 0.0,
+            "spans": [{"name": name, "seconds": seconds} for name, seconds in spans],
+        }) + "\n")
+
+
+def test_find_regressions_sums_repeated_spans(tmp_path):
+    log_file = str(tmp_path / "runs.jsonl")
+    for day in range(1, 5):
+        # Four calls of 1 s per run: a per-call comparison would see no change
+        _write_run(log_file, f"run{day}", f"2024-01-0{day}T00:00:00", [("chunk", 1.0)] * 4)
+    _write_run(log_file, "run5", "2024-01-05T00:00:00", [("chunk", 1.0)] * 8)
+
+    regressions = find_regressions(load_run_log(log_file))
+
+    assert regressions.to_dict("records") == [{
+        "stage": "stage", "span": "chunk", "latest_seconds": 8.0, "median_seconds": 4.0, "ratio": 2.0,
+    }]
+
+
+def test_find_regressions_ignores_stable_repeated_spans(tmp_path):
+    log_file = str(tmp_path / "runs.jsonl")
+    for day in range(1, 5):
+        # The last call of each run is slow, but every run takes the same total time
+        _write_run(log_file, f"run{day}", f"2024-01-0{day}T00:00:00", [("chunk", 1.0), ("chunk", 3.0)])
+
+    assert find_regressions(load_run_log(log_file)).empty
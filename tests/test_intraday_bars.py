@@ -0,0 +1,44 @@
+import json
+import os
+from datetime import date, timedelta
+
+import pandas as pd
+
+import ecofin360
+from common.market_calendar import trading_days
+from common.paths import BRONZE_INTRADAY_DIR, EMPTY_SESSIONS_FILE
+from data_engineering import intraday_bars
+from synthetic import generate_minute_bars
+
+
+def test_sessions_without_bars_are_not_fetched_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(intraday_bars, "load_universes", lambda: {})
+    monkeypatch.setattr(intraday_bars, "load_all_tickers", lambda universes: ["AAAA", "AAAB"])
+    today = date.today()
+    sessions = [f"{day:%Y-%m-%d}" for day in trading_days(today - timedelta(days=5), today - timedelta(days=1))]
+    # The first session returns no bar at all (e.g. a closure missing from the calendar)
+    empty_session = sessions[0]
+    fetched = []
+
+    def fetch(tickers, start_date, end_date):
+        fetched.append(start_date)
+        if start_date == empty_session:
+            return pd.DataFrame(columns=intraday_bars.BAR_COLUMNS)
+        bars = generate_minute_bars(n_tickers=len(tickers), start=start_date)
+        return bars.assign(Ticker=bars["Ticker"].map(dict(zip(sorted(bars["Ticker"].unique()), tickers))))
+
+    monkeypatch.setattr(intraday_bars, "fetch_minute_bars", fetch)
+
+    assert intraday_bars.update_minute_bars() == sessions[1:]
+    assert sorted(set(fetched)) == sessions
+    with open(os.path.join(BRONZE_INTRADAY_DIR, EMPTY_SESSIONS_FILE)) as file:
+        assert json.load(file) == [empty_session]
+    assert intraday_bars.get_stored_dates() == sessions
+    assert intraday_bars.get_stored_dates(include_empty=False) == sessions[1:]
+
+    # The next run has nothing to fetch, and the stage is reported as up to date
+    fetched.clear()
+    assert intraday_bars.update_minute_bars() == []
+    assert fetched == []
+    assert ecofin360.check_intraday() is not None
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from transformations import long_format
+from transformations.long_format import load_long_format, save_long_format, wide_to_long
+
+DATES = pd.bdate_range("2024-01-01", periods=30, name="Date")
+
+
+def make_wide(tickers, dates=DATES, seed=0):
+    rng = np.random.default_rng(seed)
+    prices = pd.DataFrame(100 + rng.normal(0, 1, (len(dates), len(tickers))).cumsum(axis=0),
+                          index=dates, columns=tickers)
+    return prices, prices.pct_change()
+
+
+def make_dimension(tickers):
+    return pd.DataFrame({"ticker_id": np.arange(len(tickers), dtype="int32"), "Symbol": tickers})
+
+
+def test_save_long_format_appends_new_days(tmp_path):
+    dimension = make_dimension(["AAA", "BBB"])
+    prices, returns = make_wide(["AAA", "BBB"])
+    assert save_long_format(wide_to_long(prices[:20], returns[:20], dimension), "240126", str(tmp_path)) == 40
+    assert save_long_format(wide_to_long(prices, returns, dimension), "240209", str(tmp_path)) == 20
+    # Re-running on the same data writes nothing
+    assert save_long_format(wide_to_long(prices, returns, dimension), "240209", str(tmp_path)) == 0
+
+    stored = load_long_format(str(tmp_path))
+    expected = wide_to_long(prices, returns, dimension).sort_values(["ticker_id", "Date"], ignore_index=True)
+    pd.testing.assert_frame_equal(stored, expected, check_dtype=False)
+
+
+def test_save_long_format_keeps_history_of_added_ticker(tmp_path):
+    dimension = make_dimension(["AAA", "BBB", "CCC"])
+    prices, returns = make_wide(["AAA", "BBB", "CCC"])
+    save_long_format(wide_to_long(prices[["AAA", "BBB"]], returns[["AAA", "BBB"]], dimension), "240209",
+                     str(tmp_path))
+
+    # CCC joins the universe: its whole history is stored, not only the dates after the last stored one
+    written = save_long_format(wide_to_long(prices, returns, dimension), "240212", str(tmp_path))
+    assert written == len(DATES)
+    stored = load_long_format(str(tmp_path), ticker_ids=[2])
+    assert stored["Date"].tolist() == list(DATES)
+    np.testing.assert_allclose(stored["price"], prices["CCC"])
+
+
+def test_save_long_format_rewrites_corrected_history(tmp_path):
+    dimension = make_dimension(["AAA", "BBB"])
+    prices, returns = make_wide(["AAA", "BBB"])
+    save_long_format(wide_to_long(prices, returns, dimension), "240209", str(tmp_path))
+
+    corrected = prices.copy()
+    corrected.iloc[5, 1] = 1.0
+    save_long_format(wide_to_long(corrected, corrected.pct_change(), dimension), "240210", str(tmp_path))
+    stored = load_long_format(str(tmp_path))
+    assert len(stored) == 2 * len(DATES)
+    assert not stored.duplicated(["ticker_id", "Date"]).any()
+    bbb = stored[stored["ticker_id"] == 1].set_index("Date")
+    assert bbb.loc[DATES[5], "price"] == 1.0
+    aaa = stored[stored["ticker_id"] == 0].set_index("Date")
+    np.testing.assert_allclose(aaa["price"], prices["AAA"])
+
+
+def test_save_long_format_only_reads_rewritten_partitions(tmp_path, monkeypatch):
+    dimension = make_dimension(["AAA", "BBB", "CCC"])
+    prices, returns = make_wide(["AAA", "BBB", "CCC"])
+    save_long_format(wide_to_long(prices[:20], returns[:20], dimension), "240126", str(tmp_path))
+    read = []
+    load = long_format.load_long_format
+
+    def record_read(dataset_dir, ticker_ids=None):
+        read.append(None if ticker_ids is None else sorted(ticker_ids))
+        return load(dataset_dir, ticker_ids)
+
+    monkeypatch.setattr(long_format, "load_long_format", record_read)
+    # New days only: nothing stored is read
+    assert save_long_format(wide_to_long(prices, returns, dimension), "240209", str(tmp_path)) == 30
+    assert read == []
+
+    # A corrected BBB price: only its partition is read and rewritten
+    corrected = prices.copy()
+    corrected.iloc[5, 1] = 1.0
+    assert save_long_format(wide_to_long(corrected, corrected.pct_change(), dimension), "240210",
+                            str(tmp_path)) == len(DATES)
+    assert read == [[1]]
+    stored = load(str(tmp_path))
+    assert not stored.duplicated(["ticker_id", "Date"]).any()
+    assert stored.set_index(["ticker_id", "Date"]).loc[(1, DATES[5]), "price"] == 1.0
+
+
+def test_save_long_format_without_state_file(tmp_path):
+    dimension = make_dimension(["AAA", "BBB"])
+    prices, returns = make_wide(["AAA", "BBB"])
+    save_long_format(wide_to_long(prices[:20], returns[:20], dimension), "240126", str(tmp_path))
+    # A dataset written before the state file existed
+    os.remove(tmp_path / long_format.STATE_FILE)
+
+    assert save_long_format(wide_to_long(prices, returns, dimension), "240209", str(tmp_path)) == 20
+    assert save_long_format(wide_to_long(prices, returns, dimension), "240209", str(tmp_path)) == 0
+    assert len(load_long_format(str(tmp_path))) == 2 * len(DATES)
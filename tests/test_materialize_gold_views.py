@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from transformations import materialize_gold_views as gold
+
+
+@pytest.fixture
+def universes(tickers):
+    return {
+        "all": {"name": "all", "benchmark": "^GSPC"},
+        "half": {"name": "half", "benchmark": "^GSPC", "tickers": tickers[:10]},
+    }
+
+
+@pytest.fixture
+def sectors(tickers):
+    return pd.Series([["Energy", "Financials", "Utilities"][i % 3] for i in range(len(tickers))], index=tickers)
+
+
+def test_incremental_update_matches_a_full_rebuild(tmp_path, monkeypatch, write_returns, returns, universes,
+                                                   sectors):
+    partial_file = write_returns(returns[returns["Date"] < "2022-07-15"], "220715")
+    latest_file = write_returns(returns, "231229")
+    incremental_dir, full_dir = str(tmp_path / "incremental"), str(tmp_path / "full")
+
+    gold.materialize_gold_views(partial_file, incremental_dir, universes, sectors)
+    read_from = []
+    read_returns = gold.read_returns
+
+    def record_start(path, start=None):
+        read_from.append(start)
+        return read_returns(path, start)
+
+    monkeypatch.setattr(gold, "read_returns", record_start)
+    gold.materialize_gold_views(latest_file, incremental_dir, universes, sectors)
+    gold.materialize_gold_views(latest_file, full_dir, universes, sectors, full=True)
+
+    # The update only read the returns from the start of 2022 (minus the rolling window)
+    assert read_from[0] is not None and read_from[0].year == 2021
+    for name in gold.GOLD_TABLES:
+        pd.testing.assert_frame_equal(
+            gold.load_gold_table(incremental_dir, name), gold.load_gold_table(full_dir, name),
+            check_exact=False, rtol=1e-9, obj=name,
+        )
+
+
+def test_up_to_date_tables_are_not_rewritten(tmp_path, write_returns, returns, universes, sectors):
+    returns_file = write_returns(returns, "231229")
+    gold_dir = str(tmp_path / "gold")
+
+    assert gold.materialize_gold_views(returns_file, gold_dir, universes, sectors)
+    assert gold.materialize_gold_views(returns_file, gold_dir, universes, sectors) == {}
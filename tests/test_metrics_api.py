@@ -0,0 +1,82 @@
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from serving.metrics_api import MetricsService, SilverData, handle_connection
+
+
+@pytest.fixture
+def data(tmp_path):
+    returns_dir, performance_dir = tmp_path / "returns", tmp_path / "performance"
+    returns_dir.mkdir()
+    performance_dir.mkdir()
+    dates = pd.bdate_range("2024-01-01", periods=5)
+    returns = pd.DataFrame({"Date": dates, "AAPL": np.linspace(0, 0.04, 5), "^GSPC": np.linspace(0.01, 0, 5)})
+    returns.to_parquet(returns_dir / "returns_cleaned_240105-adj-close.parquet", index=False)
+    pd.DataFrame({"Ticker": ["AAPL", "^GSPC"], "Beta": [1.2, 1.0]}).to_parquet(
+        performance_dir / "performance_240105-SP500-adj-close.parquet", index=False)
+    return SilverData(str(returns_dir), str(performance_dir), str(tmp_path / "serving"))
+
+
+def test_refresh_reloads_off_the_event_loop(data, monkeypatch):
+    service = MetricsService(data)
+    threads = []
+    reloaded = SilverData.reloaded
+
+    def record_thread(self):
+        threads.append(threading.current_thread())
+        return reloaded(self)
+
+    monkeypatch.setattr(SilverData, "reloaded", record_thread)
+
+    async def scenario():
+        await service.refresh()
+        return await service.handle("GET", "/metrics?universe=sp500")
+
+    status, body = asyncio.run(scenario())
+
+    assert status == 200
+    assert [row["Ticker"] for row in json.loads(body)["metrics"]] == ["AAPL", "^GSPC"]
+    assert threads and threading.main_thread() not in threads
+
+
+def test_run_log_does_not_invalidate_the_cache(data, tmp_path):
+    data.load()
+    version = data.get_version()
+    (tmp_path / "runs.jsonl").write_text('{"run_id": "1"}\n')
+
+    assert data.get_version() == version
+
+
+async def _request(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def test_invalid_content_length_is_a_bad_request(data):
+    service = MetricsService(data)
+
+    async def scenario():
+        await service.refresh()
+        server = await asyncio.start_server(
+            lambda reader, writer: handle_connection(service, reader, writer), "127.0.0.1", 0
+        )
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            invalid = await _request(port, b"GET /health HTTP/1.1\r\nContent-Length: abc\r\n\r\n")
+            valid = await _request(port, b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+        return invalid, valid
+
+    invalid, valid = asyncio.run(scenario())
+
+    assert invalid.startswith(b"HTTP/1.1 400 Bad Request")
+    assert b"Connection: close" in invalid
+    assert valid.startswith(b"HTTP/1.1 200 OK")
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from data_engineering.intraday_bars import open_minute_bars, save_minute_bars
+from synthetic import generate_minute_bars
+from transformations.resample_intraday_bars import aggregate_bars, iter_resampled_bars
+
+
+def test_hourly_bars_are_anchored_at_the_session_open():
+    bars = generate_minute_bars(n_tickers=2, days=1)
+
+    hourly = aggregate_bars(bars, "1h")
+
+    starts = hourly.loc[hourly["Ticker"] == "AAAA", "Datetime"].dt.strftime("%H:%M").tolist()
+    assert starts == ["09:30", "10:30", "11:30", "12:30", "13:30", "14:30", "15:30"]
+    # Six full hours and the last half hour of the 390-minute session
+    assert hourly.loc[hourly["Ticker"] == "AAAA", "Bars"].tolist() == [60] * 6 + [30]
+
+
+def test_hourly_bars_aggregate_their_minutes():
+    bars = generate_minute_bars(n_tickers=1, days=1)
+
+    first = aggregate_bars(bars, "1h").iloc[0]
+
+    minutes = bars[bars["Datetime"] < pd.Timestamp("2024-01-02 10:30")]
+    assert first["Open"] == minutes["Open"].iloc[0]
+    assert first["Close"] == minutes["Close"].iloc[-1]
+    assert first["High"] == minutes["High"].max()
+    assert first["Volume"] == minutes["Volume"].sum()
+
+
+def test_daily_and_five_minute_bars_keep_their_boundaries():
+    bars = generate_minute_bars(n_tickers=1, days=2)
+
+    daily = aggregate_bars(bars, "1D")
+    five_minutes = aggregate_bars(bars, "5min")
+
+    assert daily["Datetime"].tolist() == [pd.Timestamp("2024-01-02"), pd.Timestamp("2024-01-03")]
+    assert (five_minutes["Bars"] == 5).all()
+    assert five_minutes["Datetime"].iloc[0] == pd.Timestamp("2024-01-02 09:30")
+
+
+def test_chunked_resampling_matches_a_single_chunk(tmp_path):
+    bars = generate_minute_bars(n_tickers=5, days=1)
+    save_minute_bars(bars, str(tmp_path))
+    dataset = open_minute_bars(str(tmp_path))
+
+    (_, chunked), = iter_resampled_bars(dataset, ["1h"], chunk_size=2)
+    (_, single), = iter_resampled_bars(dataset, ["1h"], chunk_size=5)
+
+    pd.testing.assert_frame_equal(chunked["1h"], single["1h"])
+    assert np.isclose(chunked["1h"]["Volume"].sum(), bars["Volume"].sum())
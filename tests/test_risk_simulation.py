@@ -0,0 +1,80 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_science.risk_simulation import (
+    SEED_BLOCK,
+    fit_scenario_model,
+    simulate_losses,
+    summarize_losses,
+)
+
+HORIZONS = [1, 5]
+CONFIDENCE_LEVELS = [0.95, 0.99]
+
+
+def _log_returns(n_days=750, seed=7):
+    rng = np.random.default_rng(seed)
+    common = rng.normal(0.0003, 0.01, n_days)
+    values = np.column_stack([common + rng.normal(0, 0.005, n_days) for _ in range(3)])
+    dates = pd.bdate_range("2021-01-04", periods=n_days, name="Date")
+    return pd.DataFrame(values, index=dates, columns=["AAA", "BBB", "CCC"])
+
+
+def _weights(log_returns):
+    return pd.DataFrame({
+        "equal": 1.0 / log_returns.shape[1],
+        "single": [1.0] + [0.0] * (log_returns.shape[1] - 1),
+    }, index=log_returns.columns)
+
+
+@pytest.mark.parametrize("method", ["bootstrap", "t"])
+def test_results_do_not_depend_on_the_batches(method):
+    log_returns = _log_returns()
+    model = fit_scenario_model(log_returns, method)
+    weights = _weights(log_returns)
+    n_scenarios = 5 * SEED_BLOCK + 100
+
+    # One batch, then one block per batch (the memory budget of a single block)
+    one_batch, stats = simulate_losses(model, weights, n_scenarios, HORIZONS, seed=11, workers=1)
+    small_batches, small_stats = simulate_losses(model, weights, n_scenarios, HORIZONS, seed=11, workers=1,
+                                                 max_batch_bytes=1)
+
+    assert stats["batches"] == 1 and small_stats["batches"] == 6
+    np.testing.assert_allclose(small_batches, one_batch, rtol=1e-6, atol=1e-7)
+
+
+def test_results_do_not_depend_on_the_workers():
+    log_returns = _log_returns()
+    model = fit_scenario_model(log_returns, "normal")
+    weights = _weights(log_returns)
+    n_scenarios = 2 * SEED_BLOCK + 10
+
+    in_process, _ = simulate_losses(model, weights, n_scenarios, HORIZONS, seed=11, workers=1, max_batch_bytes=1)
+    pooled, stats = simulate_losses(model, weights, n_scenarios, HORIZONS, seed=11, workers=2, max_batch_bytes=1)
+
+    assert stats["workers"] == 2
+    np.testing.assert_allclose(pooled, in_process, rtol=1e-6, atol=1e-7)
+
+
+def test_normal_var_and_cvar_match_the_closed_form():
+    log_returns = _log_returns()
+    model = fit_scenario_model(log_returns, "normal")
+    weights = _weights(log_returns)[["single"]]
+    losses, _ = simulate_losses(model, weights, 200_000, HORIZONS, seed=11, workers=1)
+    risk = summarize_losses(losses, HORIZONS, ["single"], CONFIDENCE_LEVELS).set_index(["Horizon", "Confidence"])
+
+    # The loss 1 - exp(X) of a single asset with normal log returns X ~ N(h * mean, h * variance)
+    mean, std = log_returns["AAA"].mean(), log_returns["AAA"].std()
+    for horizon in HORIZONS:
+        m, s = horizon * mean, math.sqrt(horizon) * std
+        for confidence in CONFIDENCE_LEVELS:
+            z = NormalDist().inv_cdf(1 - confidence)
+            var = 1 - math.exp(m + z * s)
+            # E[exp(X) | X <= m + z * s] = exp(m + s^2 / 2) * Phi(z - s) / (1 - confidence)
+            cvar = 1 - math.exp(m + s * s / 2) * NormalDist().cdf(z - s) / (1 - confidence)
+            assert risk.loc[(horizon, confidence), "VaR"] == pytest.approx(var, rel=0.02)
+            assert risk.loc[(horizon, confidence), "CVaR"] == pytest.approx(cvar, rel=0.02)
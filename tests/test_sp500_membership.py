@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from data_engineering.sp500_membership import (
+    build_membership_index,
+    change_events,
+    mask_returns,
+    members_as_of,
+    membership_matrix,
+    reconstruct_membership_history,
+    update_membership_history,
+)
+
+
+def make_changes(rows):
+    changes = pd.DataFrame(rows, columns=["Date", "Added", "Removed"])
+    changes["Date"] = pd.to_datetime(changes["Date"])
+    return changes
+
+
+HISTORY = pd.DataFrame({
+    "Symbol": ["AAA", "BBB", "CCC", "BBB"],
+    "added": pd.to_datetime([None, "2024-01-03", None, "2024-01-08"]),
+    "removed": pd.to_datetime([None, "2024-01-05", "2024-01-04", None]),
+})
+
+
+def test_membership_matrix_intervals():
+    dates = pd.bdate_range("2024-01-01", "2024-01-10")
+    matrix = membership_matrix(HISTORY, dates, ["AAA", "BBB", "CCC", "^GSPC"])
+
+    assert matrix["AAA"].all()
+    # Tickers without a recorded interval (the benchmark) are members on every date
+    assert matrix["^GSPC"].all()
+    # 'added' is inclusive and 'removed' exclusive; BBB has two intervals
+    expected_bbb = [False, False, True, True, False, True, True, True]
+    assert matrix["BBB"].tolist() == expected_bbb
+    assert matrix["CCC"].tolist() == [True, True, True] + [False] * 5
+    index = build_membership_index(HISTORY)
+    for date in dates:
+        members = members_as_of(HISTORY, date)
+        assert members == sorted(ticker for ticker in ["AAA", "BBB", "CCC"] if matrix.loc[date, ticker])
+        assert members_as_of(index, date) == members
+
+
+def test_membership_index_matches_a_scan_of_the_history():
+    rng = np.random.default_rng(0)
+    symbols = [f"T{number:03d}" for number in range(200)]
+    added = pd.Timestamp("2000-01-03") + pd.to_timedelta(rng.integers(0, 8000, len(symbols)), unit="D")
+    history = pd.DataFrame({
+        "Symbol": symbols * 2,
+        # Open starts (members before the history) and a second interval for every ticker
+        "added": pd.DatetimeIndex(list(added.where(rng.random(len(symbols)) > 0.2))
+                                  + list(added + pd.Timedelta(days=2000))),
+        "removed": pd.DatetimeIndex(list(added + pd.Timedelta(days=1000))
+                                    + list((added + pd.Timedelta(days=3000)).where(rng.random(len(symbols)) > 0.5))),
+    })
+    index = build_membership_index(history)
+
+    dates = pd.date_range("1999-12-31", "2035-01-01", freq="97D").append(pd.DatetimeIndex(history["added"].dropna()))
+    for date in dates:
+        assert members_as_of(index, date) == members_as_of(history, date)
+
+
+def test_mask_returns_sets_non_members_to_nan():
+    dates = pd.bdate_range("2024-01-01", "2024-01-10")
+    returns = pd.DataFrame(0.01, index=dates, columns=["AAA", "BBB", "CCC"])
+    masked = mask_returns(returns, HISTORY)
+
+    assert masked["AAA"].notna().all()
+    np.testing.assert_array_equal(masked["BBB"].notna().to_numpy(), [False, False, True, True, False, True, True, True])
+    assert masked["CCC"].notna().sum() == 3
+    assert masked.loc[masked["BBB"].notna(), "BBB"].eq(0.01).all()
+
+
+def test_reconstruct_membership_history():
+    changes = make_changes([("2024-01-03", "BBB", "CCC"), ("2024-01-05", "", "BBB")])
+    history = reconstruct_membership_history(["AAA"], changes)
+    assert members_as_of(history, "2024-01-02") == ["AAA", "CCC"]
+    assert members_as_of(history, "2024-01-04") == ["AAA", "BBB"]
+    assert members_as_of(history, "2024-01-05") == ["AAA"]
+
+
+def test_update_applies_late_published_changes():
+    changes = make_changes([("2024-01-03", "BBB", "CCC")])
+    history = reconstruct_membership_history(["AAA", "BBB"], changes)
+    # DDD joins, but the changes table only lists it after the next scrape
+    history = update_membership_history(history, ["AAA", "BBB", "DDD"], changes, as_of="2024-02-01",
+                                        seen_changes=change_events(changes))
+    assert members_as_of(history, "2024-01-20") == ["AAA", "BBB"]
+    assert members_as_of(history, "2024-02-01") == ["AAA", "BBB", "DDD"]
+
+    # Published later: DDD replaced AAA on 2024-01-15, and EEE replaced BBB on 2024-01-10
+    late = make_changes([
+        ("2024-01-03", "BBB", "CCC"),
+        ("2024-01-10", "EEE", "BBB"),
+        ("2024-01-15", "DDD", "AAA"),
+    ])
+    history = update_membership_history(history, ["DDD", "EEE"], late, as_of="2024-02-05",
+                                        seen_changes=change_events(changes))
+    assert members_as_of(history, "2024-01-09") == ["AAA", "BBB"]
+    assert members_as_of(history, "2024-01-12") == ["AAA", "EEE"]
+    assert members_as_of(history, "2024-01-16") == ["DDD", "EEE"]
+    assert not history.duplicated().any()
+
+    # Applying the same changes again changes nothing
+    again = update_membership_history(history, ["DDD", "EEE"], late, as_of="2024-02-06",
+                                      seen_changes=change_events(changes))
+    pd.testing.assert_frame_equal(again, history)